@@ -0,0 +1,143 @@
+"""
+Async counterparts of the chat/mongo_client.py operations the chat API uses, on
+PyMongo's native asyncio driver (AsyncMongoClient).
+
+Queries, pipelines and document shaping are the ones defined in mongo_client, so
+the sync and async paths can't drift apart; only the I/O differs. Used by
+chat/async_views.py when the chat API is served through ASGI (settings.CHAT_ASYNC_VIEWS).
+"""
+import asyncio
+import os
+import threading
+import weakref
+
+from django.conf import settings
+from pymongo import AsyncMongoClient
+
+from . import mongo_client as sync
+
+# event loop -> (pid, client); entries go away with their loop
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The AsyncMongoClient for the running event loop in this process, created on first use.
+    An async client is bound to the loop it was first used on, so each loop gets its own;
+    under an ASGI server that is one client (and one pool) per worker.
+    """
+    loop = asyncio.get_running_loop()
+    pid = os.getpid()
+    entry = _clients.get(loop)
+    if entry is None or entry[0] != pid:
+        with _clients_lock:
+            entry = _clients.get(loop)
+            if entry is None or entry[0] != pid:
+                entry = (pid, AsyncMongoClient(settings.MONGO_URI, **sync.client_options()))
+                _clients[loop] = entry
+    return entry[1]
+
+
+def get_collection(name):
+    return get_client()[settings.MONGO_DB_NAME][name]
+
+
+async def reset_client():
+    """Closes the running loop's client (tests); the next use builds a fresh one."""
+    with _clients_lock:
+        entry = _clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None and entry[0] == os.getpid():
+        await entry[1].close()
+
+
+def _messages():
+    return get_collection('messages')
+
+
+def _conversations():
+    return get_collection('conversations')
+
+
+async def save_message(data):
+    message_doc = sync.new_message_doc(data)
+    result = await _messages().insert_one(message_doc)
+    await _conversations().update_one(*sync.message_summary_update(message_doc), upsert=True)
+    return sync.sent_message(message_doc, result.inserted_id)
+
+
+async def get_conversation(user1_id, user2_id):
+    user1_id = int(user1_id)
+    user2_id = int(user2_id)
+    cursor = _messages().find(sync.conversation_query(user1_id, user2_id)).sort('timestamp', 1)
+    return [sync.shape_message(doc, user1_id) async for doc in cursor]
+
+
+async def get_conversation_page(user1_id, user2_id, before=None, limit=sync.CONVERSATION_PAGE_SIZE):
+    pipeline, limit = sync.page_request(user1_id, user2_id, before, limit)
+    cursor = await _messages().aggregate(pipeline)
+    return sync.page_result(await cursor.to_list(), limit)
+
+
+async def mark_as_read(sender_id, receiver_id):
+    result = await _messages().update_many(
+        sync.mark_read_query(sender_id, receiver_id), {'$set': {'is_read': True}}
+    )
+    if result.modified_count:
+        await _conversations().update_one(*sync.unread_decrement(sender_id, receiver_id, result.modified_count))
+
+
+async def get_conversation_summaries(user_id):
+    user_id = int(user_id)
+    query, projection, sort = sync.summaries_query(user_id)
+    cursor = _conversations().find(query, projection).sort(*sort)
+    return dict([sync.summary_item(doc, user_id) async for doc in cursor])
+
+
+async def get_total_unread(user_id):
+    summaries = await get_conversation_summaries(user_id)
+    return sum(summary['unread_count'] for summary in summaries.values())
+
+
+async def refresh_conversation(user_id, other_id, sides=None):
+    user_id = int(user_id)
+    other_id = int(other_id)
+    sides = sync.summary_sides(user_id, other_id, sides)
+
+    async def side(viewer_id, partner_id):
+        last, unread = await asyncio.gather(
+            _messages().find_one(sync.conversation_query(viewer_id, partner_id), sort=[('timestamp', -1)]),
+            _messages().count_documents(sync.unread_query(viewer_id, partner_id)),
+        )
+        return sync.side_summary(viewer_id, last, unread)
+
+    changes = {}
+    for fields in await asyncio.gather(*(side(viewer_id, partner_id) for viewer_id, partner_id in sides)):
+        changes.update(fields)
+    await _conversations().update_one(*sync.summary_replace(user_id, other_id, changes), upsert=True)
+
+
+async def delete_conversation_local(user_id, target_user_id):
+    await asyncio.gather(*(
+        _messages().update_many(query, update)
+        for query, update in sync.delete_conversation_updates(user_id, target_user_id)
+    ))
+    await refresh_conversation(user_id, target_user_id, sides=[user_id])
+
+
+async def delete_messages(message_ids, user_id, mode='local'):
+    obj_ids = sync.message_object_ids(message_ids)
+    if obj_ids is None:
+        return # Invalid ID
+
+    user_id = int(user_id)
+    cursor = _messages().find(*sync.touched_conversations_query(obj_ids, user_id))
+    partners = {sync.partner_of(doc, user_id) async for doc in cursor}
+    await asyncio.gather(*(
+        _messages().update_many(query, update)
+        for query, update in sync.delete_messages_updates(obj_ids, user_id, mode)
+    ))
+    await asyncio.gather(*(
+        refresh_conversation(user_id, partner_id, sides=sync.refreshed_sides(user_id, mode))
+        for partner_id in partners
+    ))
@@ -0,0 +1,196 @@
+"""
+Async versions of the MessageViewSet actions, for serving the chat API through ASGI
+(settings.CHAT_ASYNC_VIEWS; see chat/urls.py).
+
+Same URLs, parameters and response bodies as chat/views.py, but Mongo round trips
+go through chat/async_mongo_client.py and independent I/O (the Staff query and the
+conversation summaries, the sender/receiver checks) runs concurrently, so a worker
+isn't parked on the network while a request waits. DRF views are sync-only, so
+these are plain Django async views that render with DRF's JSON encoder.
+"""
+import asyncio
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.utils.encoders import JSONEncoder
+
+from formapp.images import image_url
+from formapp.models import Staff
+from formapp.sync import etag_for_payload, not_modified, with_validators
+
+from . import async_mongo_client as mongo
+from .mongo_client import CONVERSATION_PAGE_SIZE
+from .views import CHAT_AVATAR_SIZE
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _request_data(request):
+    """JSON or form body, like DRF's request.data; None if the JSON is malformed."""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def create(request):
+    """POST /api/chat/ - see MessageViewSet.create"""
+    data = _request_data(request)
+    if data is None:
+        return _response({'detail': 'JSON parse error'}, status=400)
+
+    # Normalize field names - accept both 'sender' and 'sender_id'
+    normalized_data = {
+        'sender_id': data.get('sender_id') or data.get('sender'),
+        'receiver_id': data.get('receiver_id') or data.get('receiver'),
+        'content': data.get('content')
+    }
+    if not all(normalized_data.values()):
+        return _response({'error': 'Missing required fields'}, status=400)
+
+    # Verify users exist in SQL
+    sender_exists, receiver_exists = await asyncio.gather(
+        Staff.objects.filter(id=normalized_data['sender_id']).aexists(),
+        Staff.objects.filter(id=normalized_data['receiver_id']).aexists(),
+    )
+    if not sender_exists:
+        return _response({'error': 'Invalid sender_id'}, status=400)
+    if not receiver_exists:
+        return _response({'error': 'Invalid receiver_id'}, status=400)
+
+    try:
+        msg = await mongo.save_message(normalized_data)
+        return _response(msg, status=201)
+    except Exception as e:
+        return _response({'error': str(e)}, status=500)
+
+
+@require_GET
+async def conversation(request):
+    """GET /api/chat/conversation/?user1=X&user2=Y[&limit=50&before=...] - see MessageViewSet.conversation"""
+    u1 = request.GET.get('user1')
+    u2 = request.GET.get('user2')
+    if not u1 or not u2:
+        return _response({'error': 'Missing user1 or user2 params'}, status=400)
+
+    before = request.GET.get('before')
+    limit = request.GET.get('limit')
+    if before or limit:
+        try:
+            msgs, next_before = await mongo.get_conversation_page(
+                u1, u2, before=before, limit=limit or CONVERSATION_PAGE_SIZE
+            )
+        except ValueError:
+            return _response({'error': 'Invalid before or limit'}, status=400)
+        response = _response({'results': msgs, 'next_before': next_before})
+    else:
+        response = _response(await mongo.get_conversation(u1, u2))
+
+    # Mark messages from u2 as read by u1 (after reading, as the sync view does)
+    await mongo.mark_as_read(sender_id=u2, receiver_id=u1)
+    return response
+
+
+async def _staff_rows(staffs, fields):
+    return [row async for row in staffs.values(*fields)]
+
+
+async def _no_summaries():
+    return {}
+
+
+@require_GET
+async def users(request):
+    """GET /api/chat/users/?exclude_id=X[&polling=true] - see MessageViewSet.users"""
+    current_user_id = request.GET.get('exclude_id')
+    staffs = Staff.objects.filter(active_status=True)
+
+    if current_user_id:
+        try:
+            current_user_id = int(current_user_id)
+            staffs = staffs.exclude(id=current_user_id)
+        except ValueError:
+            current_user_id = None # safely ignore invalid id
+
+    is_polling = request.GET.get('polling') == 'true'
+    fields_to_fetch = ['id', 'name', 'role', 'login_id']
+    if not is_polling:
+        fields_to_fetch.append('profile_image')
+
+    # Postgres and Mongo in parallel
+    staff_data, stats = await asyncio.gather(
+        _staff_rows(staffs, fields_to_fetch),
+        mongo.get_conversation_summaries(current_user_id) if current_user_id else _no_summaries(),
+    )
+    if not is_polling:
+        for s in staff_data:
+            s['profile_image'] = image_url(s['profile_image'], request, size=CHAT_AVATAR_SIZE)
+
+    if current_user_id:
+        for s in staff_data:
+            partner = stats.get(s['id'], {})
+            s['unread_count'] = partner.get('unread_count', 0)
+            s['last_message_time'] = partner.get('last_message_time')
+            s['last_message'] = partner.get('last_message')
+
+        # Sort by last_message_time desc; staff without messages keep their order at the end
+        rank = {partner_id: position for position, partner_id in enumerate(stats)}
+        staff_data.sort(key=lambda user: rank.get(user['id'], len(rank)))
+
+    etag = etag_for_payload(request, staff_data)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    return with_validators(_response(staff_data), etag)
+
+
+@require_GET
+async def unread_count(request):
+    """GET /api/chat/unread_count/?user_id=X - see MessageViewSet.unread_count"""
+    user_id = request.GET.get('user_id')
+    if not user_id:
+        return _response({'error': 'Missing user_id param'}, status=400)
+    return _response({'count': await mongo.get_total_unread(user_id)})
+
+
+@csrf_exempt
+@require_POST
+async def delete_conversation(request):
+    """POST /api/chat/delete_conversation/ - see MessageViewSet.delete_conversation"""
+    data = _request_data(request)
+    if data is None:
+        return _response({'detail': 'JSON parse error'}, status=400)
+    user_id = data.get('user_id')
+    target_user_id = data.get('target_user_id')
+
+    if not user_id or not target_user_id:
+        return _response({'error': 'Missing user_id or target_user_id'}, status=400)
+
+    await mongo.delete_conversation_local(user_id, target_user_id)
+    return _response({'status': 'deleted', 'mode': 'local'})
+
+
+@csrf_exempt
+@require_POST
+async def delete_messages(request):
+    """POST /api/chat/delete_messages/ - see MessageViewSet.delete_messages"""
+    data = _request_data(request)
+    if data is None:
+        return _response({'detail': 'JSON parse error'}, status=400)
+    message_ids = data.get('message_ids', [])
+    user_id = data.get('user_id')
+    mode = data.get('mode', 'local')
+
+    if not message_ids:
+        return _response({'error': 'Missing message_ids'}, status=400)
+
+    await mongo.delete_messages(message_ids, user_id, mode)
+    return _response({'status': 'success'})
@@ -0,0 +1,133 @@
+"""
+Indexes for the chat collections (`messages`, `conversations`), declared in one place.
+
+Every query shape issued by chat/mongo_client.py is listed in query_shapes() with
+the index expected to serve it; `manage.py ensure_chat_indexes` creates the
+indexes and explain()s each shape, failing if any of them plans a COLLSCAN.
+"""
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from . import mongo_client
+
+MESSAGE_INDEXES = [
+    # conversation / last message / delete conversation / stats (sender side)
+    IndexModel(
+        [('sender_id', ASCENDING), ('receiver_id', ASCENDING), ('timestamp', DESCENDING)],
+        name='sender_receiver_timestamp',
+    ),
+    # unread counts (per sender and total) / mark read / stats (receiver side)
+    IndexModel(
+        [('receiver_id', ASCENDING), ('is_read', ASCENDING), ('sender_id', ASCENDING)],
+        name='receiver_read_sender',
+    ),
+    # paged conversation history
+    IndexModel(
+        [('conversation_key', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)],
+        name='conversation_timestamp',
+    ),
+]
+
+CONVERSATION_INDEXES = [
+    # a user's conversation summaries (user list, unread badge)
+    IndexModel([('users', ASCENDING)], name='users'),
+]
+
+
+def _key(spec):
+    return tuple((field, int(direction)) for field, direction in spec)
+
+
+def declared_indexes():
+    """[(collection, [IndexModel])] for every chat collection."""
+    return [
+        (mongo_client.get_collection('messages'), MESSAGE_INDEXES),
+        (mongo_client.get_collection('conversations'), CONVERSATION_INDEXES),
+    ]
+
+
+def ensure_indexes(dry_run=False):
+    """
+    Creates any declared index that is missing; indexes already present with the
+    same keys (under any name) are left alone, so this is safe to run repeatedly.
+    Returns (created names, already present names) as 'collection.index'.
+    """
+    created, present = [], []
+    for collection, indexes in declared_indexes():
+        existing = {_key(info['key']) for info in collection.index_information().values()}
+        missing = [index for index in indexes if _key(index.document['key'].items()) not in existing]
+        present += [f"{collection.name}.{index.document['name']}" for index in indexes if index not in missing]
+        created += [f"{collection.name}.{index.document['name']}" for index in missing]
+        if missing and not dry_run:
+            collection.create_indexes(missing)
+    return created, present
+
+
+def query_shapes(user_id=1, other_id=2):
+    """
+    {shape name: explain command} for every query mongo_client issues, built from the
+    same query/pipeline helpers the module uses (with sample ids).
+    """
+    name = mongo_client.messages_collection.name
+    conversations = mongo_client.conversations_collection.name
+    message_ids = [ObjectId()]
+
+    def update(query, change):
+        return {'update': name, 'updates': [{'q': query, 'u': {'$set': change}, 'multi': True}]}
+
+    return {
+        'conversation': {
+            'find': name,
+            'filter': mongo_client.conversation_query(user_id, other_id),
+            'sort': {'timestamp': 1},
+        },
+        'conversation page': {
+            'aggregate': name,
+            'pipeline': mongo_client.conversation_page_pipeline(user_id, other_id),
+            'cursor': {},
+        },
+        'last message': {
+            'find': name,
+            'filter': mongo_client.conversation_query(user_id, other_id),
+            'sort': {'timestamp': -1},
+            'limit': 1,
+        },
+        'unread': {'count': name, 'query': mongo_client.unread_query(user_id, other_id)},
+        'conversation summaries': {
+            'find': conversations,
+            'filter': {'users': user_id},
+            'sort': {f'last_time.{user_id}': -1},
+        },
+        'conversation stats': {
+            'aggregate': name,
+            'pipeline': mongo_client.conversation_stats_pipeline(user_id),
+            'cursor': {},
+        },
+        'mark read': update(mongo_client.mark_read_query(other_id, user_id), {'is_read': True}),
+        'delete conversation': update(
+            {'sender_id': user_id, 'receiver_id': other_id}, {'deleted_by_sender': True}
+        ),
+        'delete messages': update(
+            {'_id': {'$in': message_ids}, 'sender_id': user_id}, {'deleted_by_sender': True}
+        ),
+    }
+
+
+def uses_collection_scan(plan):
+    """True if a COLLSCAN stage appears anywhere in an explain() document."""
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            return True
+        return any(uses_collection_scan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(uses_collection_scan(value) for value in plan)
+    return False
+
+
+def explain_query_shapes():
+    """{shape name: True if the planner would scan the whole collection}"""
+    database = mongo_client.get_database()
+    return {
+        shape: uses_collection_scan(database.command('explain', command, verbosity='queryPlanner'))
+        for shape, command in query_shapes().items()
+    }
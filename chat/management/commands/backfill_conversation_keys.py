@@ -0,0 +1,38 @@
+"""
+Django management command to add conversation_key to chat messages stored before
+paged conversation history existed (the index that serves it is created by
+ensure_chat_indexes, which also runs this backfill).
+
+Messages are grouped by (sender, receiver) in Mongo and each pair is updated with
+one update_many, so the number of round trips grows with conversations, not messages.
+
+Usage:
+    python manage.py backfill_conversation_keys
+    python manage.py backfill_conversation_keys --dry-run
+"""
+from django.core.management.base import BaseCommand
+
+from chat.mongo_client import backfill_conversation_keys
+
+
+class Command(BaseCommand):
+    help = 'Set conversation_key on chat messages that predate it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count messages without a conversation_key without updating them'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No messages will be changed'))
+
+        updated, conversations = backfill_conversation_keys(dry_run=dry_run)
+
+        verb = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(f'  {verb} {updated} messages across {conversations} sender/receiver pairs')
+        self.stdout.write(self.style.SUCCESS('✓ Backfill complete'))
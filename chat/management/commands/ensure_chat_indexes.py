@@ -0,0 +1,69 @@
+"""
+Django management command to create the chat indexes and verify query plans.
+
+Creates every index declared in chat/indexes.py that is missing (idempotent),
+backfills conversation_key on messages that predate it (paged history only finds
+keyed messages) and fails if any remain unkeyed, then runs explain() on each query
+shape chat/mongo_client.py issues and fails if any of them would fall back to a
+collection scan. Run it on every deployment.
+
+Usage:
+    python manage.py ensure_chat_indexes
+    python manage.py ensure_chat_indexes --dry-run        # Report missing indexes only
+    python manage.py ensure_chat_indexes --skip-explain
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.indexes import ensure_indexes, explain_query_shapes
+from chat.mongo_client import backfill_conversation_keys, has_unkeyed_messages
+
+
+class Command(BaseCommand):
+    help = 'Create the chat indexes, backfill conversation keys and check that no query shape needs a COLLSCAN'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report missing indexes and unkeyed messages without changing anything'
+        )
+        parser.add_argument(
+            '--skip-explain',
+            action='store_true',
+            help='Only create indexes; do not check query plans'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No indexes or messages will be changed'))
+
+        created, present = ensure_indexes(dry_run=dry_run)
+        for name in present:
+            self.stdout.write(f'  {name}: present')
+        for name in created:
+            self.stdout.write(f"  {name}: {self.style.WARNING('missing') if dry_run else 'created'}")
+
+        updated, conversations = backfill_conversation_keys(dry_run=dry_run)
+        if updated:
+            verb = 'would be keyed' if dry_run else 'keyed'
+            self.stdout.write(f'  {updated} messages {verb} across {conversations} sender/receiver pairs')
+        if not dry_run and has_unkeyed_messages():
+            raise CommandError('Messages without a conversation_key remain; paged history would miss them')
+
+        if options['skip_explain']:
+            self.stdout.write(self.style.SUCCESS('✓ Chat indexes ensured'))
+            return
+
+        scans = []
+        for shape, collection_scan in explain_query_shapes().items():
+            if collection_scan:
+                scans.append(shape)
+                self.stdout.write(f"  {self.style.ERROR('COLLSCAN')} {shape}")
+            else:
+                self.stdout.write(f'  {shape}: index scan')
+
+        if scans:
+            raise CommandError(f"Query shapes without a usable index: {', '.join(scans)}")
+        self.stdout.write(self.style.SUCCESS('✓ Chat indexes ensured; every query shape uses an index'))
@@ -0,0 +1,21 @@
+"""
+Django management command to rebuild the chat conversation summaries.
+
+The `conversations` collection (per-pair unread counters, last message time and
+preview) is maintained by chat/mongo_client.py on every write; this recomputes it
+from the messages, e.g. after first deploying it or to repair drift.
+
+Usage:
+    python manage.py rebuild_conversations
+"""
+from django.core.management.base import BaseCommand
+
+from chat.mongo_client import rebuild_conversations
+
+
+class Command(BaseCommand):
+    help = 'Recompute the chat conversations collection from the messages'
+
+    def handle(self, *args, **options):
+        count = rebuild_conversations()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {count} conversation summaries'))
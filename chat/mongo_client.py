@@ -1,19 +1,202 @@
 from django.conf import settings
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
+import base64
+import binascii
 import datetime
+import json
+import os
+import threading
 import certifi
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
 
-client = MongoClient(settings.MONGO_URI, tlsCAFile=certifi.where())
-db = client[settings.MONGO_DB_NAME]
-messages_collection = db['messages']
+from websitebackend.events import publish
 
-def save_message(data):
-    """
-    Save a new message to MongoDB.
-    data: dict containing sender_id, receiver_id, content
-    """
+# --- Connection ---
+# The client is created on first use, once per process: importing this module
+# (manage.py, migrations, tests) doesn't open connections or wait on TLS, and
+# gunicorn workers forked from a preloaded master each build their own pool
+# instead of sharing the parent's sockets.
+
+MONGO_CLIENT_DEFAULTS = {
+    'MONGO_MAX_POOL_SIZE': 50,
+    'MONGO_MIN_POOL_SIZE': 0,
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 5000,
+    'MONGO_CONNECT_TIMEOUT_MS': 5000,
+    'MONGO_SOCKET_TIMEOUT_MS': 20000,
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 5000,
+}
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters for this process's client (see pool_stats())."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(
+            ('created', 'closed', 'checked_out', 'checked_in', 'checkout_failed', 'pool_cleared'), 0
+        )
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count('pool_cleared')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count('created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count('closed')
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count('checkout_failed')
+
+    def connection_checked_out(self, event):
+        self._count('checked_out')
+
+    def connection_checked_in(self, event):
+        self._count('checked_in')
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+        counts['open'] = counts['created'] - counts['closed']
+        counts['in_use'] = counts['checked_out'] - counts['checked_in']
+        return counts
+
+
+_process = {'pid': None, 'client': None, 'stats': None, 'collections': {}}
+_process_lock = threading.Lock()
+
+
+def client_options():
+    """MongoClient keyword arguments from settings (MONGO_* overrides the defaults above)."""
+    def option(name):
+        return getattr(settings, name, MONGO_CLIENT_DEFAULTS[name])
+
+    return {
+        'tlsCAFile': certifi.where(),
+        'maxPoolSize': option('MONGO_MAX_POOL_SIZE'),
+        'minPoolSize': option('MONGO_MIN_POOL_SIZE'),
+        'serverSelectionTimeoutMS': option('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+        'connectTimeoutMS': option('MONGO_CONNECT_TIMEOUT_MS'),
+        'socketTimeoutMS': option('MONGO_SOCKET_TIMEOUT_MS'),
+        'waitQueueTimeoutMS': option('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        # Don't start background monitoring until the first operation
+        'connect': False,
+    }
+
+
+def get_client():
+    """This process's MongoClient, created on first use (and again after a fork)."""
+    pid = os.getpid()
+    if _process['pid'] != pid:
+        with _process_lock:
+            if _process['pid'] != pid:
+                # A client inherited across fork() must not be used or closed in the child
+                stats = PoolStats()
+                _process.update(
+                    client=MongoClient(settings.MONGO_URI, event_listeners=[stats], **client_options()),
+                    stats=stats,
+                    collections={},
+                    pid=pid,
+                )
+    return _process['client']
+
+
+def get_database():
+    return get_client()[settings.MONGO_DB_NAME]
+
+
+def get_collection(name):
+    get_client()
+    collections = _process['collections']
+    if name not in collections:
+        collections[name] = get_database()[name]
+    return collections[name]
+
+
+def reset_client():
+    """Closes this process's client (if it created one); the next use builds a fresh one. Used by tests."""
+    with _process_lock:
+        client = _process['client']
+        owned = _process['pid'] == os.getpid()
+        _process.update(pid=None, client=None, stats=None, collections={})
+    if client is not None and owned:
+        client.close()
+
+
+def pool_stats():
+    """Pool configuration and counters for this process ({} before the client exists)."""
+    if _process['pid'] != os.getpid():
+        return {}
+    stats = _process['stats'].snapshot()
+    options = _process['client'].options.pool_options
+    stats.update(
+        pid=_process['pid'],
+        max_pool_size=options.max_pool_size,
+        min_pool_size=options.min_pool_size,
+    )
+    return stats
+
+
+class LazyCollection:
+    """Module-level stand-in for a Collection, resolved against get_client() on each use."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_collection(self.name), attr)
+
+    def __repr__(self):
+        return f'<LazyCollection {self.name!r}>'
+
+
+messages_collection = LazyCollection('messages')
+# One summary document per user pair (see "Conversation summaries" below)
+conversations_collection = LazyCollection('conversations')
+
+CONVERSATION_PAGE_SIZE = 50
+CONVERSATION_MAX_PAGE_SIZE = 200
+# Same shape as datetime.isoformat() on the naive UTC datetimes pymongo returns
+ISO_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%L000'
+PREVIEW_LENGTH = 100
+REBUILD_DELETE_BATCH_SIZE = 1000
+REVOKED_BY_VIEWER = "You deleted this message"
+REVOKED_FOR_VIEWER = "This message was deleted"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def conversation_key(user1_id, user2_id):
+    """Order-independent id of a two-person conversation: (7, 3) -> '3:7'."""
+    low, high = sorted((int(user1_id), int(user2_id)))
+    return f"{low}:{high}"
+
+def new_message_doc(data):
+    """The document stored for a new message. data: dict containing sender_id, receiver_id, content"""
     timestamp = datetime.datetime.now(datetime.timezone.utc)
-    message_doc = {
+    return {
         'sender_id': int(data['sender_id']),
         'receiver_id': int(data['receiver_id']),
         'content': data['content'],
@@ -21,10 +204,14 @@ def save_message(data):
         'is_read': False,
         'deleted_by_sender': False,
         'deleted_by_receiver': False,
-        'is_revoked': False
+        'is_revoked': False,
+        'conversation_key': conversation_key(data['sender_id'], data['receiver_id']),
     }
-    result = messages_collection.insert_one(message_doc)
-    message_doc['id'] = str(result.inserted_id)
+
+def sent_message(message_doc, inserted_id):
+    """API shape of a just-inserted message; pushes it to both sides' event streams."""
+    timestamp = message_doc['timestamp']
+    message_doc['id'] = str(inserted_id)
     # Add frontend-compatible field names
     message_doc['sender'] = message_doc['sender_id']
     message_doc['receiver'] = message_doc['receiver_id']
@@ -33,16 +220,25 @@ def save_message(data):
     # Remove _id as we use id
     if '_id' in message_doc:
         del message_doc['_id']
+    del message_doc['conversation_key']
+    # Push to both sides (the sender may have the chat open in another tab)
+    publish(message_doc['receiver_id'], 'chat.message', message_doc)
+    publish(message_doc['sender_id'], 'chat.message', message_doc)
     return message_doc
 
-def get_conversation(user1_id, user2_id):
+def save_message(data):
     """
-    Get messages between two users.
+    Save a new message to MongoDB.
+    data: dict containing sender_id, receiver_id, content
     """
-    user1_id = int(user1_id)
-    user2_id = int(user2_id)
-    
-    query = {
+    message_doc = new_message_doc(data)
+    result = messages_collection.insert_one(message_doc)
+    record_message(message_doc)
+    return sent_message(message_doc, result.inserted_id)
+
+def conversation_query(user1_id, user2_id):
+    """Messages between two users that user1 can still see."""
+    return {
         '$or': [
             {
                 'sender_id': user1_id, 
@@ -56,34 +252,135 @@ def get_conversation(user1_id, user2_id):
             }
         ]
     }
+
+def get_conversation(user1_id, user2_id):
+    """
+    Get messages between two users.
+    """
+    user1_id = int(user1_id)
+    user2_id = int(user2_id)
+    
+    query = conversation_query(user1_id, user2_id)
     
     # Sort by timestamp ascending
     cursor = messages_collection.find(query).sort('timestamp', 1)
+    return [shape_message(doc, user1_id) for doc in cursor]
+
+def shape_message(doc, user1_id):
+    """A stored message as returned to user1 by the legacy (unpaged) conversation API."""
+    # Convert _id to string id
+    doc['id'] = str(doc['_id'])
+    del doc['_id']
+    
+    # Add frontend-compatible field names (sender/receiver instead of sender_id/receiver_id)
+    doc['sender'] = doc['sender_id']
+    doc['receiver'] = doc['receiver_id']
+    
+    # Convert datetime to ISO string for frontend
+    if 'timestamp' in doc and isinstance(doc['timestamp'], datetime.datetime):
+        doc['timestamp'] = doc['timestamp'].isoformat()
     
-    messages = []
-    for doc in cursor:
-        # Convert _id to string id
-        doc['id'] = str(doc['_id'])
-        del doc['_id']
-        
-        # Add frontend-compatible field names (sender/receiver instead of sender_id/receiver_id)
-        doc['sender'] = doc['sender_id']
-        doc['receiver'] = doc['receiver_id']
-        
-        # Convert datetime to ISO string for frontend
-        if 'timestamp' in doc and isinstance(doc['timestamp'], datetime.datetime):
-            doc['timestamp'] = doc['timestamp'].isoformat()
-        
-        # Handle revoked messages
-        if doc.get('is_revoked'):
-            if doc['sender_id'] == user1_id:
-                doc['content'] = "You deleted this message"
-            else:
-                doc['content'] = "This message was deleted"
-        
-        messages.append(doc)
-        
-    return messages
+    # Handle revoked messages
+    if doc.get('is_revoked'):
+        if doc['sender_id'] == user1_id:
+            doc['content'] = REVOKED_BY_VIEWER
+        else:
+            doc['content'] = REVOKED_FOR_VIEWER
+    return doc
+
+def encode_cursor(message):
+    raw = json.dumps([message['timestamp'], message['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(timestamp, ObjectId) of the oldest message already shown."""
+    try:
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(timestamp), ObjectId(message_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise InvalidCursor('Invalid cursor')
+
+
+def conversation_page_pipeline(user1_id, user2_id, before=None, limit=CONVERSATION_PAGE_SIZE):
+    """
+    Aggregation behind get_conversation_page (fetches limit + 1 to detect more).
+    `before` is a decoded cursor: (timestamp, ObjectId).
+    """
+    match = {
+        'conversation_key': conversation_key(user1_id, user2_id),
+        '$or': [
+            {'sender_id': user1_id, 'deleted_by_sender': False},
+            {'sender_id': user2_id, 'deleted_by_receiver': False},
+        ],
+    }
+    if before is not None:
+        timestamp, message_id = before
+        match = {'$and': [match, {'$or': [
+            {'timestamp': {'$lt': timestamp}},
+            {'timestamp': timestamp, '_id': {'$lt': message_id}},
+        ]}]}
+
+    return [
+        {'$match': match},
+        {'$sort': {'timestamp': -1, '_id': -1}},
+        {'$limit': limit + 1},
+        {'$project': {
+            '_id': 0,
+            'id': {'$toString': '$_id'},
+            'sender_id': 1,
+            'receiver_id': 1,
+            'sender': '$sender_id',
+            'receiver': '$receiver_id',
+            'timestamp': {'$dateToString': {'date': '$timestamp', 'format': ISO_TIMESTAMP_FORMAT}},
+            'is_read': 1,
+            'deleted_by_sender': 1,
+            'deleted_by_receiver': 1,
+            'is_revoked': 1,
+            'content': {'$cond': [
+                {'$eq': ['$is_revoked', True]},
+                {'$cond': [
+                    {'$eq': ['$sender_id', user1_id]},
+                    REVOKED_BY_VIEWER,
+                    REVOKED_FOR_VIEWER,
+                ]},
+                '$content',
+            ]},
+        }},
+    ]
+
+
+def get_conversation_page(user1_id, user2_id, before=None, limit=CONVERSATION_PAGE_SIZE):
+    """
+    One page of the conversation as seen by user1, newest page first:
+    returns (messages in ascending time order, cursor for the next older page or None).
+
+    Served by the (conversation_key, timestamp) index; the response shape
+    (string id, sender/receiver aliases, ISO timestamps, revoked placeholders) is
+    produced by the $project stage instead of per-document Python.
+    `before` is the cursor returned by the previous page.
+    """
+    pipeline, limit = page_request(user1_id, user2_id, before, limit)
+    return page_result(list(messages_collection.aggregate(pipeline)), limit)
+
+
+def page_request(user1_id, user2_id, before, limit):
+    """(pipeline, clamped limit) for a conversation page; raises ValueError on bad input."""
+    limit = max(1, min(int(limit), CONVERSATION_MAX_PAGE_SIZE))
+    pipeline = conversation_page_pipeline(
+        int(user1_id), int(user2_id), before=decode_cursor(before) if before else None, limit=limit
+    )
+    return pipeline, limit
+
+
+def page_result(messages, limit):
+    """(messages in ascending order, next_before) from the limit + 1 newest-first rows."""
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
+    next_before = encode_cursor(messages[0]) if has_more else None
+    return messages, next_before
+
 
 def get_last_message(user_id, other_user_id):
     """
@@ -91,20 +388,7 @@ def get_last_message(user_id, other_user_id):
     user_id: The "Viewer"
     other_user_id: The chat partner
     """
-    query = {
-        '$or': [
-            {
-                'sender_id': user_id, 
-                'receiver_id': other_user_id, 
-                'deleted_by_sender': False
-            },
-            {
-                'sender_id': other_user_id, 
-                'receiver_id': user_id, 
-                'deleted_by_receiver': False
-            }
-        ]
-    }
+    query = conversation_query(user_id, other_user_id)
     
     # Sort desc, limit 1
     doc = messages_collection.find_one(query, sort=[('timestamp', -1)])
@@ -112,60 +396,331 @@ def get_last_message(user_id, other_user_id):
         return doc['timestamp']
     return None
 
+def unread_query(receiver_id, sender_id=None):
+    """Unread messages TO receiver (optionally only those FROM sender) still visible to them."""
+    query = {
+        'receiver_id': int(receiver_id),
+        'is_read': False,
+        'deleted_by_receiver': False
+    }
+    if sender_id is not None:
+        query['sender_id'] = int(sender_id)
+    return query
+
 def get_unread_count(sender_id, receiver_id):
     """
     Count unread messages sent BY sender TO receiver.
     receiver_id is typically the current user.
     """
-    query = {
+    return messages_collection.count_documents(unread_query(receiver_id, sender_id))
+
+def conversation_stats_pipeline(user_id):
+    """Aggregation behind get_conversation_stats."""
+    return [
+        {'$match': {
+            '$or': [
+                {'sender_id': user_id, 'deleted_by_sender': False},
+                {'receiver_id': user_id, 'deleted_by_receiver': False},
+            ]
+        }},
+        {'$sort': {'timestamp': -1}},
+        {'$group': {
+            # The other side of the conversation
+            '_id': {'$cond': [{'$eq': ['$sender_id', user_id]}, '$receiver_id', '$sender_id']},
+            'last_message_time': {'$first': '$timestamp'},
+            'last_message': {'$first': {'$cond': [
+                {'$eq': ['$is_revoked', True]},
+                {'$cond': [{'$eq': ['$sender_id', user_id]}, REVOKED_BY_VIEWER, REVOKED_FOR_VIEWER]},
+                {'$substrCP': [{'$ifNull': ['$content', '']}, 0, PREVIEW_LENGTH]},
+            ]}},
+            'unread_count': {'$sum': {'$cond': [
+                {'$and': [
+                    {'$eq': ['$receiver_id', user_id]},
+                    {'$eq': ['$is_read', False]},
+                    {'$eq': ['$deleted_by_receiver', False]},
+                ]},
+                1,
+                0,
+            ]}},
+        }},
+        {'$sort': {'last_message_time': -1}},
+    ]
+
+def get_conversation_stats(user_id):
+    """
+    Per-partner chat stats computed from the raw messages, in one aggregation round trip.
+    Returns {partner_id: {'unread_count': int, 'last_message_time': datetime,
+    'last_message': preview}}, ordered by most recent message first.
+    Used to (re)build the conversation summaries.
+    Same visibility rules as get_last_message/get_unread_count: messages the user
+    deleted on their side are ignored.
+    """
+    pipeline = conversation_stats_pipeline(int(user_id))
+    return {
+        doc['_id']: {
+            'unread_count': doc['unread_count'],
+            'last_message_time': doc['last_message_time'],
+            'last_message': doc['last_message'],
+        }
+        for doc in messages_collection.aggregate(pipeline)
+    }
+
+def mark_read_query(sender_id, receiver_id):
+    # Same visibility as unread_query: messages the receiver deleted aren't on the counter
+    return {
         'sender_id': int(sender_id),
         'receiver_id': int(receiver_id),
         'is_read': False,
         'deleted_by_receiver': False
     }
-    return messages_collection.count_documents(query)
+
+def unread_decrement(sender_id, receiver_id, count):
+    """(filter, update) taking `count` messages off the receiver's unread counter."""
+    # Decrement by what was actually flipped so messages arriving meanwhile stay counted
+    return (
+        {'_id': conversation_key(sender_id, receiver_id)},
+        {'$inc': {f'unread.{int(receiver_id)}': -count}},
+    )
 
 def mark_as_read(sender_id, receiver_id):
-    query = {
-        'sender_id': int(sender_id),
-        'receiver_id': int(receiver_id),
-        'is_read': False
-    }
-    messages_collection.update_many(query, {'$set': {'is_read': True}})
+    result = messages_collection.update_many(mark_read_query(sender_id, receiver_id), {'$set': {'is_read': True}})
+    if result.modified_count:
+        conversations_collection.update_one(*unread_decrement(sender_id, receiver_id, result.modified_count))
+
+def delete_conversation_updates(user_id, target_user_id):
+    """[(filter, update)] hiding the whole conversation from user_id."""
+    return [
+        # Mark messages SENT by user as deleted_by_sender
+        (
+            {'sender_id': int(user_id), 'receiver_id': int(target_user_id)},
+            {'$set': {'deleted_by_sender': True}},
+        ),
+        # Mark messages RECEIVED by user as deleted_by_receiver
+        (
+            {'sender_id': int(target_user_id), 'receiver_id': int(user_id)},
+            {'$set': {'deleted_by_receiver': True}},
+        ),
+    ]
 
 def delete_conversation_local(user_id, target_user_id):
-    # Mark messages SENT by user as deleted_by_sender
-    messages_collection.update_many(
-        {'sender_id': int(user_id), 'receiver_id': int(target_user_id)},
-        {'$set': {'deleted_by_sender': True}}
-    )
-    # Mark messages RECEIVED by user as deleted_by_receiver
-    messages_collection.update_many(
-        {'sender_id': int(target_user_id), 'receiver_id': int(user_id)},
-        {'$set': {'deleted_by_receiver': True}}
-    )
+    for query, update in delete_conversation_updates(user_id, target_user_id):
+        messages_collection.update_many(query, update)
+    refresh_conversation(user_id, target_user_id, sides=[user_id])
 
-def delete_messages(message_ids, user_id, mode='local'):
-    # message_ids are strings (ObjectIds)
-    from bson.objectid import ObjectId
+def message_object_ids(message_ids):
+    """message_ids are strings (ObjectIds); None if any is invalid."""
     try:
-        obj_ids = [ObjectId(mid) for mid in message_ids]
-    except:
-        return # Invalid ID
+        return [ObjectId(mid) for mid in message_ids]
+    except (InvalidId, TypeError):
+        return None
+
+def touched_conversations_query(obj_ids, user_id):
+    """The user's messages among obj_ids, projected to the pair (to refresh summaries afterwards)."""
+    return (
+        {'_id': {'$in': obj_ids}, '$or': [{'sender_id': user_id}, {'receiver_id': user_id}]},
+        {'sender_id': 1, 'receiver_id': 1},
+    )
 
+def partner_of(doc, user_id):
+    return doc['receiver_id'] if doc['sender_id'] == user_id else doc['sender_id']
+
+def delete_messages_updates(obj_ids, user_id, mode='local'):
+    """[(filter, update)] for deleting messages locally or revoking them for everyone."""
     if mode == 'everyone':
         # Only for messages sent by user
-        query = {'_id': {'$in': obj_ids}, 'sender_id': int(user_id)}
-        messages_collection.update_many(query, {'$set': {'is_revoked': True}})
-    else:
-        # Local Delete
+        return [({'_id': {'$in': obj_ids}, 'sender_id': user_id}, {'$set': {'is_revoked': True}})]
+    # Local Delete
+    return [
         # Sent by user
-        messages_collection.update_many(
-            {'_id': {'$in': obj_ids}, 'sender_id': int(user_id)},
-            {'$set': {'deleted_by_sender': True}}
-        )
+        ({'_id': {'$in': obj_ids}, 'sender_id': user_id}, {'$set': {'deleted_by_sender': True}}),
         # Received by user
-        messages_collection.update_many(
-            {'_id': {'$in': obj_ids}, 'receiver_id': int(user_id)},
-            {'$set': {'deleted_by_receiver': True}}
+        ({'_id': {'$in': obj_ids}, 'receiver_id': user_id}, {'$set': {'deleted_by_receiver': True}}),
+    ]
+
+def refreshed_sides(user_id, mode):
+    # A revoke changes both sides' preview; a local delete only the user's
+    return None if mode == 'everyone' else [user_id]
+
+def delete_messages(message_ids, user_id, mode='local'):
+    obj_ids = message_object_ids(message_ids)
+    if obj_ids is None:
+        return # Invalid ID
+
+    user_id = int(user_id)
+    partners = {
+        partner_of(doc, user_id)
+        for doc in messages_collection.find(*touched_conversations_query(obj_ids, user_id))
+    }
+    for query, update in delete_messages_updates(obj_ids, user_id, mode):
+        messages_collection.update_many(query, update)
+    for partner_id in partners:
+        refresh_conversation(user_id, partner_id, sides=refreshed_sides(user_id, mode))
+
+
+# --- Conversation summaries ---
+# conversations: {_id: '3:7', users: [3, 7],
+#                 unread: {'3': n, '7': n}, last_time: {...}, preview: {...}}
+# Each side holds what that user sees (their deletions differ), so the user list
+# and the unread badge read these instead of counting messages.
+
+def _preview(content, sender_id, viewer_id, is_revoked=False):
+    if is_revoked:
+        return REVOKED_BY_VIEWER if sender_id == viewer_id else REVOKED_FOR_VIEWER
+    return (content or '')[:PREVIEW_LENGTH]
+
+def message_summary_update(message_doc):
+    """(filter, update) upserting the pair's summary for a newly saved message in one atomic update."""
+    sender_id = message_doc['sender_id']
+    receiver_id = message_doc['receiver_id']
+    preview = _preview(message_doc['content'], sender_id, receiver_id)
+    return (
+        {'_id': conversation_key(sender_id, receiver_id)},
+        {
+            '$setOnInsert': {'users': sorted({sender_id, receiver_id})},
+            '$set': {
+                f'last_time.{sender_id}': message_doc['timestamp'],
+                f'last_time.{receiver_id}': message_doc['timestamp'],
+                f'preview.{sender_id}': preview,
+                f'preview.{receiver_id}': preview,
+            },
+            '$inc': {f'unread.{receiver_id}': 1},
+        },
+    )
+
+def record_message(message_doc):
+    conversations_collection.update_one(*message_summary_update(message_doc), upsert=True)
+
+def refresh_conversation(user_id, other_id, sides=None):
+    """
+    Recomputes one or both sides of a pair's summary from the messages (after
+    deletes/revokes, where the latest visible message may have changed).
+    """
+    user_id = int(user_id)
+    other_id = int(other_id)
+    changes = {}
+    for viewer_id, partner_id in summary_sides(user_id, other_id, sides):
+        last = messages_collection.find_one(
+            conversation_query(viewer_id, partner_id), sort=[('timestamp', -1)]
+        )
+        unread = messages_collection.count_documents(unread_query(viewer_id, partner_id))
+        changes.update(side_summary(viewer_id, last, unread))
+    conversations_collection.update_one(*summary_replace(user_id, other_id, changes), upsert=True)
+
+def summary_sides(user_id, other_id, sides=None):
+    """[(viewer_id, partner_id)] for the sides of the pair to recompute."""
+    return [
+        (int(viewer_id), other_id if int(viewer_id) == user_id else user_id)
+        for viewer_id in (sides or [user_id, other_id])
+    ]
+
+def side_summary(viewer_id, last, unread):
+    """$set fields for one side, from its latest visible message (or None) and unread count."""
+    return {
+        f'unread.{viewer_id}': unread,
+        f'last_time.{viewer_id}': last['timestamp'] if last else None,
+        f'preview.{viewer_id}': (
+            _preview(last.get('content'), last['sender_id'], viewer_id, last.get('is_revoked')) if last else None
+        ),
+    }
+
+def summary_replace(user_id, other_id, changes):
+    return (
+        {'_id': conversation_key(user_id, other_id)},
+        {'$setOnInsert': {'users': sorted({user_id, other_id})}, '$set': changes},
+    )
+
+def get_conversation_summaries(user_id):
+    """
+    {partner_id: {'unread_count', 'last_message_time', 'last_message'}} for the user,
+    most recent first. One indexed read of the user's conversation documents.
+    """
+    user_id = int(user_id)
+    query, projection, sort = summaries_query(user_id)
+    cursor = conversations_collection.find(query, projection).sort(*sort)
+    return dict(summary_item(doc, user_id) for doc in cursor)
+
+def summaries_query(user_id):
+    """(filter, projection, sort) reading the user's side of every conversation."""
+    side = str(user_id)
+    return (
+        {'users': user_id},
+        {'users': 1, f'unread.{side}': 1, f'last_time.{side}': 1, f'preview.{side}': 1},
+        (f'last_time.{side}', -1),
+    )
+
+def summary_item(doc, user_id):
+    """(partner_id, summary) from a conversation document."""
+    side = str(user_id)
+    partner_id = next((uid for uid in doc['users'] if uid != user_id), user_id)
+    return partner_id, {
+        'unread_count': max(doc.get('unread', {}).get(side, 0), 0),
+        'last_message_time': doc.get('last_time', {}).get(side),
+        'last_message': doc.get('preview', {}).get(side),
+    }
+
+def get_total_unread(user_id):
+    """Unread messages to the user across all conversations (from the summaries)."""
+    return sum(summary['unread_count'] for summary in get_conversation_summaries(user_id).values())
+
+def rebuild_conversations():
+    """
+    Recomputes every summary document from the messages with one stats aggregation
+    per user. Documents are overwritten in place and the ones no longer backed by
+    messages are deleted afterwards, so chat lists never read an empty collection
+    mid-rebuild. Returns the number of summary documents written.
+    """
+    existing = {doc['_id'] for doc in conversations_collection.find({}, {'_id': 1})}
+    user_ids = set(messages_collection.distinct('sender_id')) | set(messages_collection.distinct('receiver_id'))
+    summaries = {}
+    for user_id in user_ids:
+        for partner_id, stats in get_conversation_stats(user_id).items():
+            key = conversation_key(user_id, partner_id)
+            # A side with no visible messages (deleted locally) is reset, not left stale
+            changes = summaries.setdefault(key, (
+                user_id, partner_id, {**side_summary(user_id, None, 0), **side_summary(partner_id, None, 0)}
+            ))[2]
+            changes.update({
+                f'unread.{user_id}': stats['unread_count'],
+                f'last_time.{user_id}': stats['last_message_time'],
+                f'preview.{user_id}': stats['last_message'],
+            })
+    for user_id, partner_id, changes in summaries.values():
+        conversations_collection.update_one(*summary_replace(user_id, partner_id, changes), upsert=True)
+
+    stale = list(existing - set(summaries))
+    for start in range(0, len(stale), REBUILD_DELETE_BATCH_SIZE):
+        conversations_collection.delete_many({'_id': {'$in': stale[start:start + REBUILD_DELETE_BATCH_SIZE]}})
+    return len(summaries)
+
+# Messages stored before conversation_key existed (paged history only matches keyed ones)
+UNKEYED_MESSAGES = {'conversation_key': {'$exists': False}}
+
+def backfill_conversation_keys(dry_run=False):
+    """
+    Sets conversation_key on messages that predate it, with one update_many per
+    (sender, receiver) pair. Returns (messages updated or, with dry_run, to update, pairs).
+    """
+    pairs = messages_collection.aggregate([
+        {'$match': UNKEYED_MESSAGES},
+        {'$group': {
+            '_id': {'sender_id': '$sender_id', 'receiver_id': '$receiver_id'},
+            'count': {'$sum': 1},
+        }},
+    ])
+    conversations = updated = 0
+    for pair in pairs:
+        sender_id = pair['_id']['sender_id']
+        receiver_id = pair['_id']['receiver_id']
+        conversations += 1
+        if dry_run:
+            updated += pair['count']
+            continue
+        result = messages_collection.update_many(
+            {'sender_id': sender_id, 'receiver_id': receiver_id, **UNKEYED_MESSAGES},
+            {'$set': {'conversation_key': conversation_key(sender_id, receiver_id)}},
         )
+        updated += result.modified_count
+    return updated, conversations
+
+def has_unkeyed_messages():
+    return messages_collection.find_one(UNKEYED_MESSAGES, {'_id': 1}) is not None
@@ -0,0 +1,132 @@
+import datetime
+import unittest
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from pymongo.errors import PyMongoError
+
+from . import mongo_client
+from .mongo_client import (
+    delete_conversation_local, delete_messages, get_conversation_page, get_conversation_stats,
+    get_conversation_summaries, mark_as_read, rebuild_conversations, save_message,
+)
+
+TEST_DB_NAME = f'test_{settings.MONGO_DB_NAME}'
+
+
+@override_settings(MONGO_DB_NAME=TEST_DB_NAME, MONGO_SERVER_SELECTION_TIMEOUT_MS=2000)
+class MongoTestCase(SimpleTestCase):
+    """Runs against a throwaway database on MONGO_URI; skipped when MongoDB is unreachable."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        mongo_client.reset_client()
+        try:
+            mongo_client.get_client().admin.command('ping')
+        except PyMongoError as exc:
+            mongo_client.reset_client()
+            super().tearDownClass()
+            raise unittest.SkipTest(f'MongoDB unreachable: {exc}')
+
+    @classmethod
+    def tearDownClass(cls):
+        mongo_client.get_client().drop_database(TEST_DB_NAME)
+        mongo_client.reset_client()
+        super().tearDownClass()
+
+    def setUp(self):
+        mongo_client.messages_collection.delete_many({})
+        mongo_client.conversations_collection.delete_many({})
+
+
+class ConversationCounterTests(MongoTestCase):
+    """The per-side unread.* counters in conversation summaries match a recount of the messages."""
+
+    def send(self, sender_id, receiver_id, count=1):
+        return [
+            save_message({'sender_id': sender_id, 'receiver_id': receiver_id, 'content': f'hello {i}'})['id']
+            for i in range(count)
+        ]
+
+    def unread_counts(self, user_ids):
+        return {
+            user_id: {
+                partner_id: summary['unread_count']
+                for partner_id, summary in get_conversation_summaries(user_id).items()
+            }
+            for user_id in user_ids
+        }
+
+    def assertCountersMatch(self, user_ids):
+        for user_id in user_ids:
+            stored = {
+                partner_id: summary['unread_count']
+                for partner_id, summary in get_conversation_summaries(user_id).items()
+                if summary['unread_count']
+            }
+            recount = {
+                partner_id: stats['unread_count']
+                for partner_id, stats in get_conversation_stats(user_id).items()
+                if stats['unread_count']
+            }
+            self.assertEqual(stored, recount, f'user {user_id}')
+
+    def test_counters_follow_send_read_and_delete(self):
+        self.send(1, 2, 3)
+        self.send(2, 1)
+        to_two = self.send(3, 2, 2)
+        self.assertCountersMatch([1, 2, 3])
+
+        mark_as_read(1, 2)
+        self.assertCountersMatch([1, 2, 3])
+
+        # An unread message the receiver deleted leaves their counter
+        delete_messages(to_two[:1], 2)
+        self.send(1, 2)
+        delete_conversation_local(2, 1)
+        self.assertCountersMatch([1, 2, 3])
+
+        # ...and marking the conversation read afterwards doesn't take it off twice
+        # (the badge clamps at zero, so only the next message shows the difference)
+        mark_as_read(3, 2)
+        self.send(3, 2)
+        self.assertCountersMatch([1, 2, 3])
+
+        delete_messages(self.send(3, 2), 3, mode='everyone')
+        self.assertCountersMatch([1, 2, 3])
+
+    def test_rebuild_reproduces_the_counters(self):
+        self.send(1, 2, 2)
+        self.send(3, 1)
+        delete_conversation_local(2, 1)
+        before = self.unread_counts([1, 2, 3])
+
+        mongo_client.conversations_collection.update_many({}, {'$set': {'unread.1': 99}})
+        mongo_client.conversations_collection.insert_one({'_id': '8:9', 'users': [8, 9], 'unread': {'8': 5}})
+        rebuild_conversations()
+
+        self.assertEqual(self.unread_counts([1, 2, 3]), before)
+        self.assertIsNone(mongo_client.conversations_collection.find_one({'_id': '8:9'}))
+        self.assertCountersMatch([1, 2, 3])
+
+
+class ConversationKeyBackfillTests(MongoTestCase):
+    """Paged history matches on conversation_key, which older messages lack until backfilled."""
+
+    def test_ensure_chat_indexes_keys_older_messages(self):
+        legacy = {
+            'sender_id': 1, 'receiver_id': 2, 'content': 'from before paging',
+            'timestamp': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc), 'is_read': True,
+            'deleted_by_sender': False, 'deleted_by_receiver': False, 'is_revoked': False,
+        }
+        mongo_client.messages_collection.insert_one(legacy)
+        save_message({'sender_id': 2, 'receiver_id': 1, 'content': 'new'})
+        self.assertEqual(len(get_conversation_page(1, 2)[0]), 1)
+
+        call_command('ensure_chat_indexes', '--skip-explain', stdout=StringIO())
+
+        messages, _ = get_conversation_page(1, 2)
+        self.assertEqual([message['content'] for message in messages], ['from before paging', 'new'])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import MessageViewSet
@@ -5,6 +6,19 @@ from .views import MessageViewSet
 router = DefaultRouter()
 router.register(r'', MessageViewSet, basename='message')
 
-urlpatterns = [
-    path('', include(router.urls)),
-]
+if getattr(settings, 'CHAT_ASYNC_VIEWS', False):
+    # Same endpoints as the router, as async views (serve through websitebackend.asgi)
+    from . import async_views
+
+    urlpatterns = [
+        path('', async_views.create, name='message-list'),
+        path('conversation/', async_views.conversation, name='message-conversation'),
+        path('users/', async_views.users, name='message-users'),
+        path('unread_count/', async_views.unread_count, name='message-unread-count'),
+        path('delete_conversation/', async_views.delete_conversation, name='message-delete-conversation'),
+        path('delete_messages/', async_views.delete_messages, name='message-delete-messages'),
+    ]
+else:
+    urlpatterns = [
+        path('', include(router.urls)),
+    ]
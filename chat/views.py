@@ -1,10 +1,13 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .mongo_client import save_message, get_conversation, get_last_message, get_unread_count, mark_as_read, delete_conversation_local, delete_messages as delete_messages_mongo
+from .mongo_client import CONVERSATION_PAGE_SIZE, save_message, get_conversation, get_conversation_page, get_conversation_summaries, get_total_unread, mark_as_read, delete_conversation_local, delete_messages as delete_messages_mongo
+from formapp.images import image_url
 from formapp.models import Staff
 from formapp.serializers import StaffSerializer
-import datetime 
+from formapp.sync import etag_for_payload, not_modified, with_validators
+
+CHAT_AVATAR_SIZE = 64
 
 class MessageViewSet(viewsets.ViewSet):
     """
@@ -47,6 +50,9 @@ class MessageViewSet(viewsets.ViewSet):
         """
         Get messages between user_id_1 and user_id_2
         usage: /api/chat/conversation/?user1=X&user2=Y
+        Paged: /api/chat/conversation/?user1=X&user2=Y&limit=50[&before=<next_before>]
+        returns the newest `limit` messages (ascending) and a cursor for older ones.
+        Without limit/before the full history is returned as a plain list (legacy).
         """
         u1 = request.query_params.get('user1')
         u2 = request.query_params.get('user2')
@@ -54,13 +60,24 @@ class MessageViewSet(viewsets.ViewSet):
         if not u1 or not u2:
             return Response({'error': 'Missing user1 or user2 params'}, status=status.HTTP_400_BAD_REQUEST)
 
-        msgs = get_conversation(u1, u2)
+        before = request.query_params.get('before')
+        limit = request.query_params.get('limit')
+        if before or limit:
+            try:
+                msgs, next_before = get_conversation_page(
+                    u1, u2, before=before, limit=limit or CONVERSATION_PAGE_SIZE
+                )
+            except ValueError:
+                return Response({'error': 'Invalid before or limit'}, status=status.HTTP_400_BAD_REQUEST)
+            response = Response({'results': msgs, 'next_before': next_before})
+        else:
+            response = Response(get_conversation(u1, u2))
         
         # Mark messages from u2 as read by u1 (assuming u1 is the requester)
         # In a real app we'd verify request.user
         mark_as_read(sender_id=u2, receiver_id=u1)
         
-        return Response(msgs)
+        return response
 
     @action(detail=False, methods=['get'])
     def users(self, request):
@@ -76,7 +93,7 @@ class MessageViewSet(viewsets.ViewSet):
                 current_user_id = int(current_user_id)
                 staffs = staffs.exclude(id=current_user_id)
             except ValueError:
-                pass # safely ignore invalid id
+                current_user_id = None # safely ignore invalid id
             
         # Optimization: Fetch basic fields
         is_polling = request.query_params.get('polling') == 'true'
@@ -85,41 +102,34 @@ class MessageViewSet(viewsets.ViewSet):
             fields_to_fetch.append('profile_image')
             
         staff_data = list(staffs.values(*fields_to_fetch))
+        if not is_polling:
+            # profile_image holds a storage path; hand out the small thumbnail URL
+            for s in staff_data:
+                s['profile_image'] = image_url(s['profile_image'], request, size=CHAT_AVATAR_SIZE)
         
         if current_user_id:
-            # Annotate with data from Mongo
+            # Annotate with data from Mongo: one indexed read of the user's
+            # conversation summaries, already ordered by most recent message
+            stats = get_conversation_summaries(current_user_id)
             for s in staff_data:
-                other_id = s['id']
+                partner = stats.get(s['id'], {})
                 # Unread count (Messages SENT by other_id TO current_user_id)
-                s['unread_count'] = get_unread_count(sender_id=other_id, receiver_id=current_user_id)
-                
-                # Last message time
-                s['last_message_time'] = get_last_message(current_user_id, other_id)
-            
-            
-            # Sort by last_message_time desc
-            # Handle both timezone-aware and naive datetimes
-            def sort_key(user):
-                ts = user.get('last_message_time')
-                if ts is None:
-                    # Return a very old date for users with no messages
-                    return datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
-                # If timestamp is already a datetime object, ensure it's timezone-aware
-                if isinstance(ts, datetime.datetime):
-                    if ts.tzinfo is None:
-                        ts = ts.replace(tzinfo=datetime.timezone.utc)
-                    return ts
-                # If it's a string (from ISO format), parse it
-                if isinstance(ts, str):
-                    try:
-                        return datetime.datetime.fromisoformat(ts.replace('Z', '+00:00'))
-                    except:
-                        return datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
-                return datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
-            
-            staff_data.sort(key=sort_key, reverse=True)
-            
-        return Response(staff_data)
+                s['unread_count'] = partner.get('unread_count', 0)
+                # Last message time and preview
+                s['last_message_time'] = partner.get('last_message_time')
+                s['last_message'] = partner.get('last_message')
+
+            # Sort by last_message_time desc; staff without messages keep their order at the end
+            rank = {partner_id: position for position, partner_id in enumerate(stats)}
+            staff_data.sort(key=lambda user: rank.get(user['id'], len(rank)))
+
+        # Unread counts live in Mongo, so there is no cheap watermark; hashing the
+        # payload still lets unchanged polls answer 304 with an empty body.
+        etag = etag_for_payload(request, staff_data)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        return with_validators(Response(staff_data), etag)
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
@@ -132,19 +142,8 @@ class MessageViewSet(viewsets.ViewSet):
         if not user_id:
              return Response({'error': 'Missing user_id param'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # We can sum up all unread messages for this receiver
-        # Implementation in mongo_client needed if we want TOTAL unread.
-        # For now, let's reuse the per-sender logic if the frontend iterates, 
-        # OR just return a sum if we modify mongo_client.
-        # Let's assume the frontend asks for specific or we add a 'total_unread' helper.
-        
-        # Quick fix: Count any unread message where receiver_id == user_id
-        from .mongo_client import messages_collection
-        total = messages_collection.count_documents({
-            'receiver_id': int(user_id), 
-            'is_read': False, 
-            'deleted_by_receiver': False
-        })
+        # Any unread message where receiver_id == user_id
+        total = get_total_unread(user_id)
         return Response({'count': total})
 
     @action(detail=False, methods=['post'])
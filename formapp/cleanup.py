@@ -0,0 +1,86 @@
+"""
+Set-based candidate selection for `manage.py cleanup_data`.
+
+Each pass is a queryset of lead ids chosen in SQL (window functions, not a Python
+loop per email). The ids are streamed in ascending primary-key order with a
+server-side cursor and deleted in bounded chunks via utils.delete_leads(), one short
+transaction per chunk, so progress survives interruption and can be resumed from
+the last id reported.
+"""
+from django.db.models import BigIntegerField, Exists, F, OuterRef, Window
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, RowNumber
+
+from .models import CollectionForm, Enquiry, OutboxMessage
+
+CLEANUP_CHUNK_SIZE = 1000
+
+
+def duplicate_candidates(model):
+    """
+    Every lead that shares its normalized email with a newer lead: the newest per
+    email (created_at, then id) is kept. Leads without an email are never grouped.
+    """
+    ranked = (
+        model.objects.filter(normalized_email__isnull=False)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('normalized_email')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ))
+        .filter(rank__gt=1)
+        .values('id')
+    )
+    return model.objects.filter(id__in=ranked)
+
+
+def awaiting_allocation(model):
+    """True for leads with a 'lead.allocate' outbox message (pending, or failed and kept for a retry)."""
+    messages = (
+        OutboxMessage.objects.filter(topic='lead.allocate', payload__model=model._meta.model_name)
+        .annotate(lead_id=Cast(KeyTextTransform('id', 'payload'), BigIntegerField()))
+        .filter(lead_id=OuterRef('pk'))
+    )
+    return Exists(messages)
+
+
+def orphan_candidates(model):
+    """
+    Leads with no assigned staff member. New submissions stay unassigned until
+    run_worker allocates them, so leads still waiting for that are kept.
+    """
+    return model.objects.filter(assigned_staff__isnull=True).exclude(awaiting_allocation(model))
+
+
+# pass name -> [(lead type, model, candidates)]
+CLEANUP_PASSES = {
+    'duplicates': [
+        ('student', CollectionForm, duplicate_candidates),
+    ],
+    'orphaned': [
+        ('student', CollectionForm, orphan_candidates),
+        ('enquiry', Enquiry, orphan_candidates),
+    ],
+}
+
+
+def iter_id_chunks(queryset, chunk_size=CLEANUP_CHUNK_SIZE, after_id=0):
+    """
+    Yields lists of at most `chunk_size` ids in ascending order, starting after
+    `after_id`. The candidate query runs once; rows deleted between chunks don't
+    disturb the cursor (Django holds server-side cursors across commits).
+    """
+    ids = (
+        queryset.filter(id__gt=after_id)
+        .order_by('id')
+        .values_list('id', flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    chunk = []
+    for lead_id in ids:
+        chunk.append(lead_id)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
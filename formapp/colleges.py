@@ -0,0 +1,134 @@
+"""
+Normalized college index (CollegeSelection) for CollectionForm.colleges_selected.
+
+colleges_selected is free text (a JSON list or a delimited string). It is parsed
+into one row per college with a normalized, indexed name, so organization
+portals look students up by exact index match instead of an ICONTAINS scan
+(which also matched "ABC College" inside "XYZ ABC College").
+"""
+import json
+import re
+import unicodedata
+
+from django.db import transaction
+
+from .models import CollectionForm, CollegeSelection, Organization
+
+COLLEGE_SPLIT_RE = re.compile(r'[,;|\n]+')
+NON_WORD_RE = re.compile(r'[^\w]+')
+MAX_JOINED_PARTS = 3
+INDEX_BATCH_SIZE = 1000
+
+
+def normalize_college(name):
+    """'  St. Joseph's  College ' -> 'st joseph s college'"""
+    name = unicodedata.normalize('NFKC', name or '').casefold()
+    return NON_WORD_RE.sub(' ', name).strip()
+
+
+def parse_colleges(text, known_names=frozenset()):
+    """
+    Returns [(display_name, normalized_name)] for a colleges_selected value, without
+    duplicates. Adjacent delimited parts are re-joined when together they form a
+    known organization name (e.g. "ABC College, Kochi").
+    """
+    if not text:
+        return []
+
+    parts = None
+    stripped = text.strip()
+    if stripped.startswith('['):
+        try:
+            decoded = json.loads(stripped)
+            if isinstance(decoded, list):
+                parts = [str(item) for item in decoded if item]
+        except ValueError:
+            pass
+    if parts is None:
+        parts = COLLEGE_SPLIT_RE.split(text)
+    parts = [part.strip() for part in parts if part and part.strip()]
+
+    colleges = []
+    seen = set()
+    index = 0
+    while index < len(parts):
+        size = 1
+        for candidate in range(min(MAX_JOINED_PARTS, len(parts) - index), 1, -1):
+            if normalize_college(' '.join(parts[index:index + candidate])) in known_names:
+                size = candidate
+                break
+        display = ', '.join(parts[index:index + size])
+        normalized = normalize_college(display)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            colleges.append((display[:255], normalized[:255]))
+        index += size
+    return colleges
+
+
+def organization_index():
+    """{normalized organization name: organization id}"""
+    return {
+        normalize_college(name): org_id
+        for org_id, name in Organization.objects.values_list('id', 'name')
+    }
+
+
+def index_forms(forms, org_index=None):
+    """
+    (Re)builds CollegeSelection rows for the given CollectionForm instances
+    with one DELETE and one bulk INSERT.
+    """
+    forms = [form for form in forms if form.pk]
+    if not forms:
+        return 0
+    if org_index is None:
+        org_index = organization_index()
+
+    rows = [
+        CollegeSelection(
+            form_id=form.pk,
+            organization_id=org_index.get(normalized),
+            college_name=display,
+            normalized_name=normalized,
+        )
+        for form in forms
+        for display, normalized in parse_colleges(form.colleges_selected, org_index.keys())
+    ]
+    with transaction.atomic():
+        CollegeSelection.objects.filter(form_id__in=[form.pk for form in forms]).delete()
+        CollegeSelection.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE)
+    return len(rows)
+
+
+def link_organization(organization, previous_name=None):
+    """Points index rows at an organization after it is created or renamed."""
+    if previous_name is not None and normalize_college(previous_name) != normalize_college(organization.name):
+        CollegeSelection.objects.filter(organization=organization).update(organization=None)
+    CollegeSelection.objects.filter(
+        normalized_name=normalize_college(organization.name)
+    ).update(organization=organization)
+
+
+def rebuild_college_index(batch_size=INDEX_BATCH_SIZE, after_id=0, progress=None):
+    """
+    Re-indexes every CollectionForm in primary-key chunks (each chunk its own
+    transaction). `after_id` resumes a previous run. Returns (forms, rows).
+    """
+    org_index = organization_index()
+    total_forms = total_rows = 0
+    last_id = after_id
+    while True:
+        chunk = list(
+            CollectionForm.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .only('id', 'colleges_selected')[:batch_size]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1].pk
+        total_rows += index_forms(chunk, org_index)
+        total_forms += len(chunk)
+        if progress:
+            progress(last_id, total_forms, total_rows)
+    return total_forms, total_rows
@@ -0,0 +1,235 @@
+"""
+Duplicate detection at intake.
+
+Every lead stores normalized contact keys (normalized_email, normalized_phone), both
+indexed, so "has this person submitted before?" is one index probe when the lead
+arrives instead of an after-the-fact cleanup pass. What happens to a resubmission
+is set by settings.LEAD_DUPLICATE_POLICY, overridable per request with
+?on_duplicate=:
+- reject: refuse it (409) and point at the existing lead
+- merge:  fold it into the existing lead (fill blank fields, merge extra_data,
+          append the new message, mark unread again so the assignee notices)
+- link:   keep it as its own row with duplicate_of -> the existing lead, handled by
+          the same staff member
+"""
+import re
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import CollectionForm, Enquiry
+
+DUPLICATE_POLICIES = ('reject', 'merge', 'link')
+DEFAULT_DUPLICATE_POLICY = 'link'
+
+# model -> (email field, phone field)
+CONTACT_FIELDS = {
+    CollectionForm: ('email', 'phone_number'),
+    Enquiry: ('email', 'phone'),
+}
+
+# Resubmitted text in these is appended rather than dropped when the lead is merged
+MERGE_APPEND_FIELDS = ('message',)
+# Workflow state stays with the existing lead
+MERGE_SKIP_FIELDS = ('assigned_staff', 'status', 'is_read', 'viewed_at', 'follow_up_date', 'duplicate_of')
+
+NON_DIGIT_RE = re.compile(r'\D+')
+PHONE_KEY_DIGITS = 10
+
+
+class DuplicateLead(Exception):
+    """Raised under the reject policy; `existing` is the lead already on file."""
+
+    def __init__(self, existing):
+        super().__init__(f"Duplicate of {existing._meta.model_name} {existing.pk}")
+        self.existing = existing
+
+
+def normalize_email(value):
+    value = (value or '').strip().casefold()
+    return value or None
+
+
+def normalize_phone(value):
+    """Digits only, national number (last 10 digits): '+91 98765-43210' -> '9876543210'."""
+    digits = NON_DIGIT_RE.sub('', value or '')
+    return digits[-PHONE_KEY_DIGITS:] or None
+
+
+def contact_keys(model, values):
+    """(normalized_email, normalized_phone) from a dict of field values."""
+    email_field, phone_field = CONTACT_FIELDS[model]
+    return normalize_email(values.get(email_field)), normalize_phone(values.get(phone_field))
+
+
+def assign_contact_keys(instance):
+    email_field, phone_field = CONTACT_FIELDS[type(instance)]
+    instance.normalized_email = normalize_email(getattr(instance, email_field))
+    instance.normalized_phone = normalize_phone(getattr(instance, phone_field))
+
+
+def duplicate_policy(request=None):
+    """?on_duplicate= when valid, else settings.LEAD_DUPLICATE_POLICY."""
+    if request is not None:
+        requested = request.GET.get('on_duplicate')
+        if requested in DUPLICATE_POLICIES:
+            return requested
+    return getattr(settings, 'LEAD_DUPLICATE_POLICY', DEFAULT_DUPLICATE_POLICY)
+
+
+def _contact_filter(emails, phones):
+    emails = [email for email in emails if email]
+    phones = [phone for phone in phones if phone]
+    if not emails and not phones:
+        return None
+    match = Q()
+    if emails:
+        match |= Q(normalized_email__in=emails)
+    if phones:
+        match |= Q(normalized_phone__in=phones)
+    return match
+
+
+def find_duplicate(model, email_key, phone_key):
+    """The oldest original (non-linked) lead sharing either key, or None. One indexed query."""
+    match = _contact_filter([email_key], [phone_key])
+    if match is None:
+        return None
+    return (
+        model.objects.filter(match, duplicate_of__isnull=True)
+        .order_by('created_at', 'id')
+        .first()
+    )
+
+
+def find_duplicates(model, leads):
+    """
+    Batch form of find_duplicate for unsaved instances (keys already assigned):
+    {(kind, key): original} from one indexed query.
+    """
+    match = _contact_filter(
+        [lead.normalized_email for lead in leads], [lead.normalized_phone for lead in leads]
+    )
+    if match is None:
+        return {}
+    found = {}
+    for original in model.objects.filter(match, duplicate_of__isnull=True).order_by('-created_at', '-id'):
+        # Iterating newest first so the oldest original wins each key
+        if original.normalized_email:
+            found[('email', original.normalized_email)] = original
+        if original.normalized_phone:
+            found[('phone', original.normalized_phone)] = original
+    return found
+
+
+def lookup_keys(lead):
+    keys = []
+    if lead.normalized_email:
+        keys.append(('email', lead.normalized_email))
+    if lead.normalized_phone:
+        keys.append(('phone', lead.normalized_phone))
+    return keys
+
+
+def merge_values(existing, values):
+    """
+    Folds a resubmission's field values into `existing` (unsaved): blank fields are
+    filled, new message text is appended, extra_data keys are merged (newest wins)
+    and the lead is marked unread.
+    Returns the names of the fields that changed.
+    """
+    changed = []
+    for name, value in values.items():
+        if name in MERGE_SKIP_FIELDS:
+            continue
+        if name == 'extra_data':
+            if value:
+                merged = dict(existing.extra_data or {})
+                merged.update(value)
+                if merged != existing.extra_data:
+                    existing.extra_data = merged
+                    changed.append(name)
+            continue
+        current = getattr(existing, name)
+        if name in MERGE_APPEND_FIELDS and value and current and value.strip() not in current:
+            setattr(existing, name, f"{current}\n\n{value}")
+            changed.append(name)
+        elif value not in (None, '') and current in (None, ''):
+            setattr(existing, name, value)
+            changed.append(name)
+    if existing.is_read:
+        existing.is_read = False
+        changed.append('is_read')
+    return changed
+
+
+def save_lead(serializer, policy):
+    """
+    Saves a validated CollectionForm/Enquiry serializer under the duplicate policy.
+    Returns (lead, outcome) with outcome 'created', 'linked' or 'merged'; raises
+    DuplicateLead for the reject policy. New unlinked leads still need allocating.
+    """
+    model = serializer.Meta.model
+    original = find_duplicate(model, *contact_keys(model, serializer.validated_data))
+    if original is None:
+        return serializer.save(), 'created'
+
+    if policy == 'reject':
+        raise DuplicateLead(original)
+    if policy == 'merge':
+        if merge_values(original, serializer.validated_data):
+            original.save()
+        return original, 'merged'
+    return serializer.save(duplicate_of=original, assigned_staff=original.assigned_staff), 'linked'
+
+
+def dedupe_batch(model, items, policy):
+    """
+    Applies the duplicate policy to a bulk intake batch of (index, validated_data).
+    Checks the whole batch against the table with one query, and against earlier
+    items in the same batch.
+    Returns (leads, batch_links, merged, errors):
+    - leads: unsaved instances to insert (linked ones already carry duplicate_of)
+    - batch_links: [(lead, earlier_lead)] for in-batch duplicates under link, to
+      pass to utils.bulk_create_leads() with the leads
+    - merged: originals updated by merge, still to be saved
+    - errors: rejected items in the bulk intake error format
+    """
+    pending = []
+    for index, values in items:
+        lead = model(**values)
+        assign_contact_keys(lead)
+        pending.append((index, values, lead))
+    originals = find_duplicates(model, [lead for _, _, lead in pending])
+
+    leads, batch_links, errors = [], [], []
+    merged = {}
+    earlier = {}
+    for index, values, lead in pending:
+        keys = lookup_keys(lead)
+        original = next((originals[key] for key in keys if key in originals), None)
+        first = next((earlier[key] for key in keys if key in earlier), None)
+        if original is None and first is None:
+            for key in keys:
+                earlier[key] = (index, lead)
+            leads.append(lead)
+            continue
+
+        if policy == 'reject':
+            reason = f"Duplicate of existing lead {original.pk}." if original else \
+                f"Duplicate of item {first[0]} in this request."
+            errors.append({"index": index, "errors": {"non_field_errors": [reason]}})
+        elif policy == 'merge':
+            target = original or first[1]
+            merge_values(target, values)
+            if original is not None:
+                merged[original.pk] = original
+        else:
+            if original is not None:
+                lead.duplicate_of = original
+                lead.assigned_staff_id = original.assigned_staff_id
+            else:
+                batch_links.append((lead, first[1]))
+            leads.append(lead)
+    return leads, batch_links, list(merged.values()), errors
+
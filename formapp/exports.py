@@ -0,0 +1,113 @@
+"""
+Streaming exports of leads (CSV / NDJSON).
+
+Rows are read with a server-side cursor (`iterator(chunk_size=...)`) as plain
+dicts and written one at a time, so memory stays flat whatever the table size.
+Shared by the `export/` endpoint and the `export_leads` management command.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import CharField, F, Func
+
+from .models import CollectionForm, Enquiry
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+LEAD_MODELS = {
+    'student': CollectionForm,
+    'enquiry': Enquiry,
+}
+
+
+class JSONObjectKeys(Func):
+    """Postgres `jsonb_object_keys()` - one output row per top-level key."""
+    function = 'jsonb_object_keys'
+    output_field = CharField()
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(model):
+    """Concrete model columns in declaration order, minus the packed extra_data and lookup-only columns."""
+    columns = []
+    for field in model._meta.concrete_fields:
+        if field.name in ('extra_data', 'search_vector', 'normalized_email', 'normalized_phone'):
+            continue
+        columns.append(field.attname)
+    return columns
+
+
+def extra_data_keys(queryset):
+    """Distinct extra_data keys across the queryset, computed in the database."""
+    if 'extra_data' not in {f.name for f in queryset.model._meta.concrete_fields}:
+        return []
+    return list(
+        queryset.annotate(key=JSONObjectKeys('extra_data'))
+        .order_by('key')
+        .values_list('key', flat=True)
+        .distinct()
+    )
+
+
+def iter_lead_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one flat dict per lead: model columns, `assigned_staff_name`
+    and the extra_data keys promoted to top-level (model columns win on clashes).
+    """
+    model = queryset.model
+    columns = export_columns(model)
+    has_extra = 'extra_data' in {f.name for f in model._meta.concrete_fields}
+    values = columns + (['extra_data'] if has_extra else [])
+
+    rows = (
+        queryset.order_by('created_at', 'id')
+        .annotate(assigned_staff_name=F('assigned_staff__name'))
+        .values(*values, 'assigned_staff_name')
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        extra = row.pop('extra_data', None) if has_extra else None
+        if extra and isinstance(extra, dict):
+            for key, value in extra.items():
+                row.setdefault(key, value)
+        yield row
+
+
+def stream_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield CSV lines: header first, then one line per lead."""
+    header = export_columns(queryset.model) + ['assigned_staff_name']
+    extra_keys = [k for k in extra_data_keys(queryset) if k not in header]
+    header += extra_keys
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in iter_lead_rows(queryset, chunk_size=chunk_size):
+        yield writer.writerow([_csv_value(row.get(column)) for column in header])
+
+
+def stream_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one JSON document per line."""
+    for row in iter_lead_rows(queryset, chunk_size=chunk_size):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(queryset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    if export_format == 'ndjson':
+        return stream_ndjson(queryset, chunk_size=chunk_size)
+    return stream_csv(queryset, chunk_size=chunk_size)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return value
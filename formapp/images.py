@@ -0,0 +1,107 @@
+"""
+Staff image storage helpers.
+
+Staff.profile_image / Staff.official_photo are stored as files (MEDIA_ROOT/staff_images/)
+with pre-rendered JPEG thumbnails next to them, so list and login payloads carry
+short URLs instead of multi-MB base64 strings.
+"""
+import base64
+import binascii
+import io
+import os
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+# Longest edge in pixels -> used as the thumbnail key in API payloads
+THUMBNAIL_SIZES = (64, 128, 256)
+THUMBNAIL_QUALITY = 85
+IMAGE_UPLOAD_DIR = 'staff_images/'
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def decode_base64_image(value, prefix='image'):
+    """
+    Turns a base64 string (optionally a `data:image/...;base64,` URL) into a
+    ContentFile with a unique name and the right extension.
+    Raises InvalidImage if the payload is not a decodable image.
+    """
+    if ';base64,' in value:
+        value = value.split(';base64,', 1)[1]
+    try:
+        raw = base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError):
+        raise InvalidImage('Image is not valid base64.')
+
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            image_format = (image.format or 'png').lower()
+    except (UnidentifiedImageError, OSError):
+        raise InvalidImage('Upload a valid image.')
+
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return ContentFile(raw, name=f"{prefix}_{uuid.uuid4().hex}.{extension}")
+
+
+def thumbnail_name(name, size):
+    """staff_images/abc.png -> staff_images/thumbs/128/abc.jpg"""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'thumbs', str(size), f"{stem}.jpg")
+
+
+def generate_thumbnails(name, storage=default_storage):
+    """Renders every THUMBNAIL_SIZES variant of a stored image (overwriting stale ones)."""
+    if not name:
+        return
+    with storage.open(name, 'rb') as handle, Image.open(handle) as image:
+        image.load()
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for size in THUMBNAIL_SIZES:
+            thumb = image.copy()
+            thumb.thumbnail((size, size))
+            buffer = io.BytesIO()
+            thumb.save(buffer, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+            target = thumbnail_name(name, size)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def thumbnail_urls(name, request=None, storage=default_storage):
+    """{size: url} for a stored image name; empty dict when there is no image."""
+    if not name:
+        return {}
+    return {
+        str(size): _absolute(storage.url(thumbnail_name(name, size)), request)
+        for size in THUMBNAIL_SIZES
+    }
+
+
+def image_url(name, request=None, size=None, storage=default_storage):
+    """URL of the original image, or of one thumbnail size."""
+    if not name:
+        return None
+    target = thumbnail_name(name, size) if size else name
+    return _absolute(storage.url(target), request)
+
+
+def delete_image_files(name, storage=default_storage):
+    """Removes an image and all of its thumbnails; missing files are ignored."""
+    if not name:
+        return
+    for target in [name] + [thumbnail_name(name, size) for size in THUMBNAIL_SIZES]:
+        try:
+            storage.delete(target)
+        except OSError:
+            pass
+
+
+def _absolute(url, request):
+    return request.build_absolute_uri(url) if request is not None else url
@@ -1,17 +1,25 @@
 """
 Django management command to clean up orphaned and duplicate data.
 
+Rows to remove are picked in SQL (window functions for duplicates) and deleted in
+primary-key chunks, one short transaction per chunk, with counters, dashboard stats
+and sync tombstones kept in step. Each chunk reports progress, throughput and the
+last id deleted; pass that id to --resume-after to continue an interrupted run.
+Unassigned leads still queued for auto allocation (run_worker) are not orphans.
+
 Usage:
     python manage.py cleanup_data --cleanup=duplicates     # Remove duplicate entries
     python manage.py cleanup_data --cleanup=orphaned       # Remove orphaned data
     python manage.py cleanup_data --cleanup=all            # Run all cleanups
+    python manage.py cleanup_data --dry-run                # Only count what would go
+    python manage.py cleanup_data --cleanup=orphaned --type=enquiry --resume-after=48210
 """
+import time
+
 from django.core.management.base import BaseCommand, CommandError
-from formapp.models import Staff, StaffDocument, CollectionForm, Enquiry
-from notifications.models import Notification
-from django.conf import settings
-from django.db.models import Count
-import os
+
+from formapp.cleanup import CLEANUP_CHUNK_SIZE, CLEANUP_PASSES, iter_id_chunks
+from formapp.utils import delete_leads
 
 
 class Command(BaseCommand):
@@ -25,88 +33,88 @@ class Command(BaseCommand):
             choices=['duplicates', 'orphaned', 'all'],
             help='Type of cleanup to perform'
         )
+        parser.add_argument(
+            '--type',
+            type=str,
+            default='all',
+            choices=['student', 'enquiry', 'all'],
+            help='Limit the cleanup to one lead type'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
             help='Show what would be deleted without actually deleting'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CLEANUP_CHUNK_SIZE,
+            help='Rows deleted per transaction'
+        )
+        parser.add_argument(
+            '--resume-after',
+            type=int,
+            default=0,
+            help='Skip candidates with an id up to this one (needs a single --cleanup and --type)'
+        )
 
     def handle(self, *args, **options):
         cleanup_type = options['cleanup']
         dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+
+        passes = [
+            (name, lead_type, model, candidates)
+            for name in (['duplicates', 'orphaned'] if cleanup_type == 'all' else [cleanup_type])
+            for lead_type, model, candidates in CLEANUP_PASSES[name]
+            if options['type'] in ('all', lead_type)
+        ]
+        if options['resume_after'] and len(passes) > 1:
+            raise CommandError('--resume-after needs a single pass: pick one --cleanup and --type')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
 
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN MODE - No data will be deleted'))
 
-        if cleanup_type in ['duplicates', 'all']:
-            self.cleanup_duplicates(dry_run)
-
-        if cleanup_type in ['orphaned', 'all']:
-            self.cleanup_orphaned(dry_run)
-
-        self.stdout.write(self.style.SUCCESS('✓ Cleanup complete'))
-
-    def cleanup_duplicates(self, dry_run=False):
-        """Remove duplicate CollectionForm entries by email"""
-        self.stdout.write('\n--- Cleaning Duplicate Entries ---')
-
-        duplicates = CollectionForm.objects.values('email').annotate(
-            count=Count('id')
-        ).filter(count__gt=1)
-
-        if not duplicates:
-            self.stdout.write(self.style.SUCCESS('  No duplicates found'))
-            return
-
         total_deleted = 0
-        for dup in duplicates:
-            email = dup['email']
-            entries = list(CollectionForm.objects.filter(
-                email=email
-            ).order_by('-created_at'))
-
-            if len(entries) > 1:
-                for entry in entries[1:]:  # Keep first, delete rest
-                    self.stdout.write(f"  {self.style.WARNING('DELETE')} {email} (ID: {entry.id})")
-                    if not dry_run:
-                        entry.delete()
-                    total_deleted += 1
-
-        self.stdout.write(self.style.SUCCESS(f'  Total deleted: {total_deleted}'))
-
-    def cleanup_orphaned(self, dry_run=False):
-        """Remove orphaned data with NULL assigned_staff"""
-        self.stdout.write('\n--- Cleaning Orphaned Data ---')
-
-        # Orphaned students
-        orphaned_students = CollectionForm.objects.filter(assigned_staff__isnull=True)
-        student_count = orphaned_students.count()
-        if student_count > 0:
-            self.stdout.write(f"  Found {student_count} orphaned students")
-            for student in orphaned_students:
-                self.stdout.write(
-                    f"    {self.style.WARNING('DELETE')} {student.first_name} {student.last_name} (ID: {student.id})"
-                )
-                if not dry_run:
-                    student.delete()
-            self.stdout.write(
-                self.style.SUCCESS(f"  Deleted {student_count} students")
+        for name, lead_type, model, candidates in passes:
+            total_deleted += self.run_pass(
+                name, lead_type, candidates(model), model,
+                options['chunk_size'], options['resume_after'], dry_run,
             )
 
-        # Orphaned enquiries
-        orphaned_enquiries = Enquiry.objects.filter(assigned_staff__isnull=True)
-        enquiry_count = orphaned_enquiries.count()
-        if enquiry_count > 0:
-            self.stdout.write(f"  Found {enquiry_count} orphaned enquiries")
-            for enquiry in orphaned_enquiries:
-                self.stdout.write(
-                    f"    {self.style.WARNING('DELETE')} {enquiry.name} (ID: {enquiry.id})"
-                )
-                if not dry_run:
-                    enquiry.delete()
+        verb = 'would delete' if dry_run else 'deleted'
+        self.stdout.write(self.style.SUCCESS(f'✓ Cleanup complete ({verb} {total_deleted} rows)'))
+
+    def run_pass(self, name, lead_type, queryset, model, chunk_size, after_id, dry_run):
+        self.stdout.write(f'\n--- Cleaning {name.capitalize()} ({lead_type}) ---')
+        if after_id:
+            queryset = queryset.filter(id__gt=after_id)
+
+        total = queryset.count()
+        if not total:
+            label = 'duplicates' if name == 'duplicates' else 'orphaned data'
+            self.stdout.write(self.style.SUCCESS(f'  No {label} found'))
+            return 0
+        self.stdout.write(f'  Found {total} rows')
+        if dry_run:
+            if self.verbosity >= 2:
+                for chunk in iter_id_chunks(queryset, chunk_size):
+                    self.stdout.write(f"  {self.style.WARNING('DELETE')} IDs {', '.join(map(str, chunk))}")
+            self.stdout.write(self.style.SUCCESS(f'  Would delete: {total}'))
+            return total
+
+        deleted = 0
+        started = time.monotonic()
+        for chunk in iter_id_chunks(queryset, chunk_size):
+            deleted += delete_leads(model, chunk)
+            elapsed = max(time.monotonic() - started, 1e-6)
             self.stdout.write(
-                self.style.SUCCESS(f"  Deleted {enquiry_count} enquiries")
+                f'  {deleted}/{total} ({deleted * 100 // total}%) deleted, '
+                f'{deleted / elapsed:.0f} rows/s, last id {chunk[-1]}'
             )
 
-        if student_count == 0 and enquiry_count == 0:
-            self.stdout.write(self.style.SUCCESS('  No orphaned data found'))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'  Total deleted: {deleted} in {elapsed:.1f}s'))
+        return deleted
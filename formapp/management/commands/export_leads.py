@@ -0,0 +1,68 @@
+"""
+Django management command to export leads as CSV or NDJSON.
+
+Streams rows with a server-side cursor, so memory use does not grow with the table.
+
+Usage:
+    python manage.py export_leads --type=student --format=csv --output=students.csv
+    python manage.py export_leads --type=enquiry --format=ndjson > enquiries.ndjson
+    python manage.py export_leads --type=student --staff-id=4
+"""
+from django.core.management.base import BaseCommand
+
+from formapp.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, LEAD_MODELS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream all collection forms or enquiries to a CSV/NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            type=str,
+            default='student',
+            choices=list(LEAD_MODELS),
+            help='Which leads to export'
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            default='csv',
+            choices=list(EXPORT_FORMATS),
+            help='Output format'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='File to write (defaults to stdout)'
+        )
+        parser.add_argument(
+            '--staff-id',
+            type=int,
+            help='Only export leads assigned to this staff member'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Rows fetched per round trip'
+        )
+
+    def handle(self, *args, **options):
+        queryset = LEAD_MODELS[options['type']].objects.all()
+        if options['staff_id']:
+            queryset = queryset.filter(assigned_staff_id=options['staff_id'])
+
+        lines = stream_export(queryset, options['format'], chunk_size=options['chunk_size'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        rows = -1 if options['format'] == 'csv' else 0  # don't count the CSV header
+        with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+            for line in lines:
+                handle.write(line)
+                rows += 1
+        self.stderr.write(self.style.SUCCESS(f"✓ Exported {max(rows, 0)} rows to {options['output']}"))
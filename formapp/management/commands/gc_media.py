@@ -0,0 +1,113 @@
+"""
+Django management command to delete media files nothing references any more.
+
+Mark-and-sweep over MEDIA_ROOT/staff_documents (StaffDocument.file) and
+MEDIA_ROOT/staff_images (Staff photos and their thumbnails): see formapp/media_gc.py.
+Only files older than the grace period are touched.
+
+Usage:
+    python manage.py gc_media                          # Sweep every root
+    python manage.py gc_media --root=staff_documents
+    python manage.py gc_media --dry-run                # Only report what would go
+    python manage.py gc_media --grace-hours=72 --workers=16
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+
+from formapp.media_gc import (
+    GC_BATCH_SIZE, GC_GRACE_HOURS, GC_ROOTS, GC_WORKERS, delete_files, find_garbage, referenced_names,
+)
+
+
+class Command(BaseCommand):
+    help = 'Delete unreferenced staff documents and images older than a grace period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root',
+            type=str,
+            default='all',
+            choices=sorted(GC_ROOTS) + ['all'],
+            help='Media directory to sweep'
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=GC_GRACE_HOURS,
+            help='Keep files modified within this many hours'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=GC_BATCH_SIZE,
+            help='Files deleted per batch'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=GC_WORKERS,
+            help='Threads scanning directories and deleting files'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report unreferenced files without deleting them'
+        )
+
+    def handle(self, *args, **options):
+        if options['grace_hours'] < 0:
+            raise CommandError('--grace-hours must not be negative')
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive')
+        try:
+            default_storage.path('')
+        except NotImplementedError:
+            raise CommandError('gc_media needs a local filesystem storage')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No files will be deleted'))
+
+        roots = sorted(GC_ROOTS) if options['root'] == 'all' else [options['root']]
+        grace = timedelta(hours=options['grace_hours'])
+        total_files = total_bytes = 0
+        for root in roots:
+            files, reclaimed = self.sweep(root, grace, options)
+            total_files += files
+            total_bytes += reclaimed
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {verb} {total_files} files, {filesizeformat(total_bytes)} reclaimed'
+        ))
+
+    def sweep(self, root, grace, options):
+        referenced = referenced_names(root)
+        garbage = list(find_garbage(root, referenced, grace=grace, workers=options['workers']))
+        self.stdout.write(f'{root}: {len(referenced)} referenced, {len(garbage)} unreferenced')
+        if not garbage:
+            return 0, 0
+
+        if options['dry_run']:
+            for media_file in garbage[:10]:
+                self.stdout.write(f'  - {media_file.name} ({filesizeformat(media_file.size)})')
+            if len(garbage) > 10:
+                self.stdout.write(f'  ... and {len(garbage) - 10} more')
+            return len(garbage), sum(media_file.size for media_file in garbage)
+
+        # Mark again: rows written during the sweep keep their files
+        referenced = referenced_names(root)
+        garbage = [media_file for media_file in garbage if media_file.name not in referenced]
+
+        deleted = reclaimed = 0
+        batch_size = options['batch_size']
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for start in range(0, len(garbage), batch_size):
+                files, size = delete_files(garbage[start:start + batch_size], pool)
+                deleted += files
+                reclaimed += size
+                self.stdout.write(f'  {deleted} deleted, {filesizeformat(reclaimed)} reclaimed')
+        return deleted, reclaimed
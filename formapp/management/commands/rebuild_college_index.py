@@ -0,0 +1,43 @@
+"""
+Django management command to rebuild the normalized college index (CollegeSelection).
+
+Re-parses CollectionForm.colleges_selected in primary-key batches, each in its own
+transaction. Use --after-id to resume an interrupted run from the last id printed.
+
+Usage:
+    python manage.py rebuild_college_index
+    python manage.py rebuild_college_index --batch-size=500
+    python manage.py rebuild_college_index --after-id=120000
+"""
+from django.core.management.base import BaseCommand
+
+from formapp.colleges import INDEX_BATCH_SIZE, rebuild_college_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the CollegeSelection index from CollectionForm.colleges_selected'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=INDEX_BATCH_SIZE,
+            help='Forms re-indexed per transaction'
+        )
+        parser.add_argument(
+            '--after-id',
+            type=int,
+            default=0,
+            help='Resume after this CollectionForm id'
+        )
+
+    def handle(self, *args, **options):
+        def progress(last_id, forms, rows):
+            self.stdout.write(f"  ... {forms} forms, {rows} colleges (last id {last_id})")
+
+        forms, rows = rebuild_college_index(
+            batch_size=options['batch_size'],
+            after_id=options['after_id'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"✓ Indexed {rows} colleges across {forms} forms"))
@@ -0,0 +1,50 @@
+"""
+Django management command to rebuild the dashboard LeadStats counters.
+
+Usage:
+    python manage.py rebuild_lead_stats           # Recount and replace all counters
+    python manage.py rebuild_lead_stats --check   # Compare counters to the lead tables only
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from formapp.models import LeadStats
+from formapp.stats import compute_lead_stats, rebuild_lead_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount dashboard LeadStats counters from the lead tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Report drift without rewriting the counters (exit code 1 on drift)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rows = rebuild_lead_stats()
+            self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {rows} LeadStats rows'))
+            return
+
+        fresh = compute_lead_stats()
+        stored = {
+            (row.staff_id, row.lead_type, row.status): (row.total, row.unread)
+            for row in LeadStats.objects.all()
+        }
+
+        drift = 0
+        for key in sorted(set(fresh) | set(stored), key=str):
+            expected = fresh.get(key, (0, 0))
+            actual = stored.get(key, (0, 0))
+            if expected != actual:
+                drift += 1
+                staff_id, lead_type, status = key
+                self.stdout.write(
+                    f"  {self.style.WARNING('DRIFT')} staff={staff_id or 'all'} {lead_type}/{status}: "
+                    f"stored total/unread={actual[0]}/{actual[1]} actual={expected[0]}/{expected[1]}"
+                )
+
+        if drift:
+            raise CommandError(f'{drift} counters drifted; run without --check to rebuild')
+        self.stdout.write(self.style.SUCCESS('✓ LeadStats match the lead tables'))
@@ -0,0 +1,57 @@
+"""
+Django management command to rebuild Staff.lead_count from the lead tables.
+
+lead_count is a denormalized counter used by allocate_staff(); this recounts
+assigned students + enquiries per staff member and reports any drift.
+
+Usage:
+    python manage.py reconcile_workload            # Fix drifted counters
+    python manage.py reconcile_workload --dry-run  # Only report drift
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from formapp.models import Staff
+
+
+class Command(BaseCommand):
+    help = 'Recount leads per staff member and repair drifted lead_count values'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without updating any counters'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No counters will be changed'))
+
+        with transaction.atomic():
+            # Lock the staff rows so allocations can't move counters mid-recount
+            staff_rows = list(
+                Staff.objects.select_for_update()
+                .with_workload()
+                .only('id', 'name', 'lead_count')
+                .order_by('id')
+            )
+
+            drifted = []
+            for staff in staff_rows:
+                actual = staff.students_total + staff.enquiries_total
+                if staff.lead_count != actual:
+                    self.stdout.write(
+                        f"  {self.style.WARNING('DRIFT')} {staff.name} (ID: {staff.id}): "
+                        f"counter={staff.lead_count} actual={actual} ({actual - staff.lead_count:+d})"
+                    )
+                    staff.lead_count = actual
+                    drifted.append(staff)
+
+            if drifted and not dry_run:
+                Staff.objects.bulk_update(drifted, ['lead_count'])
+
+        self.stdout.write(f'  Checked {len(staff_rows)} staff, {len(drifted)} drifted')
+        self.stdout.write(self.style.SUCCESS('✓ Reconciliation complete'))
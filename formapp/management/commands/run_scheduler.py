@@ -0,0 +1,106 @@
+"""
+Django management command to run the periodic job scheduler.
+
+Runs the jobs registered in formapp/scheduler.py when they fall due: follow-up
+reminders, the nightly LeadStats rollup and retention pruning (notifications,
+sync tombstones, job history). Safe to run on several nodes at once; each job
+is leased to one node per run. Reminders are pushed to clients from here, so
+EVENTS_BROKER must reach other processes (PostgresBroker).
+
+Usage:
+    python manage.py run_scheduler                            # Run until interrupted
+    python manage.py run_scheduler --once                     # Run what is due, then exit
+    python manage.py run_scheduler --job=follow_up_reminders  # Run one job now
+    python manage.py run_scheduler --list                     # Show schedule and last runs
+"""
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from formapp.models import JobRun, ScheduledJob
+from formapp.scheduler import JOBS, default_node, run_due, run_job, sync_jobs
+from websitebackend.events import require_cross_process_broker
+
+
+class Command(BaseCommand):
+    help = 'Run periodic jobs (follow-up reminders, stats rollup, retention) as they fall due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due and exit'
+        )
+        parser.add_argument(
+            '--job',
+            type=str,
+            choices=sorted(JOBS),
+            help='Run this job now, whether or not it is due, and exit'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Show each job with its next run and last run'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=30.0,
+            help='Seconds between checks for due jobs'
+        )
+
+    def handle(self, *args, **options):
+        sync_jobs()
+        if options['list']:
+            self.list_jobs()
+            return
+        try:
+            require_cross_process_broker('run_scheduler')
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        node = default_node()
+        if options['job']:
+            run = run_job(JOBS[options['job']], node, force=True)
+            if run is None:
+                raise CommandError(f"{options['job']} is running on another node")
+            self.report(run)
+            if run.status != 'success':
+                raise CommandError(f"{run.job.name} failed: {run.error}")
+            return
+
+        runs = 0
+        try:
+            while True:
+                for run in run_due(node):
+                    self.report(run)
+                    runs += 1
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Scheduler stopped ({runs} runs on {node})'))
+
+    def report(self, run):
+        line = f'{run.job.name}: {run.rows} rows in {run.duration_ms} ms'
+        if run.status == 'success':
+            self.stdout.write(f'  {line}')
+        else:
+            self.stdout.write(f"  {self.style.ERROR('FAILED')} {line} - {run.error}")
+
+    def list_jobs(self):
+        now = timezone.now()
+        for scheduled in ScheduledJob.objects.filter(name__in=JOBS).order_by('name'):
+            last = JobRun.objects.filter(job=scheduled).order_by('-started_at').first()
+            due = 'due' if scheduled.next_run_at <= now else f'next {scheduled.next_run_at:%Y-%m-%d %H:%M}'
+            lease = f', leased by {scheduled.lease_owner}' if scheduled.lease_owner else ''
+            last_run = (
+                f'last {last.started_at:%Y-%m-%d %H:%M} {last.status}, {last.rows} rows, {last.duration_ms} ms'
+                if last else 'never run'
+            )
+            self.stdout.write(f'  {scheduled.name} (every {JOBS[scheduled.name].every}): {due}{lease}; {last_run}')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(JOBS)} jobs registered'))
@@ -0,0 +1,80 @@
+"""
+Django management command to run the outbox worker.
+
+Drains formapp.OutboxMessage in batches: notifications for new leads, auto
+allocation of submitted leads and storage cleanup (see formapp/outbox.py).
+Failed messages are retried with exponential backoff. Several workers can run at
+once; each claims its own batch. Allocations and notifications are pushed to
+clients from here, so EVENTS_BROKER must reach other processes (PostgresBroker).
+
+Usage:
+    python manage.py run_worker                    # Run until interrupted
+    python manage.py run_worker --once             # Drain what is due, then exit
+    python manage.py run_worker --batch-size=500 --sleep=2
+"""
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from formapp.outbox import MAX_ATTEMPTS, OUTBOX_BATCH_SIZE, process_batch
+from websitebackend.events import require_cross_process_broker
+
+
+class Command(BaseCommand):
+    help = 'Process pending outbox messages (notifications, allocation, file cleanup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help='Messages claimed per transaction'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when nothing is due'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help='Attempts before a message is marked failed'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no message is due'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['max_attempts'] < 1:
+            raise CommandError('--max-attempts must be positive')
+        try:
+            require_cross_process_broker('run_worker')
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        total_handled = total_failed = 0
+        try:
+            while True:
+                handled, failed = process_batch(options['batch_size'], options['max_attempts'])
+                total_handled += handled
+                total_failed += failed
+                if handled or failed:
+                    self.stdout.write(f'  {handled} handled, {failed} failed')
+                if handled + failed < options['batch_size']:
+                    # Nothing (more) due right now
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Worker stopped ({total_handled} handled, {total_failed} failed attempts)'
+        ))
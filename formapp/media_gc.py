@@ -0,0 +1,115 @@
+"""
+Mark-and-sweep garbage collection of media files for `manage.py gc_media`.
+
+Mark: the file names a root's model fields reference are streamed from the
+database (values_list iterator, no model instances) into a set of storage names.
+Sweep: the root's directory tree is listed with os.scandir, one directory per
+task on a thread pool, and every file that isn't referenced and was last
+modified before the grace period becomes a candidate. References are marked
+again before anything is deleted, so a file a row started pointing at during
+the sweep survives; the rest are deleted in batches.
+
+The grace period covers uploads whose file is written before their row commits,
+and files queued for deletion by the outbox (formapp/outbox.py).
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .images import IMAGE_UPLOAD_DIR, THUMBNAIL_SIZES, thumbnail_name
+from .models import Staff, StaffDocument
+
+GC_GRACE_HOURS = 24
+GC_BATCH_SIZE = 500
+GC_WORKERS = 8
+REFERENCE_CHUNK_SIZE = 2000
+
+
+def _image_variants(name):
+    return [name] + [thumbnail_name(name, size) for size in THUMBNAIL_SIZES]
+
+
+# root directory (under MEDIA_ROOT) -> (model, file fields, referenced names of one stored value)
+GC_ROOTS = {
+    'staff_documents': (StaffDocument, ['file'], lambda name: [name]),
+    IMAGE_UPLOAD_DIR.rstrip('/'): (Staff, ['profile_image', 'official_photo'], _image_variants),
+}
+
+
+class MediaFile:
+    __slots__ = ('name', 'path', 'size')
+
+    def __init__(self, name, path, size):
+        self.name = name
+        self.path = path
+        self.size = size
+
+
+def _storage_name(path):
+    return os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+
+def referenced_names(root):
+    """Mark phase: every storage name under `root` the database points at."""
+    model, fields, expand = GC_ROOTS[root]
+    referenced = set()
+    for field in fields:
+        values = (
+            model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .order_by().values_list(field, flat=True)
+        )
+        for name in values.iterator(chunk_size=REFERENCE_CHUNK_SIZE):
+            referenced.update(expand(name))
+    return referenced
+
+
+def _scan_directory(path, referenced, cutoff):
+    """One sweep step: (subdirectories, unreferenced files older than `cutoff`) of `path`."""
+    subdirectories = []
+    candidates = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = _storage_name(entry.path)
+                    if name in referenced:
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime < cutoff:
+                        candidates.append(MediaFile(name, entry.path, stat.st_size))
+    except FileNotFoundError:
+        pass
+    return subdirectories, candidates
+
+
+def find_garbage(root, referenced, grace=timedelta(hours=GC_GRACE_HOURS), workers=GC_WORKERS):
+    """Sweep phase: yields unreferenced files under `root` older than `grace`, scanning directories in parallel."""
+    cutoff = (timezone.now() - grace).timestamp()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_scan_directory, os.path.join(settings.MEDIA_ROOT, root), referenced, cutoff)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirectories, candidates = future.result()
+                for path in subdirectories:
+                    pending.add(pool.submit(_scan_directory, path, referenced, cutoff))
+                yield from candidates
+
+
+def _remove(media_file):
+    try:
+        os.remove(media_file.path)
+    except FileNotFoundError:
+        return None
+    return media_file.size
+
+
+def delete_files(batch, pool):
+    """Removes a batch of files on the pool. Returns (files deleted, bytes reclaimed)."""
+    sizes = [size for size in pool.map(_remove, batch) if size is not None]
+    return len(sizes), sum(sizes)
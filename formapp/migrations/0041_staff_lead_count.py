@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_lead_count(apps, schema_editor):
+    Staff = apps.get_model('formapp', 'Staff')
+    CollectionForm = apps.get_model('formapp', 'CollectionForm')
+    Enquiry = apps.get_model('formapp', 'Enquiry')
+
+    def assigned(model):
+        counts = (
+            model.objects.filter(assigned_staff=OuterRef('pk'))
+            .order_by()
+            .values('assigned_staff')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Staff.objects.update(lead_count=assigned(CollectionForm) + assigned(Enquiry))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0040_organization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staff',
+            name='lead_count',
+            field=models.IntegerField(default=0, verbose_name='Assigned Lead Count'),
+        ),
+        migrations.RunPython(populate_lead_count, migrations.RunPython.noop),
+    ]
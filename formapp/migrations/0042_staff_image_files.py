@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0041_staff_lead_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staff',
+            name='profile_image_file',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to='staff_images/', verbose_name='Profile Image'),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='official_photo_file',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to='staff_images/', verbose_name='Official Staff Photo'),
+        ),
+    ]
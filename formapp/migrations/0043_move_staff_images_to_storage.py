@@ -0,0 +1,145 @@
+"""
+Decodes the base64 Staff.profile_image / Staff.official_photo blobs into files
+(plus thumbnails) under MEDIA_ROOT/staff_images/.
+
+Non-atomic and chunked: each batch of staff rows is converted and committed on its
+own, so a large table never holds every blob in memory or one long transaction.
+Rows that are already converted are skipped, so the migration can be re-run.
+
+A value that doesn't decode to an image is kept as-is in
+MEDIA_ROOT/legacy_staff_images/<field>_<staff id>.b64 (outside the gc_media roots),
+since 0044 drops the base64 columns; 0044 refuses to run while any value is
+neither converted nor exported.
+
+The decoding and thumbnail helpers are copied from formapp/images.py as they were
+when this migration was written, so later changes there don't alter it.
+"""
+import base64
+import binascii
+import io
+import logging
+import os
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import migrations, transaction
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+IMAGE_UPLOAD_DIR = 'staff_images/'
+LEGACY_EXPORT_DIR = 'legacy_staff_images/'
+THUMBNAIL_SIZES = (64, 128, 256)
+THUMBNAIL_QUALITY = 85
+
+FIELD_PAIRS = (
+    ('profile_image', 'profile_image_file', 'profile'),
+    ('official_photo', 'official_photo_file', 'official'),
+)
+
+
+def decode_base64_image(value, prefix):
+    """ContentFile for a base64 / data-URL image, or None if it isn't a decodable image."""
+    if ';base64,' in value:
+        value = value.split(';base64,', 1)[1]
+    try:
+        raw = base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            image_format = (image.format or 'png').lower()
+    except (UnidentifiedImageError, OSError):
+        return None
+    extension = 'jpg' if image_format == 'jpeg' else image_format
+    return ContentFile(raw, name=f"{prefix}_{uuid.uuid4().hex}.{extension}")
+
+
+def thumbnail_name(name, size):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'thumbs', str(size), f"{stem}.jpg")
+
+
+def generate_thumbnails(name):
+    with default_storage.open(name, 'rb') as handle, Image.open(handle) as image:
+        image.load()
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for size in THUMBNAIL_SIZES:
+            thumb = image.copy()
+            thumb.thumbnail((size, size))
+            buffer = io.BytesIO()
+            thumb.save(buffer, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+            target = thumbnail_name(name, size)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def export_name(source, staff_id):
+    return f"{LEGACY_EXPORT_DIR}{source}_{staff_id}.b64"
+
+
+def export_original(value, source, staff_id):
+    """Writes an undecodable value to storage unchanged; returns its storage name."""
+    name = export_name(source, staff_id)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(value.encode()))
+    return name
+
+
+def move_images(apps, schema_editor):
+    Staff = apps.get_model('formapp', 'Staff')
+    last_id = 0
+    while True:
+        ids = list(
+            Staff.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        with transaction.atomic():
+            # Load the blobs for this batch only
+            rows = Staff.objects.filter(id__in=ids).only(
+                'id', *[field for pair in FIELD_PAIRS for field in pair[:2]]
+            )
+            changed = []
+            for staff in rows:
+                dirty = False
+                for source, target, prefix in FIELD_PAIRS:
+                    value = getattr(staff, source)
+                    if not value or getattr(staff, target):
+                        continue
+                    content = decode_base64_image(value, prefix=f"{prefix}_{staff.id}")
+                    if content is None:
+                        name = export_original(value, source, staff.id)
+                        logger.warning("Unreadable %s for staff %s kept in %s", source, staff.id, name)
+                        continue
+                    name = default_storage.save(IMAGE_UPLOAD_DIR + content.name, content)
+                    generate_thumbnails(name)
+                    setattr(staff, target, name)
+                    dirty = True
+                if dirty:
+                    changed.append(staff)
+            if changed:
+                Staff.objects.bulk_update(changed, [pair[1] for pair in FIELD_PAIRS])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('formapp', '0042_staff_image_files'),
+    ]
+
+    operations = [
+        # One-way: the base64 columns are dropped in the next migration
+        migrations.RunPython(move_images, migrations.RunPython.noop),
+    ]
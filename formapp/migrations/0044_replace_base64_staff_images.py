@@ -0,0 +1,66 @@
+"""
+Drops the base64 Staff image columns once 0043 has moved them to storage.
+
+Every non-empty value must have been converted to a file or exported unchanged to
+MEDIA_ROOT/legacy_staff_images/ (unreadable images); otherwise this stops before
+dropping anything and lists the rows, so 0043 can be re-run first.
+"""
+from django.core.files.storage import default_storage
+from django.db import migrations
+from django.db.models import Q
+
+LEGACY_EXPORT_DIR = 'legacy_staff_images/'
+
+FIELD_PAIRS = (
+    ('profile_image', 'profile_image_file'),
+    ('official_photo', 'official_photo_file'),
+)
+
+
+def check_images_moved(apps, schema_editor):
+    Staff = apps.get_model('formapp', 'Staff')
+    missing = []
+    for source, target in FIELD_PAIRS:
+        pending = (
+            Staff.objects.exclude(Q(**{f'{source}__isnull': True}) | Q(**{source: ''}))
+            .filter(Q(**{f'{target}__isnull': True}) | Q(**{target: ''}))
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        for staff_id in pending.iterator():
+            if not default_storage.exists(f"{LEGACY_EXPORT_DIR}{source}_{staff_id}.b64"):
+                missing.append(f"{source} of staff {staff_id}")
+    if missing:
+        raise RuntimeError(
+            "Base64 images not yet moved to storage; re-run 0043 (`migrate formapp 0042`, "
+            "then `migrate`) before dropping them: " + ", ".join(missing)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0043_move_staff_images_to_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_images_moved, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='staff',
+            name='profile_image',
+        ),
+        migrations.RemoveField(
+            model_name='staff',
+            name='official_photo',
+        ),
+        migrations.RenameField(
+            model_name='staff',
+            old_name='profile_image_file',
+            new_name='profile_image',
+        ),
+        migrations.RenameField(
+            model_name='staff',
+            old_name='official_photo_file',
+            new_name='official_photo',
+        ),
+    ]
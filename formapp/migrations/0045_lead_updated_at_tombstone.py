@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0044_replace_base64_staff_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectionform',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated At'),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Updated At'),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50, verbose_name='Model')),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('staff_id', models.BigIntegerField(blank=True, null=True, verbose_name='Staff ID')),
+                ('reason', models.CharField(choices=[('deleted', 'Deleted'), ('reassigned', 'Reassigned')], default='deleted', max_length=20)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Deleted At')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model_name', 'deleted_at'], name='formapp_tom_model_n_f55131_idx'), models.Index(fields=['model_name', 'staff_id', 'deleted_at'], name='formapp_tom_model_n_122bc3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_lead_stats(apps, schema_editor):
+    LeadStats = apps.get_model('formapp', 'LeadStats')
+    counts = {}
+    for model_name, lead_type in (('CollectionForm', 'student'), ('Enquiry', 'enquiry')):
+        model = apps.get_model('formapp', model_name)
+        grouped = (
+            model.objects.order_by()
+            .values('assigned_staff_id', 'status')
+            .annotate(total=Count('id'), unread=Count('id', filter=Q(is_read=False)))
+        )
+        for row in grouped:
+            scopes = (None, row['assigned_staff_id']) if row['assigned_staff_id'] is not None else (None,)
+            for scope in scopes:
+                total, unread = counts.get((scope, lead_type, row['status']), (0, 0))
+                counts[(scope, lead_type, row['status'])] = (total + row['total'], unread + row['unread'])
+
+    LeadStats.objects.bulk_create([
+        LeadStats(staff_id=staff_id, lead_type=lead_type, status=status, total=total, unread=unread)
+        for (staff_id, lead_type, status), (total, unread) in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0045_lead_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lead_type', models.CharField(choices=[('student', 'Student'), ('enquiry', 'Enquiry')], max_length=10, verbose_name='Lead Type')),
+                ('status', models.CharField(max_length=20, verbose_name='Status')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('unread', models.IntegerField(default=0, verbose_name='Unread')),
+                ('staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lead_stats', to='formapp.staff', verbose_name='Staff')),
+            ],
+            options={
+                'verbose_name': 'Lead Stats',
+                'verbose_name_plural': 'Lead Stats',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('staff__isnull', False)), fields=('staff', 'lead_type', 'status'), name='unique_staff_lead_stats'), models.UniqueConstraint(condition=models.Q(('staff__isnull', True)), fields=('lead_type', 'status'), name='unique_global_lead_stats')],
+            },
+        ),
+        migrations.RunPython(populate_lead_stats, migrations.RunPython.noop),
+    ]
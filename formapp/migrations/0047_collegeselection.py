@@ -0,0 +1,111 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:38
+
+import json
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Parsing rules of formapp/colleges.py as of this migration (copied, not imported,
+# so later changes there don't change what this backfill does)
+COLLEGE_SPLIT_RE = re.compile(r'[,;|\n]+')
+NON_WORD_RE = re.compile(r'[^\w]+')
+MAX_JOINED_PARTS = 3
+
+
+def normalize_college(name):
+    name = unicodedata.normalize('NFKC', name or '').casefold()
+    return NON_WORD_RE.sub(' ', name).strip()
+
+
+def parse_colleges(text, known_names):
+    if not text:
+        return []
+
+    parts = None
+    stripped = text.strip()
+    if stripped.startswith('['):
+        try:
+            decoded = json.loads(stripped)
+            if isinstance(decoded, list):
+                parts = [str(item) for item in decoded if item]
+        except ValueError:
+            pass
+    if parts is None:
+        parts = COLLEGE_SPLIT_RE.split(text)
+    parts = [part.strip() for part in parts if part and part.strip()]
+
+    colleges = []
+    seen = set()
+    index = 0
+    while index < len(parts):
+        size = 1
+        for candidate in range(min(MAX_JOINED_PARTS, len(parts) - index), 1, -1):
+            if normalize_college(' '.join(parts[index:index + candidate])) in known_names:
+                size = candidate
+                break
+        display = ', '.join(parts[index:index + size])
+        normalized = normalize_college(display)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            colleges.append((display[:255], normalized[:255]))
+        index += size
+    return colleges
+
+
+def populate_college_index(apps, schema_editor):
+    CollectionForm = apps.get_model('formapp', 'CollectionForm')
+    CollegeSelection = apps.get_model('formapp', 'CollegeSelection')
+    Organization = apps.get_model('formapp', 'Organization')
+
+    org_index = {normalize_college(name): org_id for org_id, name in Organization.objects.values_list('id', 'name')}
+    last_id = 0
+    while True:
+        chunk = list(
+            CollectionForm.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('id', 'colleges_selected')[:BACKFILL_BATCH_SIZE]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        CollegeSelection.objects.bulk_create([
+            CollegeSelection(
+                form_id=form_id,
+                organization_id=org_index.get(normalized),
+                college_name=display,
+                normalized_name=normalized,
+            )
+            for form_id, colleges in chunk
+            for display, normalized in parse_colleges(colleges, org_index.keys())
+        ])
+
+
+class Migration(migrations.Migration):
+    # Each backfill chunk commits on its own
+    atomic = False
+
+    dependencies = [
+        ('formapp', '0046_leadstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollegeSelection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('college_name', models.CharField(max_length=255, verbose_name='College Name')),
+                ('normalized_name', models.CharField(max_length=255, verbose_name='Normalized Name')),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='college_selections', to='formapp.collectionform', verbose_name='Collection Form')),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='college_selections', to='formapp.organization', verbose_name='Organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['normalized_name', 'form'], name='formapp_col_normali_cc5307_idx'), models.Index(fields=['organization', 'form'], name='formapp_col_organiz_90ab8c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('form', 'normalized_name'), name='unique_form_college')],
+            },
+        ),
+        migrations.RunPython(populate_college_index, migrations.RunPython.noop),
+    ]
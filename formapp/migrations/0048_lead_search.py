@@ -0,0 +1,98 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:41
+
+from functools import reduce
+from operator import add
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 5000
+
+# formapp/search.py as of this migration (copied, not imported)
+SEARCH_CONFIG = 'simple'
+SEARCH_FIELDS = {
+    'CollectionForm': (
+        ('full_name', 'A'),
+        ('email', 'A'),
+        ('city', 'B'),
+        ('course_selected', 'B'),
+        ('notes', 'C'),
+    ),
+    'Enquiry': (
+        ('name', 'A'),
+        ('email', 'A'),
+        ('location', 'B'),
+        ('message', 'C'),
+    ),
+}
+
+
+def populate_search_vectors(apps, schema_editor):
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model('formapp', model_name)
+        vector = reduce(add, [
+            SearchVector(name, weight=weight, config=SEARCH_CONFIG) for name, weight in fields
+        ])
+        last_id = 0
+        while True:
+            ids = list(
+                model.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:BACKFILL_BATCH_SIZE]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            model.objects.filter(pk__gte=ids[0], pk__lte=last_id).update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+    # Each backfill chunk commits on its own; the GIN indexes are built once the
+    # vectors are filled in rather than maintained row by row during the backfill
+    atomic = False
+
+    dependencies = [
+        ('formapp', '0047_collegeselection'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='collectionform',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='collectionform',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='collectionform_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='collectionform',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['full_name'], name='collectionform_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='collectionform',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phone_number'], name='collectionform_phone_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='enquiry_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='enquiry_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phone'], name='enquiry_phone_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
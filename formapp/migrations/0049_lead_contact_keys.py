@@ -0,0 +1,100 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:43
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 2000
+
+# Contact key rules of formapp/dedupe.py as of this migration (copied, not imported)
+NON_DIGIT_RE = re.compile(r'\D+')
+PHONE_KEY_DIGITS = 10
+
+
+def normalize_email(value):
+    value = (value or '').strip().casefold()
+    return value or None
+
+
+def normalize_phone(value):
+    digits = NON_DIGIT_RE.sub('', value or '')
+    return digits[-PHONE_KEY_DIGITS:] or None
+
+
+def populate_contact_keys(apps, schema_editor):
+    for model_name, phone_field in (('CollectionForm', 'phone_number'), ('Enquiry', 'phone')):
+        model = apps.get_model('formapp', model_name)
+        last_id = 0
+        while True:
+            chunk = list(
+                model.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .only('id', 'email', phone_field)[:BACKFILL_BATCH_SIZE]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].pk
+            for lead in chunk:
+                lead.normalized_email = normalize_email(lead.email)
+                lead.normalized_phone = normalize_phone(getattr(lead, phone_field))
+            model.objects.bulk_update(chunk, ['normalized_email', 'normalized_phone'])
+
+
+class Migration(migrations.Migration):
+    # Each backfill chunk commits on its own
+    atomic = False
+
+    dependencies = [
+        ('formapp', '0048_lead_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectionform',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='formapp.collectionform', verbose_name='Duplicate Of'),
+        ),
+        migrations.AddField(
+            model_name='collectionform',
+            name='normalized_email',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='collectionform',
+            name='normalized_phone',
+            field=models.CharField(blank=True, editable=False, max_length=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='formapp.enquiry', verbose_name='Duplicate Of'),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='normalized_email',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='normalized_phone',
+            field=models.CharField(blank=True, editable=False, max_length=15, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='collectionform',
+            index=models.Index(fields=['normalized_email'], name='formapp_col_normali_7cffe0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collectionform',
+            index=models.Index(fields=['normalized_phone'], name='formapp_col_normali_460ec0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(fields=['normalized_email'], name='formapp_enq_normali_526c36_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(fields=['normalized_phone'], name='formapp_enq_normali_914c7c_idx'),
+        ),
+        migrations.RunPython(populate_contact_keys, migrations.RunPython.noop),
+    ]
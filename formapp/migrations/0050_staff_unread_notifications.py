@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:55
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_unread_notifications(apps, schema_editor):
+    Staff = apps.get_model('formapp', 'Staff')
+    Notification = apps.get_model('notifications', 'Notification')
+
+    unread = (
+        Notification.objects.filter(recipient=OuterRef('pk'), is_read=False, is_broadcast=False)
+        .order_by()
+        .values('recipient')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Staff.objects.update(unread_notifications=Coalesce(Subquery(unread, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0049_lead_contact_keys'),
+        ('notifications', '0002_notification_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staff',
+            name='unread_notifications',
+            field=models.IntegerField(default=0, verbose_name='Unread Notifications'),
+        ),
+        migrations.RunPython(populate_unread_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0051_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node', models.CharField(max_length=100, verbose_name='Node')),
+                ('started_at', models.DateTimeField(verbose_name='Started At')),
+                ('duration_ms', models.PositiveIntegerField(default=0, verbose_name='Duration (ms)')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Rows')),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed')], max_length=10, verbose_name='Status')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+            ],
+            options={
+                'verbose_name': 'Job Run',
+                'verbose_name_plural': 'Job Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Name')),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next Run At')),
+                ('lease_owner', models.CharField(blank=True, default='', max_length=100, verbose_name='Lease Owner')),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Lease Expires At')),
+                ('covered_until', models.DateTimeField(blank=True, null=True, verbose_name='Covered Until')),
+            ],
+            options={
+                'verbose_name': 'Scheduled Job',
+                'verbose_name_plural': 'Scheduled Jobs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='collectionform',
+            index=models.Index(condition=models.Q(('follow_up_date__isnull', False)), fields=['follow_up_date'], name='collectionform_follow_up_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(condition=models.Q(('follow_up_date__isnull', False)), fields=['follow_up_date'], name='enquiry_follow_up_idx'),
+        ),
+        migrations.AddField(
+            model_name='jobrun',
+            name='job',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='formapp.scheduledjob', verbose_name='Job'),
+        ),
+        migrations.AddIndex(
+            model_name='jobrun',
+            index=models.Index(fields=['job', '-started_at'], name='formapp_job_job_id_dc4095_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobrun',
+            index=models.Index(fields=['started_at'], name='formapp_job_started_e60812_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0052_scheduledjob_jobrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectionform',
+            name='follow_up_notified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='follow_up_notified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
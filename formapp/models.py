@@ -1,6 +1,68 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.core.validators import RegexValidator
 from django.contrib.auth.hashers import make_password, check_password
+from django.utils import timezone
+
+
+def _lead_count(related_model, **filters):
+    """Correlated COUNT of leads assigned to the outer Staff row."""
+    counts = (
+        related_model.objects.filter(assigned_staff=OuterRef('pk'), **filters)
+        .order_by()
+        .values('assigned_staff')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class StaffQuerySet(models.QuerySet):
+    def with_workload(self):
+        """
+        Annotate per-staff lead counts in the same SELECT as the staff rows.
+        Uses one correlated subquery per count (not JOIN + COUNT DISTINCT) so
+        students and enquiries never multiply into each other.
+        """
+        return self.annotate(
+            students_total=_lead_count(CollectionForm),
+            enquiries_total=_lead_count(Enquiry),
+            pending_students=_lead_count(CollectionForm, status='Pending'),
+            pending_enquiries=_lead_count(Enquiry, status='Pending'),
+            unread_students=_lead_count(CollectionForm, is_read=False),
+            unread_enquiries=_lead_count(Enquiry, is_read=False),
+        )
+
+
+class TrackedLeadMixin:
+    """
+    Remembers column values as loaded from the database so post_save receivers
+    can tell what changed (e.g. which staff member lost a lead on reassignment,
+    or which dashboard counters a status change moves).
+    """
+    tracked_fields = ('assigned_staff_id', 'status', 'is_read', 'colleges_selected')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_state()
+        return instance
+
+    def remember_state(self):
+        # Read __dict__ directly: getattr() on a deferred field would hit the database
+        self._loaded_state = {
+            name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__
+        }
+
+    def loaded_value(self, name, default=None):
+        return getattr(self, '_loaded_state', {}).get(name, default)
+
+    def has_loaded_value(self, name):
+        return name in getattr(self, '_loaded_state', {})
+
 
 class Staff(models.Model):
     name = models.CharField(max_length=100, verbose_name="Staff Name")
@@ -18,17 +80,30 @@ class Staff(models.Model):
     
     gender = models.CharField(max_length=10, blank=True, null=True, verbose_name="Gender")
     dob = models.DateField(blank=True, null=True, verbose_name="Date of Birth")
-    profile_image = models.TextField(blank=True, null=True, verbose_name="Profile Image (Base64)")
-    official_photo = models.TextField(blank=True, null=True, verbose_name="Official Staff Photo (Base64)") # Admin managed
+    # Stored as files with thumbnails (see formapp/images.py); the API still accepts base64 uploads
+    profile_image = models.ImageField(upload_to='staff_images/', max_length=255, blank=True, null=True, verbose_name="Profile Image")
+    official_photo = models.ImageField(upload_to='staff_images/', max_length=255, blank=True, null=True, verbose_name="Official Staff Photo") # Admin managed
     
     designation = models.CharField(max_length=100, blank=True, null=True, verbose_name="Designation")
     department = models.CharField(max_length=100, blank=True, null=True, verbose_name="Department")
     address = models.TextField(blank=True, null=True, verbose_name="Address")
     date_of_joining = models.DateField(blank=True, null=True, verbose_name="Date of Joining")
+
+    # Denormalized count of leads (students + enquiries) assigned to this staff member.
+    # Maintained by formapp.signals / formapp.utils; rebuilt by `manage.py reconcile_workload`.
+    lead_count = models.IntegerField(default=0, verbose_name="Assigned Lead Count")
+    # Denormalized count of unread direct notifications (broadcasts are counted on read).
+    # Maintained by notifications.signals / notifications.inbox.
+    unread_notifications = models.IntegerField(default=0, verbose_name="Unread Notifications")
     
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save; drives ETag/Last-Modified and ?changed_since= deltas
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
-    # student_count is calculated dynamically via the `student_count` property below
+    objects = StaffQuerySet.as_manager()
+
+    # student_count is calculated dynamically via the `student_count` property below,
+    # or read from the annotations added by Staff.objects.with_workload()
 
     def set_password(self, raw_password):
         self.password = make_password(raw_password)
@@ -38,7 +113,9 @@ class Staff(models.Model):
     
     @property
     def student_count(self):
-        # Count only active/assigned students?
+        # Prefer the with_workload() annotations when present (no extra queries)
+        if hasattr(self, 'students_total'):
+            return self.students_total + self.enquiries_total
         return self.assigned_students.count() + self.assigned_enquiries.count()
 
     def __str__(self):
@@ -53,7 +130,7 @@ class StaffDocument(models.Model):
     def __str__(self):
         return f"{self.document_name} - {self.staff.name}"
 
-class CollectionForm(models.Model):
+class CollectionForm(TrackedLeadMixin, models.Model):
     full_name = models.CharField(
         max_length=200,
         verbose_name="Full Name"
@@ -145,6 +222,9 @@ class CollectionForm(models.Model):
         verbose_name="Follow Up Date"
     )
 
+    # When the assignee was last reminded of follow_up_date (formapp/scheduler.py)
+    follow_up_notified_at = models.DateTimeField(null=True, blank=True, editable=False)
+
 
 
     course_selected = models.CharField(
@@ -186,6 +266,13 @@ class CollectionForm(models.Model):
         verbose_name="Created At"
     )
 
+    # Bumped on every save (bulk updates set it explicitly); see formapp/sync.py
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Updated At"
+    )
+
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
         ('In Progress', 'In Progress'),
@@ -210,6 +297,23 @@ class CollectionForm(models.Model):
         verbose_name="Viewed At"
     )
 
+    # Intake duplicate detection (see formapp/dedupe.py): normalized contact keys,
+    # set on every save, and the original lead when this one was linked to it
+    normalized_email = models.CharField(max_length=254, blank=True, null=True, editable=False)
+    normalized_phone = models.CharField(max_length=15, blank=True, null=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        verbose_name="Duplicate Of"
+    )
+
+    # Weighted full-text document over the searchable columns (see formapp/search.py).
+    # Written by the database from the row itself, never through the API.
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -218,6 +322,16 @@ class CollectionForm(models.Model):
             models.Index(fields=['assigned_staff']),
             models.Index(fields=['created_at']),
             models.Index(fields=['is_read', 'status']),  # Composite for common filters
+            models.Index(fields=['normalized_email']),
+            models.Index(fields=['normalized_phone']),
+            GinIndex(fields=['search_vector'], name='collectionform_search_gin'),
+            GinIndex(fields=['full_name'], name='collectionform_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['phone_number'], name='collectionform_phone_trgm', opclasses=['gin_trgm_ops']),
+            # Due follow-up reminders (formapp/scheduler.py) scan a follow_up_date range
+            models.Index(
+                fields=['follow_up_date'], name='collectionform_follow_up_idx',
+                condition=models.Q(follow_up_date__isnull=False),
+            ),
         ]
         verbose_name = "Collection Form Entry"
         verbose_name_plural = "Collection Form Entries"
@@ -226,7 +340,7 @@ class CollectionForm(models.Model):
         return f"{self.full_name} ({self.email or self.phone_number})"
 
 
-class Enquiry(models.Model):
+class Enquiry(TrackedLeadMixin, models.Model):
     name = models.CharField(
         max_length=100,
         verbose_name="Full Name"
@@ -289,6 +403,9 @@ class Enquiry(models.Model):
         verbose_name="Follow Up Date"
     )
 
+    # When the assignee was last reminded of follow_up_date (formapp/scheduler.py)
+    follow_up_notified_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     is_read = models.BooleanField(
         default=False,
         verbose_name="Is Read"
@@ -307,6 +424,30 @@ class Enquiry(models.Model):
         verbose_name="Created At"
     )
 
+    # Bumped on every save (bulk updates set it explicitly); see formapp/sync.py
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Updated At"
+    )
+
+    # Intake duplicate detection (see formapp/dedupe.py): normalized contact keys,
+    # set on every save, and the original lead when this one was linked to it
+    normalized_email = models.CharField(max_length=254, blank=True, null=True, editable=False)
+    normalized_phone = models.CharField(max_length=15, blank=True, null=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        verbose_name="Duplicate Of"
+    )
+
+    # Weighted full-text document over the searchable columns (see formapp/search.py).
+    # Written by the database from the row itself, never through the API.
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -314,6 +455,15 @@ class Enquiry(models.Model):
             models.Index(fields=['assigned_staff']),
             models.Index(fields=['created_at']),
             models.Index(fields=['is_read', 'status']),  # Composite for common filters
+            models.Index(fields=['normalized_email']),
+            models.Index(fields=['normalized_phone']),
+            GinIndex(fields=['search_vector'], name='enquiry_search_gin'),
+            GinIndex(fields=['name'], name='enquiry_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['phone'], name='enquiry_phone_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(
+                fields=['follow_up_date'], name='enquiry_follow_up_idx',
+                condition=models.Q(follow_up_date__isnull=False),
+            ),
         ]
         verbose_name = "Enquiry"
         verbose_name_plural = "Enquiries"
@@ -338,3 +488,197 @@ class Organization(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.login_id})"
+
+
+class CollegeSelection(models.Model):
+    """
+    One row per college a student selected, parsed from CollectionForm.colleges_selected
+    (see formapp/colleges.py). Organization portals query normalized_name by exact match.
+    """
+    form = models.ForeignKey(
+        CollectionForm,
+        on_delete=models.CASCADE,
+        related_name='college_selections',
+        verbose_name="Collection Form"
+    )
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='college_selections',
+        verbose_name="Organization"
+    )
+    college_name = models.CharField(max_length=255, verbose_name="College Name")
+    normalized_name = models.CharField(max_length=255, verbose_name="Normalized Name")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'normalized_name'], name='unique_form_college'),
+        ]
+        indexes = [
+            models.Index(fields=['normalized_name', 'form']),
+            models.Index(fields=['organization', 'form']),
+        ]
+
+    def __str__(self):
+        return f"{self.college_name} - {self.form_id}"
+
+
+class Tombstone(models.Model):
+    """
+    Records a lead leaving a list (deleted, or reassigned away from a staff member)
+    so ?changed_since= delta polls can tell clients which rows to drop.
+    Pruned after TOMBSTONE_RETENTION_DAYS (see formapp/sync.py).
+    """
+    REASON_CHOICES = [
+        ('deleted', 'Deleted'),
+        ('reassigned', 'Reassigned'),
+    ]
+    model_name = models.CharField(max_length=50, verbose_name="Model")
+    object_id = models.BigIntegerField(verbose_name="Object ID")
+    # The staff member whose list lost the row (assignee at the time)
+    staff_id = models.BigIntegerField(null=True, blank=True, verbose_name="Staff ID")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='deleted')
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Deleted At")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_name', 'deleted_at']),
+            models.Index(fields=['model_name', 'staff_id', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name}#{self.object_id} {self.reason}"
+
+
+class LeadStats(models.Model):
+    """
+    Incrementally maintained dashboard counters: one row per (scope, lead type, status).
+    staff = NULL is the global scope; every lead is counted there and, when assigned,
+    under its staff member. Maintained by formapp/stats.py; rebuilt by
+    `manage.py rebuild_lead_stats`.
+    """
+    LEAD_TYPE_CHOICES = [
+        ('student', 'Student'),
+        ('enquiry', 'Enquiry'),
+    ]
+    staff = models.ForeignKey(
+        Staff,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='lead_stats',
+        verbose_name="Staff"
+    )
+    lead_type = models.CharField(max_length=10, choices=LEAD_TYPE_CHOICES, verbose_name="Lead Type")
+    status = models.CharField(max_length=20, verbose_name="Status")
+    total = models.IntegerField(default=0, verbose_name="Total")
+    unread = models.IntegerField(default=0, verbose_name="Unread")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['staff', 'lead_type', 'status'],
+                condition=models.Q(staff__isnull=False),
+                name='unique_staff_lead_stats',
+            ),
+            models.UniqueConstraint(
+                fields=['lead_type', 'status'],
+                condition=models.Q(staff__isnull=True),
+                name='unique_global_lead_stats',
+            ),
+        ]
+        verbose_name = "Lead Stats"
+        verbose_name_plural = "Lead Stats"
+
+    def __str__(self):
+        return f"{self.staff_id or 'all'} {self.lead_type}/{self.status}: {self.total} ({self.unread} unread)"
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect (notification, allocation, file cleanup) recorded in the same
+    transaction as the write that caused it and carried out later by
+    `manage.py run_worker` (see formapp/outbox.py). Rows are deleted once handled;
+    ones that keep failing stay behind as 'failed' with the last error.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ]
+    topic = models.CharField(max_length=50, verbose_name="Topic")
+    payload = models.JSONField(default=dict, verbose_name="Payload")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Status")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Attempts")
+    # Not picked up before this time (retry backoff)
+    available_at = models.DateTimeField(default=timezone.now, verbose_name="Available At")
+    last_error = models.TextField(blank=True, default='', verbose_name="Last Error")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'], name='outbox_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+        verbose_name = "Outbox Message"
+        verbose_name_plural = "Outbox Messages"
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk} ({self.status})"
+
+
+class ScheduledJob(models.Model):
+    """
+    Schedule and lease state of a periodic job registered in formapp/scheduler.py.
+    A node runs a job only while it holds the lease (lease_owner until
+    lease_expires_at), so with `manage.py run_scheduler` on several nodes each
+    job still runs once per interval.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Name")
+    next_run_at = models.DateTimeField(default=timezone.now, verbose_name="Next Run At")
+    lease_owner = models.CharField(max_length=100, blank=True, default='', verbose_name="Lease Owner")
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Lease Expires At")
+    # End of the time window the last successful run covered (e.g. reminders sent up to here)
+    covered_until = models.DateTimeField(null=True, blank=True, verbose_name="Covered Until")
+
+    class Meta:
+        verbose_name = "Scheduled Job"
+        verbose_name_plural = "Scheduled Jobs"
+
+    def __str__(self):
+        return f"{self.name} (next {self.next_run_at:%Y-%m-%d %H:%M})"
+
+
+class JobRun(models.Model):
+    """One execution of a ScheduledJob: when, where, how long and how many rows it touched."""
+    STATUS_CHOICES = [
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+    job = models.ForeignKey(
+        ScheduledJob,
+        on_delete=models.CASCADE,
+        related_name='runs',
+        verbose_name="Job"
+    )
+    node = models.CharField(max_length=100, verbose_name="Node")
+    started_at = models.DateTimeField(verbose_name="Started At")
+    duration_ms = models.PositiveIntegerField(default=0, verbose_name="Duration (ms)")
+    rows = models.PositiveIntegerField(default=0, verbose_name="Rows")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name="Status")
+    error = models.TextField(blank=True, default='', verbose_name="Error")
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job', '-started_at']),
+            models.Index(fields=['started_at']),
+        ]
+        verbose_name = "Job Run"
+        verbose_name_plural = "Job Runs"
+
+    def __str__(self):
+        return f"{self.job_id} {self.started_at:%Y-%m-%d %H:%M} {self.status} ({self.rows} rows, {self.duration_ms} ms)"
@@ -0,0 +1,171 @@
+"""
+Transactional outbox for side effects that don't need to finish inside the request.
+
+enqueue() inserts an OutboxMessage in the caller's transaction, so the side effect
+is recorded if and only if the write that caused it commits. `manage.py run_worker`
+claims due messages one at a time (SELECT ... FOR UPDATE SKIP LOCKED, so several
+workers can run side by side), runs the handler registered for the topic and
+deletes the message, all in one short transaction per message, so the row locks
+a handler takes (e.g. Staff rows in allocate_staff) are released straight away.
+A handler that raises is retried with exponential backoff and marked 'failed'
+after MAX_ATTEMPTS.
+
+Handlers must tolerate running more than once (a crash after the side effect but
+before the commit re-delivers the message) and the target having gone away.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.signals import notifications_created
+
+from .images import delete_image_files
+from .models import CollectionForm, Enquiry, OutboxMessage, Staff
+from .utils import allocate_staff, notify_bulk_intake
+
+OUTBOX_BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 3600
+
+LEAD_MODELS = {
+    'collectionform': CollectionForm,
+    'enquiry': Enquiry,
+}
+
+# topic -> handler(payload)
+HANDLERS = {}
+
+
+def handler(topic):
+    def register(func):
+        HANDLERS[topic] = func
+        return func
+    return register
+
+
+def enqueue(topic, **payload):
+    """Records a side effect in the current transaction (payload must be JSON-serializable)."""
+    if topic not in HANDLERS:
+        raise ValueError(f"No outbox handler for {topic!r}")
+    return OutboxMessage.objects.create(topic=topic, payload=payload)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def process_one(now, max_attempts=MAX_ATTEMPTS):
+    """
+    Claims the next message due at `now`, handles it and deletes it (or schedules
+    the retry) in one transaction; the handler runs in a savepoint so its writes
+    roll back on failure. Returns True (handled), False (failed) or None (nothing due).
+    """
+    with transaction.atomic():
+        message = (
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now)
+            .order_by('available_at', 'id')
+            .first()
+        )
+        if message is None:
+            return None
+        try:
+            with transaction.atomic():
+                HANDLERS[message.topic](message.payload)
+        except Exception as exc:
+            message.attempts += 1
+            message.last_error = f"{type(exc).__name__}: {exc}"
+            if message.attempts >= max_attempts:
+                message.status = 'failed'
+            else:
+                message.available_at = timezone.now() + retry_delay(message.attempts)
+            message.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+            return False
+        message.delete()
+        return True
+
+
+def process_batch(batch_size=OUTBOX_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Handles up to `batch_size` messages that are due now. Returns (handled, failed) counts."""
+    now = timezone.now()
+    handled = failed = 0
+    for _ in range(batch_size):
+        outcome = process_one(now, max_attempts)
+        if outcome is None:
+            break
+        if outcome:
+            handled += 1
+        else:
+            failed += 1
+    return handled, failed
+
+
+# --- Handlers ---
+
+def _lead(payload):
+    return LEAD_MODELS[payload['model']].objects.filter(pk=payload['id']).select_related('assigned_staff').first()
+
+
+def _notify_assignee(lead):
+    if isinstance(lead, Enquiry):
+        title, body = "New Enquiry Assigned", f"You have been assigned enquiry: {lead.name}"
+    else:
+        title, body = "New Student Assigned", f"You have been assigned student: {lead.full_name}"
+    Notification.objects.create(recipient=lead.assigned_staff, title=title, body=body)
+
+
+@handler('lead.created')
+def lead_created(payload):
+    """
+    Notify admins about a new enquiry, and the assignee when the lead was assigned
+    at creation. Leads allocated afterwards are announced by lead.allocate.
+    """
+    lead = _lead(payload)
+    if lead is None:
+        return
+    if isinstance(lead, Enquiry):
+        notifications = Notification.objects.bulk_create([
+            Notification(recipient_id=admin_id, title="New Enquiry Received", body=f"New enquiry from {lead.name}")
+            for admin_id in Staff.objects.filter(login_id='admin').values_list('id', flat=True)
+        ])
+        notifications_created(notifications)
+    if payload.get('assigned') and lead.assigned_staff is not None:
+        _notify_assignee(lead)
+
+
+@handler('lead.allocate')
+def lead_allocate(payload):
+    """Auto-allocate a new lead (if nobody has picked it up meanwhile) and notify the assignee."""
+    lead = _lead(payload)
+    if lead is None or lead.assigned_staff_id is not None:
+        return
+    if allocate_staff(lead) is not None:
+        _notify_assignee(lead)
+
+
+@handler('leads.bulk_created')
+def leads_bulk_created(payload):
+    """Summary notifications for a bulk intake, per current assignee (and admins for enquiries)."""
+    model = LEAD_MODELS[payload['model']]
+    leads = model.objects.filter(pk__in=payload['ids'])
+    assigned = Counter(
+        leads.filter(assigned_staff__isnull=False).values_list('assigned_staff_id', flat=True)
+    )
+    notify_bulk_intake(model, list(leads.values_list('id', flat=True)), assigned)
+
+
+@handler('files.delete')
+def files_delete(payload):
+    """Storage cleanup: plain files, and images with their thumbnails. Missing files are ignored."""
+    for name in payload.get('files', []):
+        try:
+            default_storage.delete(name)
+        except OSError:
+            pass
+    for name in payload.get('images', []):
+        delete_image_files(name)
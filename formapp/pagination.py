@@ -0,0 +1,110 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (created_at, id), newest first.
+
+    Each page is a single index range scan on created_at, so page 1000 costs
+    the same as page 1 (OFFSET paging re-reads every skipped row).
+    Cursors are opaque base64 tokens; clients pass them back as ?cursor=.
+
+    Usage:
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = SomeSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+    ordering_field = 'created_at'
+
+    def __init__(self, ordering_field=None, page_size=None):
+        if ordering_field:
+            self.ordering_field = ordering_field
+        if page_size:
+            self.page_size = page_size
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, direction, obj):
+        value = getattr(obj, self.ordering_field)
+        payload = json.dumps([direction, value.isoformat(), obj.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, token):
+        try:
+            direction, value, pk = json.loads(base64.urlsafe_b64decode(token.encode()))
+            value = parse_datetime(value)
+            if direction not in ('n', 'p') or value is None:
+                raise ValueError
+            return direction, value, int(pk)
+        except (TypeError, ValueError, json.JSONDecodeError, UnicodeDecodeError):
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        field = self.ordering_field
+        size = self.get_page_size(request)
+        token = request.query_params.get(self.cursor_query_param)
+
+        direction, value, pk = ('n', None, None)
+        if token:
+            direction, value, pk = self.decode_cursor(token)
+
+        if direction == 'n':
+            # Newest first: rows strictly "older" than the cursor
+            if value is not None:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+                )
+            queryset = queryset.order_by(f'-{field}', '-pk')
+        else:
+            # Walking backwards: scan ascending from the cursor, then flip
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+            ).order_by(field, 'pk')
+
+        # Fetch one extra row to know whether another page exists
+        rows = list(queryset[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+
+        if direction == 'p':
+            rows.reverse()
+
+        self.next_cursor = None
+        self.previous_cursor = None
+        if rows:
+            if direction == 'n':
+                if has_more:
+                    self.next_cursor = self.encode_cursor('n', rows[-1])
+                if token:
+                    self.previous_cursor = self.encode_cursor('p', rows[0])
+            else:
+                self.next_cursor = self.encode_cursor('n', rows[-1])
+                if has_more:
+                    self.previous_cursor = self.encode_cursor('p', rows[0])
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_cursor,
+            'previous': self.previous_cursor,
+            'results': data,
+        })
@@ -0,0 +1,215 @@
+"""
+Periodic jobs run by `manage.py run_scheduler`.
+
+Jobs are registered with @job(name, every=...) and their schedule lives in
+ScheduledJob rows. Before running a job a node takes its lease with a single
+conditional UPDATE (due, and no live lease held by anyone), so with schedulers
+on several nodes each job still runs once per interval; a node that dies
+mid-run loses the lease when it expires. Every run is recorded as a JobRun with
+its duration and the number of rows it touched.
+
+A job is called as func(since, now) and returns its row count. `since` is where
+the last successful run's window ended (or one interval ago on the first run),
+so a failed or skipped run is caught up by the next one. Jobs manage their own
+transactions and must be safe to run again over the same window.
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from notifications.inbox import prune_batches, retention_cutoff
+from notifications.models import Notification
+from notifications.signals import notifications_created
+
+from .models import CollectionForm, Enquiry, JobRun, ScheduledJob, Tombstone
+from .stats import rebuild_lead_stats
+from .sync import TOMBSTONE_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE = timedelta(minutes=30)
+# A failed job is retried after this long, or its interval if that is shorter
+FAILED_RETRY = timedelta(minutes=5)
+REMINDER_BATCH_SIZE = 500
+RETENTION_BATCH_SIZE = 1000
+JOB_RUN_RETENTION_DAYS = 30
+
+
+class Job:
+    def __init__(self, name, func, every, lease=DEFAULT_LEASE):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.lease = lease
+
+
+# name -> Job
+JOBS = {}
+
+
+def job(name, every, lease=DEFAULT_LEASE):
+    def register(func):
+        JOBS[name] = Job(name, func, every, lease)
+        return func
+    return register
+
+
+def default_node():
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+def sync_jobs():
+    """Creates the ScheduledJob row of every registered job that doesn't have one (due now)."""
+    ScheduledJob.objects.bulk_create(
+        [ScheduledJob(name=name) for name in JOBS], ignore_conflicts=True
+    )
+
+
+def claim(name, node, lease, now, force=False):
+    """Takes the job's lease if it is due (or `force`) and nobody holds a live lease."""
+    claimable = ScheduledJob.objects.filter(name=name).filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+    )
+    if not force:
+        claimable = claimable.filter(next_run_at__lte=now)
+    return claimable.update(lease_owner=node, lease_expires_at=now + lease) == 1
+
+
+def run_job(scheduled, node, force=False):
+    """Runs one job if this node gets its lease. Returns the JobRun, or None if not run."""
+    now = timezone.now()
+    if not claim(scheduled.name, node, scheduled.lease, now, force=force):
+        return None
+    state = ScheduledJob.objects.get(name=scheduled.name)
+    since = state.covered_until or now - scheduled.every
+
+    started = time.monotonic()
+    try:
+        rows = scheduled.func(since, now) or 0
+    except Exception as exc:
+        logger.exception("Scheduled job %s failed", scheduled.name)
+        rows, status, error = 0, 'failed', f"{type(exc).__name__}: {exc}"
+        next_run_at = now + min(scheduled.every, FAILED_RETRY)
+        covered_until = F('covered_until')
+    else:
+        status, error = 'success', ''
+        next_run_at = now + scheduled.every
+        covered_until = now
+    duration_ms = int((time.monotonic() - started) * 1000)
+
+    # Only release a lease that is still ours (it may have expired and been taken over)
+    ScheduledJob.objects.filter(pk=state.pk, lease_owner=node).update(
+        lease_owner='', lease_expires_at=None, next_run_at=next_run_at, covered_until=covered_until
+    )
+    return JobRun.objects.create(
+        job=state, node=node, started_at=now, duration_ms=duration_ms,
+        rows=rows, status=status, error=error,
+    )
+
+
+def run_due(node):
+    """Runs every registered job that is due and not leased elsewhere. Returns the JobRuns."""
+    runs = []
+    for name in sorted(JOBS):
+        run = run_job(JOBS[name], node)
+        if run is not None:
+            runs.append(run)
+    return runs
+
+
+# --- Jobs ---
+
+# (model, name field, label) of leads with a follow_up_date
+FOLLOW_UP_SOURCES = [
+    (CollectionForm, 'full_name', 'student'),
+    (Enquiry, 'name', 'enquiry'),
+]
+
+
+def _remind(model, name_field, label, rows, now):
+    """Notifies one batch of due leads and marks them reminded, in one transaction."""
+    with transaction.atomic():
+        created = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=row['assigned_staff_id'],
+                title="Follow-up Due",
+                body=f"Follow up with {label} {row[name_field]} "
+                     f"(due {timezone.localtime(row['follow_up_date']):%d %b %H:%M})",
+            )
+            for row in rows
+        ])
+        notifications_created(created)
+        model.objects.filter(pk__in=[row['id'] for row in rows]).update(follow_up_notified_at=now)
+    return len(created)
+
+
+@job('follow_up_reminders', every=timedelta(minutes=5), lease=timedelta(minutes=10))
+def follow_up_reminders(since, now):
+    """
+    Notify assignees of leads whose follow_up_date fell due in (since, now]. Each
+    batch marks its leads follow_up_notified_at as it commits, so a run that fails
+    halfway doesn't remind them again; moving follow_up_date later re-arms the reminder.
+    """
+    sent = 0
+    for model, name_field, label in FOLLOW_UP_SOURCES:
+        due = (
+            model.objects.filter(
+                follow_up_date__gt=since, follow_up_date__lte=now, assigned_staff__isnull=False
+            )
+            .filter(Q(follow_up_notified_at__isnull=True) | Q(follow_up_notified_at__lt=F('follow_up_date')))
+            .order_by('id')
+            .values('id', 'assigned_staff_id', name_field, 'follow_up_date')
+        )
+        last_id = 0
+        while True:
+            rows = list(due.filter(id__gt=last_id)[:REMINDER_BATCH_SIZE])
+            if not rows:
+                break
+            sent += _remind(model, name_field, label, rows, now)
+            last_id = rows[-1]['id']
+    return sent
+
+
+@job('lead_stats_rollup', every=timedelta(days=1))
+def lead_stats_rollup(since, now):
+    """Recount the dashboard LeadStats counters, repairing any drift (see rebuild_lead_stats)."""
+    return rebuild_lead_stats()
+
+
+@job('notification_retention', every=timedelta(days=1))
+def notification_retention(since, now):
+    """Same pruning as `manage.py prune_notifications` with the default retention."""
+    deleted = 0
+    for deleted, _ in prune_batches(retention_cutoff(), RETENTION_BATCH_SIZE):
+        pass
+    return deleted
+
+
+def _delete_older(model, field, cutoff):
+    """Deletes rows with `field` before `cutoff` in primary-key batches. Returns the count."""
+    deleted = 0
+    while True:
+        ids = list(
+            model.objects.filter(**{f'{field}__lt': cutoff})
+            .order_by('id').values_list('id', flat=True)[:RETENTION_BATCH_SIZE]
+        )
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(id__in=ids).delete()[0]
+
+
+@job('tombstone_retention', every=timedelta(days=1))
+def tombstone_retention(since, now):
+    """Tombstones past the delta-sync window; clients that far behind get a 410 and reload anyway."""
+    return _delete_older(Tombstone, 'deleted_at', now - timedelta(days=TOMBSTONE_RETENTION_DAYS))
+
+
+@job('job_run_retention', every=timedelta(days=1))
+def job_run_retention(since, now):
+    return _delete_older(JobRun, 'started_at', now - timedelta(days=JOB_RUN_RETENTION_DAYS))
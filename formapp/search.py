@@ -0,0 +1,134 @@
+"""
+Server-side lead search (Postgres full-text + pg_trgm).
+
+Each lead model keeps a weighted `search_vector` (tsvector) over its text columns,
+GIN-indexed and refreshed in the same request as the write (post_save receiver,
+bulk intake). Queries combine three index-backed predicates:
+- prefix full-text match ("joh kochi" -> 'joh:* & kochi:*') for as-you-type
+- trigram similarity on the name, which tolerates typos
+- substring match on the phone number (trigram GIN also serves LIKE '%...%')
+and order by ts_rank + name similarity.
+"""
+import re
+from functools import reduce
+from operator import add
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Q
+
+from .models import CollectionForm, Enquiry
+
+# 'simple' keeps names, places and college names as typed (no English stemming/stop words)
+SEARCH_CONFIG = 'simple'
+
+# (field, weight) - A: identity, B: where/what, C: free text
+SEARCH_FIELDS = {
+    CollectionForm: (
+        ('full_name', 'A'),
+        ('email', 'A'),
+        ('city', 'B'),
+        ('course_selected', 'B'),
+        ('notes', 'C'),
+    ),
+    Enquiry: (
+        ('name', 'A'),
+        ('email', 'A'),
+        ('location', 'B'),
+        ('message', 'C'),
+    ),
+}
+
+# (name field, phone field) - both carry gin_trgm_ops indexes
+TRIGRAM_FIELDS = {
+    CollectionForm: ('full_name', 'phone_number'),
+    Enquiry: ('name', 'phone'),
+}
+
+SEARCH_TERM_RE = re.compile(r'\w+')
+MAX_SEARCH_TERMS = 8
+MIN_QUERY_LENGTH = 2
+MIN_PHONE_DIGITS = 4
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# Ranked results are paged by OFFSET; deep pages mean the query needs refining
+SEARCH_MAX_OFFSET = 1000
+
+
+def searchable_fields(model):
+    return [name for name, _ in SEARCH_FIELDS[model]]
+
+
+def search_vector(model):
+    """The weighted tsvector expression stored in `search_vector`."""
+    return reduce(add, [
+        SearchVector(name, weight=weight, config=SEARCH_CONFIG)
+        for name, weight in SEARCH_FIELDS[model]
+    ])
+
+
+def update_search_vectors(model, ids):
+    """Recomputes search_vector in the database for the given primary keys (one UPDATE)."""
+    ids = [pk for pk in ids if pk is not None]
+    if ids:
+        model.objects.filter(pk__in=ids).update(search_vector=search_vector(model))
+
+
+def search_terms(text):
+    return SEARCH_TERM_RE.findall((text or '').casefold())[:MAX_SEARCH_TERMS]
+
+
+def prefix_query(terms):
+    """'joh kochi' -> to_tsquery('joh:* & kochi:*'); terms are \\w+ so nothing needs escaping."""
+    return SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG
+    )
+
+
+def phrase_query(terms, weights=''):
+    """
+    Adjacent terms in order, optionally limited to lexemes of the given weights
+    (e.g. 'BC' = Enquiry location/message): 'abc college' -> 'abc:BC <-> college:BC'.
+    """
+    suffix = f':{weights}' if weights else ''
+    return SearchQuery(
+        ' <-> '.join(f'{term}{suffix}' for term in terms), search_type='raw', config=SEARCH_CONFIG
+    )
+
+
+def search_queryset(queryset, text):
+    """
+    Filters `queryset` to leads matching `text` and annotates `score`, best first.
+    Returns an empty queryset for queries that are too short to be selective.
+    """
+    text = (text or '').strip()
+    if len(text) < MIN_QUERY_LENGTH:
+        return queryset.none()
+
+    model = queryset.model
+    name_field, phone_field = TRIGRAM_FIELDS[model]
+
+    match = Q(**{f'{name_field}__trigram_similar': text})
+    score = TrigramSimilarity(name_field, text)
+
+    terms = search_terms(text)
+    if terms:
+        query = prefix_query(terms)
+        match |= Q(search_vector=query)
+        score = score + SearchRank(F('search_vector'), query)
+
+    digits = ''.join(ch for ch in text if ch.isdigit())
+    if len(digits) >= MIN_PHONE_DIGITS:
+        match |= Q(**{f'{phone_field}__contains': digits})
+
+    return (
+        queryset.filter(match)
+        .annotate(score=score)
+        .order_by('-score', '-created_at', '-id')
+    )
+
+
+def search_page(queryset, page, page_size):
+    """(rows, has_more) for a 1-based page of an already ranked queryset."""
+    offset = (page - 1) * page_size
+    rows = list(queryset[offset:offset + page_size + 1])
+    return rows[:page_size], len(rows) > page_size
@@ -1,26 +1,102 @@
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
+from .images import InvalidImage, decode_base64_image, generate_thumbnails, thumbnail_urls
 from .models import CollectionForm, Enquiry, Staff, StaffDocument, Organization
+from .outbox import enqueue
+
+
+class Base64ImageField(serializers.ImageField):
+    """
+    ImageField that also accepts the base64 / data-URL strings the portal sends.
+    An empty string or null clears the image; sending back an existing URL keeps it.
+    Output is the file URL.
+    """
+
+    @staticmethod
+    def is_echoed_url(value):
+        # Raw base64 can start with '/' too (JPEG data is "/9j/..."), so only our media URLs count
+        return value.startswith(settings.MEDIA_URL) or urlparse(value).scheme in ('http', 'https')
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and self.is_echoed_url(data):
+            # The client echoed back the URL we gave it: leave the stored image alone
+            raise serializers.SkipField()
+        if isinstance(data, str):
+            try:
+                data = decode_base64_image(data, prefix=self.field_name)
+            except InvalidImage as exc:
+                raise serializers.ValidationError(str(exc))
+        return super().to_internal_value(data)
+
+    def validate_empty_values(self, data):
+        if data == '':
+            return (True, None)
+        return super().validate_empty_values(data)
+
 
 class StaffSerializer(serializers.ModelSerializer):
+    IMAGE_FIELDS = ('profile_image', 'official_photo')
+
     password = serializers.CharField(write_only=True)
     student_count = serializers.ReadOnlyField()
+    # Populated only when the queryset comes from Staff.objects.with_workload()
+    workload = serializers.SerializerMethodField()
+    profile_image = Base64ImageField(required=False, allow_null=True)
+    official_photo = Base64ImageField(required=False, allow_null=True)
+    profile_image_thumbnails = serializers.SerializerMethodField()
+    official_photo_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Staff
-        fields = ['id', 'name', 'email', 'login_id', 'password', 'active_status', 'role', 'student_count', 'created_at', 'phone', 'gender', 'dob', 'profile_image', 'official_photo', 'secondary_phone', 'designation', 'department', 'address', 'date_of_joining']
+        fields = ['id', 'name', 'email', 'login_id', 'password', 'active_status', 'role', 'student_count', 'workload', 'created_at', 'phone', 'gender', 'dob', 'profile_image', 'profile_image_thumbnails', 'official_photo', 'official_photo_thumbnails', 'secondary_phone', 'designation', 'department', 'address', 'date_of_joining']
+
+    def get_profile_image_thumbnails(self, obj):
+        return thumbnail_urls(obj.profile_image.name, self.context.get('request'))
+
+    def get_official_photo_thumbnails(self, obj):
+        return thumbnail_urls(obj.official_photo.name, self.context.get('request'))
+
+    def get_workload(self, obj):
+        if not hasattr(obj, 'students_total'):
+            return None
+        return {
+            'students': obj.students_total,
+            'enquiries': obj.enquiries_total,
+            'pending': obj.pending_students + obj.pending_enquiries,
+            'unread': obj.unread_students + obj.unread_enquiries,
+        }
 
     def create(self, validated_data):
         password = validated_data.pop('password')
         staff = Staff(**validated_data)
         staff.set_password(password)
         staff.save()
+        self._refresh_thumbnails(staff, validated_data)
         return staff
     
     def update(self, instance, validated_data):
         if 'password' in validated_data:
             password = validated_data.pop('password')
             instance.set_password(password)
-        return super().update(instance, validated_data)
+        replaced = [
+            getattr(instance, field).name for field in self.IMAGE_FIELDS
+            if field in validated_data and getattr(instance, field)
+        ]
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if replaced:
+                # Old files are removed by the outbox worker once the update commits
+                enqueue('files.delete', images=replaced)
+        self._refresh_thumbnails(instance, validated_data)
+        return instance
+
+    def _refresh_thumbnails(self, staff, validated_data):
+        for field in self.IMAGE_FIELDS:
+            if validated_data.get(field):
+                generate_thumbnails(getattr(staff, field).name)
 
 class StaffDocumentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -32,7 +108,8 @@ class CollectionFormSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CollectionForm
-        fields = '__all__'
+        exclude = ['search_vector', 'normalized_email', 'normalized_phone', 'follow_up_notified_at']
+        read_only_fields = ['duplicate_of']
         extra_kwargs = {
             'email': {'validators': []}, 
         }
@@ -83,7 +160,8 @@ class EnquirySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Enquiry
-        fields = '__all__'
+        exclude = ['search_vector', 'normalized_email', 'normalized_phone', 'follow_up_notified_at']
+        read_only_fields = ['duplicate_of']
 
     def validate(self, attrs):
         # If status is being updated and is NOT 'Follow Up', clear the date
@@ -94,10 +172,15 @@ class EnquirySerializer(serializers.ModelSerializer):
 
 class OrganizationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
+    # Only present when the queryset is annotated (org_list ?with_counts=true)
+    student_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Organization
-        fields = ['id', 'name', 'login_id', 'password', 'active_status', 'created_at']
+        fields = ['id', 'name', 'login_id', 'password', 'active_status', 'created_at', 'student_count']
+
+    def get_student_count(self, obj):
+        return getattr(obj, 'student_count', None)
 
     def create(self, validated_data):
         password = validated_data.pop('password')
@@ -1,53 +1,116 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import CollectionForm, Enquiry, Notification, Staff
+from .colleges import index_forms, link_organization
+from .dedupe import assign_contact_keys
+from .models import CollectionForm, Enquiry, Organization
+from .outbox import enqueue
+from .search import searchable_fields, update_search_vectors
+from .stats import StatsDelta, lead_state, loaded_lead_state
+from .utils import adjust_lead_counts, record_tombstones
 
 
+@receiver(post_save, sender=CollectionForm)
 @receiver(post_save, sender=Enquiry)
-def notify_new_enquiry(sender, instance, created, **kwargs):
+def enqueue_new_lead(sender, instance, created, **kwargs):
     """
-    On creation: notify admins and the assigned staff member about the new enquiry.
-    Assignment notifications are only sent on creation to avoid duplicate alerts on
-    subsequent updates.
+    On creation: record the new-lead notifications (admins for enquiries, the
+    assignee when assigned at creation) in the outbox, in the saving transaction.
+    `manage.py run_worker` sends them off the request path.
     """
     if not created:
         return
+    enqueue(
+        'lead.created',
+        model=sender._meta.model_name,
+        id=instance.pk,
+        assigned=instance.assigned_staff_id is not None,
+    )
+
 
-    # Notify all admin users
-    admins = Staff.objects.filter(login_id='admin')
-    for admin in admins:
-        Notification.objects.create(
-            recipient=admin,
-            title="New Enquiry Received",
-            message=f"New enquiry from {instance.name}",
-            link="/portal/enquiries",
-            type="System",
-        )
-
-    # Notify the assigned staff member (set by auto-allocation at creation time)
-    if instance.assigned_staff:
-        Notification.objects.create(
-            recipient=instance.assigned_staff,
-            title="New Enquiry Assigned",
-            message=f"You have been assigned enquiry: {instance.name}",
-            link="/portal/enquiries",
-            type="Assignment",
-        )
+# --- Duplicate detection keys ---
 
+@receiver(pre_save, sender=CollectionForm)
+@receiver(pre_save, sender=Enquiry)
+def set_contact_keys(sender, instance, **kwargs):
+    assign_contact_keys(instance)
+
+
+# --- College index (CollegeSelection) ---
 
 @receiver(post_save, sender=CollectionForm)
-def notify_new_student(sender, instance, created, **kwargs):
+def index_colleges_on_save(sender, instance, created, update_fields=None, **kwargs):
     """
-    On creation: notify the assigned staff member about the new student form.
+    Re-parse colleges_selected when it changes. Connected before track_lead_on_save,
+    which resets the remembered state this compares against.
     """
-    if not created or not instance.assigned_staff:
+    if update_fields is not None and 'colleges_selected' not in update_fields:
         return
+    if created or not instance.has_loaded_value('colleges_selected') or \
+            instance.loaded_value('colleges_selected') != instance.colleges_selected:
+        index_forms([instance])
+
 
-    Notification.objects.create(
-        recipient=instance.assigned_staff,
-        title="New Student Assigned",
-        message=f"You have been assigned student: {instance.full_name}",
-        link="/portal/students",
-        type="Assignment",
+@receiver(pre_save, sender=Organization)
+def remember_organization_name(sender, instance, **kwargs):
+    instance._previous_name = (
+        Organization.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+        if instance.pk else None
     )
+
+
+@receiver(post_save, sender=Organization)
+def link_organization_on_save(sender, instance, **kwargs):
+    link_organization(instance, previous_name=getattr(instance, '_previous_name', None))
+
+
+# --- Full-text search vectors ---
+
+@receiver(post_save, sender=CollectionForm)
+@receiver(post_save, sender=Enquiry)
+def refresh_search_vector(sender, instance, update_fields=None, **kwargs):
+    # Saves that only touch assignment/status columns leave the document unchanged
+    if update_fields is not None and not set(update_fields) & set(searchable_fields(sender)):
+        return
+    update_search_vectors(sender, [instance.pk])
+
+
+# --- Staff.lead_count, dashboard LeadStats and delta-sync tombstone bookkeeping ---
+# Bulk paths (queryset.update / bulk_create / bulk_update) bypass these receivers
+# and apply the same bookkeeping themselves (see formapp/utils.py).
+
+@receiver(post_save, sender=CollectionForm)
+@receiver(post_save, sender=Enquiry)
+def track_lead_on_save(sender, instance, created, **kwargs):
+    """
+    Move one unit of workload from the previous assignee (if any) to the new one,
+    and shift the dashboard counters from the old (staff, status, read) state to the new.
+    """
+    new_staff_id = instance.assigned_staff_id
+    stats = StatsDelta()
+    if created:
+        adjust_lead_counts({new_staff_id: 1})
+        stats.move(sender, None, lead_state(instance))
+    else:
+        old_state = loaded_lead_state(instance)
+        # Instances built by hand (never loaded) can't be diffed;
+        # reconcile_workload / rebuild_lead_stats fix any drift.
+        if old_state is not None:
+            old_staff_id = old_state[0]
+            if old_staff_id != new_staff_id:
+                adjust_lead_counts({old_staff_id: -1, new_staff_id: 1})
+                if old_staff_id is not None:
+                    record_tombstones(sender, [(instance.pk, old_staff_id)], reason='reassigned')
+            stats.move(sender, old_state, lead_state(instance))
+    stats.apply()
+    instance.remember_state()
+
+
+@receiver(post_delete, sender=CollectionForm)
+@receiver(post_delete, sender=Enquiry)
+def track_lead_on_delete(sender, instance, **kwargs):
+    adjust_lead_counts({instance.assigned_staff_id: -1})
+    record_tombstones(sender, [(instance.pk, instance.assigned_staff_id)])
+    stats = StatsDelta()
+    stats.move(sender, lead_state(instance), None)
+    stats.apply()
@@ -0,0 +1,166 @@
+"""
+Incrementally maintained dashboard counters (LeadStats).
+
+Every lead contributes +1 total (and +1 unread while is_read is False) to the row
+for its (lead type, status), once in the global scope and once under its assignee.
+Changes are applied as deltas with UPDATE ... SET total = total + n, so the
+dashboard reads a handful of tiny rows instead of counting the lead tables.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+
+from .models import CollectionForm, Enquiry, LeadStats
+
+LEAD_TYPES = {
+    CollectionForm: 'student',
+    Enquiry: 'enquiry',
+}
+
+
+class StatsDelta:
+    """Accumulates total/unread deltas keyed by (staff_id or None, lead_type, status)."""
+
+    def __init__(self):
+        self.total = Counter()
+        self.unread = Counter()
+
+    def add(self, model, staff_id, status, is_read, sign=1):
+        lead_type = LEAD_TYPES[model]
+        scopes = (None, staff_id) if staff_id is not None else (None,)
+        for scope in scopes:
+            key = (scope, lead_type, status)
+            self.total[key] += sign
+            if not is_read:
+                self.unread[key] += sign
+
+    def move(self, model, old_state, new_state):
+        """old_state/new_state: (staff_id, status, is_read); either may be None."""
+        if old_state == new_state:
+            return
+        if old_state is not None:
+            self.add(model, *old_state, sign=-1)
+        if new_state is not None:
+            self.add(model, *new_state, sign=1)
+
+    def apply(self):
+        for key in set(self.total) | set(self.unread):
+            d_total, d_unread = self.total[key], self.unread[key]
+            if d_total or d_unread:
+                _apply_row(key, d_total, d_unread)
+        self.total.clear()
+        self.unread.clear()
+
+
+def _apply_row(key, d_total, d_unread):
+    staff_id, lead_type, status = key
+    rows = LeadStats.objects.filter(staff_id=staff_id, lead_type=lead_type, status=status)
+    changes = {'total': F('total') + d_total, 'unread': F('unread') + d_unread}
+    if rows.update(**changes):
+        return
+    # First lead for this (scope, type, status): create the row, tolerating a concurrent insert
+    try:
+        with transaction.atomic():
+            LeadStats.objects.create(
+                staff_id=staff_id, lead_type=lead_type, status=status, total=d_total, unread=d_unread
+            )
+    except IntegrityError:
+        rows.update(**changes)
+
+
+def lead_state(instance):
+    return (instance.assigned_staff_id, instance.status, instance.is_read)
+
+
+def loaded_lead_state(instance):
+    """State as last loaded/saved, or None if the instance was never loaded (can't diff)."""
+    names = ('assigned_staff_id', 'status', 'is_read')
+    if not all(instance.has_loaded_value(name) for name in names):
+        return None
+    return tuple(instance.loaded_value(name) for name in names)
+
+
+def read_dashboard_stats(staff_id=None):
+    """
+    Dashboard numbers from LeadStats - one indexed read of at most a dozen rows.
+    pending_* keeps its historical meaning of "unread".
+    """
+    rows = LeadStats.objects.filter(staff_id=staff_id) if staff_id else LeadStats.objects.filter(staff__isnull=True)
+    return _summarize(rows.values_list('lead_type', 'status', 'total', 'unread'))
+
+
+def aggregate_dashboard_stats(staff_id=None):
+    """
+    Fallback/cross-check: the same numbers computed straight from the lead tables
+    with one filtered GROUP BY per lead type.
+    """
+    rows = []
+    for model, lead_type in LEAD_TYPES.items():
+        queryset = model.objects.all()
+        if staff_id:
+            queryset = queryset.filter(assigned_staff_id=staff_id)
+        grouped = (
+            queryset.order_by()
+            .values('status')
+            .annotate(total=Count('id'), unread=Count('id', filter=Q(is_read=False)))
+        )
+        rows.extend((lead_type, row['status'], row['total'], row['unread']) for row in grouped)
+    return _summarize(rows)
+
+
+def _summarize(rows):
+    stats = {
+        'total_enquiries': 0,
+        'pending_enquiries': 0,
+        'total_students': 0,
+        'pending_students': 0,
+        'by_status': {'student': {}, 'enquiry': {}},
+    }
+    for lead_type, status, total, unread in rows:
+        plural = 'students' if lead_type == 'student' else 'enquiries'
+        stats[f'total_{plural}'] += total
+        stats[f'pending_{plural}'] += unread
+        if total:
+            stats['by_status'][lead_type][status] = total
+    return stats
+
+
+def compute_lead_stats():
+    """Fresh {(staff_id, lead_type, status): (total, unread)} from the lead tables."""
+    delta = StatsDelta()
+    for model, lead_type in LEAD_TYPES.items():
+        grouped = (
+            model.objects.order_by()
+            .values('assigned_staff_id', 'status')
+            .annotate(total=Count('id'), unread=Count('id', filter=Q(is_read=False)))
+        )
+        for row in grouped:
+            scopes = (None, row['assigned_staff_id']) if row['assigned_staff_id'] is not None else (None,)
+            for scope in scopes:
+                key = (scope, lead_type, row['status'])
+                delta.total[key] += row['total']
+                delta.unread[key] += row['unread']
+    return {key: (delta.total[key], delta.unread[key]) for key in delta.total}
+
+
+def rebuild_lead_stats():
+    """
+    Replaces every LeadStats row with a fresh recount. Returns the number of rows written.
+
+    The table is locked in SHARE ROW EXCLUSIVE mode before the recount, which
+    conflicts with the UPDATE/INSERT of StatsDelta.apply(): transactions that have
+    already applied a delta commit first (and are counted), and ones that apply
+    theirs meanwhile wait and land on top of the rebuilt rows instead of being
+    overwritten. Lead writes stall on their counter update for the duration.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {LeadStats._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+        fresh = compute_lead_stats()
+        LeadStats.objects.all().delete()
+        LeadStats.objects.bulk_create([
+            LeadStats(staff_id=staff_id, lead_type=lead_type, status=status, total=total, unread=unread)
+            for (staff_id, lead_type, status), (total, unread) in fresh.items()
+        ])
+    return len(fresh)
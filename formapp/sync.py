@@ -0,0 +1,169 @@
+"""
+Cheap polling support: conditional GET validators and ?changed_since= deltas.
+
+Validators are derived from MAX(updated_at) of the list plus the newest tombstone,
+both index lookups, so an unchanged list answers 304 without serializing anything.
+
+Deltas are paged on an opaque (updated_at, id) keyset cursor, so a bulk write that
+stamps one updated_at on thousands of rows still pages forward.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import timedelta
+
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Tombstone
+
+TOMBSTONE_RETENTION_DAYS = 30
+DELTA_MAX_ROWS = 500
+# updated_at is stamped before commit, so a row can become visible after newer ones.
+# The cursor trails now() by this much; rows inside the window are sent again next poll.
+DELTA_SETTLE_SECONDS = 30
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def list_watermark(model, staff_id=None):
+    """Newest change (save or removal) visible in a lead list, or None for an empty history."""
+    rows = model.objects.all()
+    tombstones = Tombstone.objects.filter(model_name=model._meta.model_name)
+    if staff_id:
+        rows = rows.filter(assigned_staff_id=staff_id)
+        tombstones = tombstones.filter(staff_id=staff_id)
+    else:
+        tombstones = tombstones.filter(reason='deleted')
+    return _latest(
+        rows.aggregate(latest=Max('updated_at'))['latest'],
+        tombstones.aggregate(latest=Max('deleted_at'))['latest'],
+    )
+
+
+def validators_for(request, *watermarks, scope=''):
+    """
+    (etag, last_modified) for this request. The full path (and `scope`, e.g. a staff id
+    taken from a header) is part of the ETag so different pages, filters and cursors
+    never share a validator.
+    """
+    last_modified = _latest(*watermarks)
+    seed = '|'.join([request.get_full_path(), str(scope)] + [w.isoformat() if w else '-' for w in watermarks])
+    etag = quote_etag(hashlib.sha1(seed.encode()).hexdigest())
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 response if the client's If-None-Match / If-Modified-Since still match, else None."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def with_validators(response, etag, last_modified=None):
+    patch_vary_headers(response, ['X-Staff-ID'])
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def etag_for_payload(request, payload):
+    """Fallback validator for data we can't watermark cheaply (hash of the rendered payload)."""
+    seed = request.get_full_path() + repr(payload)
+    return quote_etag(hashlib.sha1(seed.encode()).hexdigest())
+
+
+def encode_delta_cursor(updated_at, pk):
+    payload = json.dumps([updated_at.isoformat(), pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_delta_cursor(token):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(token.encode()))
+        updated_at = parse_datetime(value)
+        if updated_at is None or timezone.is_naive(updated_at):
+            return None
+        return updated_at, int(pk)
+    except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def parse_changed_since(value):
+    """
+    Parses ?changed_since= into an (updated_at, id) position: either the opaque
+    `watermark` of a previous delta, or an ISO datetime to start from (every row
+    updated at or after it). A literal '+' in the offset often arrives as a space.
+    """
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value.strip().replace(' ', '+'))
+    except ValueError:
+        # Well formed but out of range (month 13, day 45, ...)
+        return None
+    if since is not None:
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since, 0
+    return _decode_delta_cursor(value.strip())
+
+
+def delta_response(request, queryset, serializer_class, since, staff_id=None):
+    """
+    Rows created/updated after the `since` position plus ids that left the list
+    (tombstones). Clients apply `deleted` first, then upsert `changed`, and poll
+    again with ?changed_since=<watermark>. `has_more` means the change set was cut
+    at DELTA_MAX_ROWS and the client should poll again straight away; the
+    watermark then points just past the last row sent, so every poll moves on.
+    """
+    since_at, since_pk = since
+    if since_at < timezone.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        return Response(
+            {"error": "changed_since is older than the tombstone retention window; reload the full list"},
+            status=status.HTTP_410_GONE
+        )
+
+    model = queryset.model
+    settled = timezone.now() - timedelta(seconds=DELTA_SETTLE_SECONDS)
+    changed = list(
+        queryset.filter(Q(updated_at__gt=since_at) | Q(updated_at=since_at, id__gt=since_pk))
+        .order_by('updated_at', 'id')[:DELTA_MAX_ROWS + 1]
+    )
+    has_more = len(changed) > DELTA_MAX_ROWS
+    if has_more:
+        changed = changed[:DELTA_MAX_ROWS]
+        cursor = (changed[-1].updated_at, changed[-1].pk)
+    else:
+        # Don't move past rows that may still be committing; never move backwards
+        cursor = (settled, 0)
+        if changed:
+            cursor = min(cursor, (changed[-1].updated_at, changed[-1].pk))
+        cursor = max(cursor, since)
+
+    tombstones = Tombstone.objects.filter(
+        model_name=model._meta.model_name,
+        deleted_at__gte=since_at,
+    )
+    if has_more:
+        tombstones = tombstones.filter(deleted_at__lte=cursor[0])
+    if staff_id:
+        tombstones = tombstones.filter(staff_id=staff_id)
+    else:
+        tombstones = tombstones.filter(reason='deleted')
+
+    return Response({
+        'changed': serializer_class(changed, many=True).data,
+        'deleted': sorted(set(tombstones.values_list('object_id', flat=True))),
+        'watermark': encode_delta_cursor(*cursor),
+        'has_more': has_more,
+    })
@@ -1,3 +1,325 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from notifications.models import Notification
+from websitebackend.events import LocalBroker, set_broker
+
+from .models import CollectionForm, Enquiry, LeadStats, OutboxMessage, Staff, Tombstone
+from .outbox import HANDLERS, RETRY_BASE_SECONDS, enqueue, process_batch
+from .scheduler import follow_up_reminders
+from .stats import compute_lead_stats
+from .sync import DELTA_MAX_ROWS
+from .utils import allocate_staff, bulk_create_leads, delete_leads, move_leads, redistribute_work
+
+
+def make_staff(count, **fields):
+    return [
+        Staff.objects.create(
+            name=f'Staff {i}', email=f'staff{i}@example.com', login_id=f'staff{i}', password='x', **fields
+        )
+        for i in range(count)
+    ]
+
+
+class KeysetPaginationTests(TestCase):
+    """?cursor= paging of the lead lists on (created_at, id), newest first (formapp/pagination.py)."""
+
+    def setUp(self):
+        self.client = APIClient()
+        Enquiry.objects.bulk_create([Enquiry(name=f'Lead {i}', phone=f'9{i:09d}') for i in range(8)])
+        # Most rows share one created_at, so pages must split on the id tie-breaker
+        stamp = timezone.now() - timedelta(hours=1)
+        Enquiry.objects.exclude(pk=Enquiry.objects.order_by('id').last().pk).update(created_at=stamp)
+        self.expected = list(Enquiry.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def page(self, cursor=None):
+        params = {'page_size': 3}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/api/enquiries/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_next_and_previous_walk_every_row_once(self):
+        pages = [self.page()]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+
+        ids = [[row['id'] for row in page['results']] for page in pages]
+        self.assertEqual([pk for page_ids in ids for pk in page_ids], self.expected)
+        self.assertEqual([len(page_ids) for page_ids in ids], [3, 3, 2])
+
+        back = self.page(pages[-1]['previous'])
+        self.assertEqual([row['id'] for row in back['results']], ids[1])
+        back = self.page(back['previous'])
+        self.assertEqual([row['id'] for row in back['results']], ids[0])
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/enquiries/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LeadCounterTests(TestCase):
+    """
+    Staff.lead_count and LeadStats, moved by the signal receivers and by hand on the
+    bulk paths (formapp/utils.py), always equal a fresh recount of the lead tables.
+    """
+
+    def setUp(self):
+        self.staff = make_staff(3)
+
+    def assertCountersMatch(self):
+        for staff in Staff.objects.with_workload():
+            self.assertEqual(staff.lead_count, staff.students_total + staff.enquiries_total, staff.name)
+        stored = {
+            (row.staff_id, row.lead_type, row.status): (row.total, row.unread)
+            for row in LeadStats.objects.all()
+            if row.total or row.unread
+        }
+        self.assertEqual(stored, compute_lead_stats())
+
+    def test_single_lead_saves_and_deletes(self):
+        first, second, _ = self.staff
+        enquiry = Enquiry(name='Single', phone='9000000001')
+        allocate_staff(enquiry)
+        student = CollectionForm.objects.create(full_name='Student', phone_number='9000000002', assigned_staff=second)
+        Enquiry.objects.create(name='Unassigned', phone='9000000003')
+        self.assertCountersMatch()
+
+        enquiry.status = 'Connected'
+        enquiry.is_read = True
+        enquiry.save()
+        student.assigned_staff = first
+        student.save()
+        student = CollectionForm.objects.get(pk=student.pk)
+        student.assigned_staff = None
+        student.status = 'Completed'
+        student.save()
+        self.assertCountersMatch()
+
+        enquiry.delete()
+        student.delete()
+        self.assertCountersMatch()
+
+    def test_bulk_paths(self):
+        first, second, third = self.staff
+        leads = [Enquiry(name=f'Bulk {i}', phone=f'9{i:09d}') for i in range(7)]
+        leads.append(Enquiry(name='Preassigned', phone='9100000000', assigned_staff=third, is_read=True))
+        created = bulk_create_leads(Enquiry, leads)
+        bulk_create_leads(CollectionForm, [
+            CollectionForm(full_name=f'Bulk {i}', phone_number=f'8{i:09d}') for i in range(4)
+        ])
+        self.assertCountersMatch()
+
+        ids = [lead.pk for lead in created]
+        lead = Enquiry.objects.get(pk=ids[0])
+        lead.status = 'Follow Up'
+        lead.save()
+        self.assertEqual(move_leads(Enquiry, ids[:4], first.pk), 4)
+        self.assertCountersMatch()
+
+        redistribute_work(first.pk)
+        self.assertCountersMatch()
+
+        self.assertEqual(delete_leads(Enquiry, ids[2:6]), 4)
+        self.assertCountersMatch()
+
+
+class DeltaSyncTests(TestCase):
+    """?changed_since= deltas on the lead lists (formapp/sync.py)."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def poll(self, since):
+        response = self.client.get('/api/enquiries/', {'changed_since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def drain(self, since, max_polls=10):
+        """Follows has_more until the delta is exhausted; returns (ids seen, last watermark)."""
+        seen = []
+        for _ in range(max_polls):
+            data = self.poll(since)
+            seen.extend(row['id'] for row in data['changed'])
+            since = data['watermark']
+            if not data['has_more']:
+                return seen, since
+        self.fail(f'delta still had more rows after {max_polls} polls')
+
+    def test_pages_past_rows_sharing_one_updated_at(self):
+        # Bulk paths (move_leads, redistribute_work) stamp one updated_at on every row
+        Enquiry.objects.bulk_create([
+            Enquiry(name=f'Lead {i}', phone=f'9{i:09d}') for i in range(DELTA_MAX_ROWS + 20)
+        ])
+        stamp = timezone.now() - timedelta(minutes=5)
+        Enquiry.objects.update(updated_at=stamp)
+
+        seen, _ = self.drain((stamp - timedelta(seconds=1)).isoformat())
+
+        self.assertEqual(len(seen), DELTA_MAX_ROWS + 20)
+        self.assertEqual(set(seen), set(Enquiry.objects.values_list('id', flat=True)))
+
+    def test_watermark_moves_forward_and_resends_unsettled_rows(self):
+        old = Enquiry.objects.create(name='Old', phone='9000000001')
+        recent = Enquiry.objects.create(name='Recent', phone='9000000002')
+        Enquiry.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        start = (timezone.now() - timedelta(minutes=10)).isoformat()
+
+        first, watermark = self.drain(start)
+        self.assertEqual(first, [old.pk, recent.pk])
+
+        # `recent` is inside the settle window, so it may have committed late: sent again
+        second, _ = self.drain(watermark)
+        self.assertEqual(second, [recent.pk])
+
+    def test_tombstones_and_invalid_cursor(self):
+        lead = Enquiry.objects.create(name='Gone', phone='9000000003')
+        start = (timezone.now() - timedelta(minutes=1)).isoformat()
+        Tombstone.objects.create(model_name='enquiry', object_id=lead.pk, reason='deleted')
+
+        self.assertEqual(self.poll(start)['deleted'], [lead.pk])
+        for invalid in ('not-a-cursor', '2024-13-45T00:00:00'):
+            response = self.client.get('/api/enquiries/', {'changed_since': invalid})
+            self.assertEqual(response.status_code, 400)
+
+
+class BulkIntakeTests(TestCase):
+    """POST /api/leads/bulk/ with in-batch duplicates under the 'link' policy."""
+
+    def test_in_batch_duplicate_follows_and_notifies_the_original_assignee(self):
+        staff = make_staff(2)
+        items = [
+            {'name': 'First', 'phone': '9000000001'},
+            {'name': 'First again', 'phone': '9000000001'},
+            {'name': 'Other', 'phone': '9000000002'},
+        ]
+        response = APIClient().post('/api/leads/bulk/', {'type': 'enquiry', 'items': items}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(process_batch(), (1, 0))  # 'leads.bulk_created' notifications
+
+        first, again, other = (Enquiry.objects.get(pk=pk) for pk in response.data['ids'])
+        self.assertEqual(again.duplicate_of_id, first.pk)
+        self.assertEqual(again.assigned_staff_id, first.assigned_staff_id)
+
+        for member in staff:
+            member.refresh_from_db()
+            owned = Enquiry.objects.filter(assigned_staff=member).count()
+            self.assertEqual(member.lead_count, owned)
+            bodies = list(Notification.objects.filter(recipient=member).values_list('body', flat=True))
+            if owned:
+                self.assertEqual(bodies, [f"You have been assigned {owned} new {'enquiry' if owned == 1 else 'enquiries'}"])
+            else:
+                self.assertEqual(bodies, [])
+
+
+class OutboxTests(TestCase):
+    """Retry and backoff of outbox messages (formapp/outbox.py)."""
+
+    def test_handled_message_is_deleted(self):
+        calls = []
+        with mock.patch.dict(HANDLERS, {'test.ok': calls.append}):
+            enqueue('test.ok', value=1)
+            self.assertEqual(process_batch(), (1, 0))
+
+        self.assertEqual(calls, [{'value': 1}])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_failures_back_off_exponentially_then_stop(self):
+        def fail(payload):
+            Staff.objects.create(name='Rolled back', email='rb@example.com', login_id='rb', password='x')
+            raise RuntimeError('boom')
+
+        with mock.patch.dict(HANDLERS, {'test.fail': fail}):
+            message = enqueue('test.fail')
+            for attempt in range(1, 4):
+                before = timezone.now()
+                self.assertEqual(process_batch(max_attempts=3), (0, 1))
+                message.refresh_from_db()
+                self.assertEqual(message.attempts, attempt)
+                self.assertEqual(message.last_error, 'RuntimeError: boom')
+                if attempt < 3:
+                    self.assertEqual(message.status, 'pending')
+                    delay = (message.available_at - before).total_seconds()
+                    self.assertAlmostEqual(delay, RETRY_BASE_SECONDS * 2 ** (attempt - 1), delta=5)
+                    # Not due yet; then make it due for the next attempt
+                    self.assertEqual(process_batch(max_attempts=3), (0, 0))
+                    OutboxMessage.objects.filter(pk=message.pk).update(available_at=timezone.now())
+
+        self.assertEqual(message.status, 'failed')
+        self.assertEqual(process_batch(), (0, 0))
+        # The handler's writes were rolled back with its savepoint
+        self.assertFalse(Staff.objects.filter(login_id='rb').exists())
+
+
+class CleanupTests(TestCase):
+    """`manage.py cleanup_data` candidate passes (formapp/cleanup.py)."""
+
+    def test_orphan_pass_keeps_leads_waiting_for_allocation(self):
+        response = APIClient().post('/api/enquiries/', {'name': 'Queued', 'phone': '9000000001'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['assigned_staff'])
+        orphan = Enquiry.objects.create(name='Orphan', phone='9000000002')
+
+        call_command('cleanup_data', '--cleanup=orphaned', '--type=enquiry', stdout=StringIO())
+
+        self.assertFalse(Enquiry.objects.filter(pk=orphan.pk).exists())
+        self.assertTrue(Enquiry.objects.filter(pk=response.data['id']).exists())
+
+
+class BackgroundCommandTests(TestCase):
+    """run_worker / run_scheduler publish events for streams served by other processes."""
+
+    def test_refuse_to_start_under_an_in_process_broker(self):
+        self.addCleanup(set_broker, set_broker(LocalBroker()))
+        for command in ('run_worker', 'run_scheduler'):
+            with self.assertRaisesMessage(CommandError, 'EVENTS_BROKER'):
+                call_command(command, '--once', stdout=StringIO())
+
+
+class FollowUpReminderTests(TestCase):
+    """The follow_up_reminders job may rerun over a window it partly handled (formapp/scheduler.py)."""
+
+    def test_rerun_after_a_failed_batch_does_not_remind_twice(self):
+        staff, = make_staff(1)
+        now = timezone.now()
+        since = now - timedelta(minutes=5)
+        Enquiry.objects.bulk_create([
+            Enquiry(name=f'Lead {i}', phone=f'9{i:09d}', assigned_staff=staff, follow_up_date=now - timedelta(minutes=1))
+            for i in range(3)
+        ])
+
+        # Second batch fails; the first one's reminders are committed
+        with mock.patch('formapp.scheduler.REMINDER_BATCH_SIZE', 2), \
+                mock.patch('formapp.scheduler.notifications_created', side_effect=[None, RuntimeError('boom')]):
+            with self.assertRaises(RuntimeError):
+                follow_up_reminders(since, now)
+        self.assertEqual(Notification.objects.count(), 2)
+
+        # covered_until didn't move, so the next run gets the same window
+        self.assertEqual(follow_up_reminders(since, now), 1)
+        self.assertEqual(follow_up_reminders(since, now), 0)
+        self.assertEqual(Notification.objects.filter(recipient=staff).count(), 3)
+
+    def test_rescheduled_follow_up_is_reminded_again(self):
+        staff, = make_staff(1)
+        now = timezone.now()
+        lead = Enquiry.objects.create(
+            name='Lead', phone='9000000001', assigned_staff=staff, follow_up_date=now - timedelta(minutes=1)
+        )
+        self.assertEqual(follow_up_reminders(now - timedelta(minutes=5), now), 1)
+
+        later = now + timedelta(hours=1)
+        Enquiry.objects.filter(pk=lead.pk).update(follow_up_date=later - timedelta(minutes=1))
 
-# Create your tests here.
+        self.assertEqual(follow_up_reminders(now, later), 1)
+        self.assertEqual(Notification.objects.filter(recipient=staff).count(), 2)
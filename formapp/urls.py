@@ -11,10 +11,13 @@ urlpatterns = [
     path('submit/<int:pk>/', views.submit_detail),
     path('enquiries/', views.enquiry_list),
     path('enquiries/<int:pk>/', views.enquiry_detail),
+    path('leads/bulk/', views.bulk_intake),
     path('staff-login/', views.staff_login),
     # Specific staff endpoints before generic <pk> to avoid pattern conflicts
     path('staff/reallocate/', views.reallocate_leads),
     path('dashboard/', views.dashboard_stats),
+    path('export/', views.export_leads),
+    path('search/', views.search_leads),
     # Generic staff endpoints (AFTER specific routes)
     path('staff/', views.staff_list),
     path('staff/<int:pk>/', views.staff_detail),
@@ -1,70 +1,337 @@
-from django.db.models import Count, F, ExpressionWrapper, IntegerField
-from .models import Staff, CollectionForm, Enquiry
+import heapq
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from notifications.models import Notification
+from notifications.signals import notifications_created
+from websitebackend.db import delete_by_ids
+from websitebackend.events import publish_on_commit
+
+from .colleges import index_forms
+from .dedupe import assign_contact_keys
+from .search import update_search_vectors
+from .models import Staff, CollectionForm, CollegeSelection, Enquiry, Tombstone
+from .stats import StatsDelta, lead_state
+
+REDISTRIBUTE_BATCH_SIZE = 1000
+BULK_CREATE_BATCH_SIZE = 500
+
+
+def adjust_lead_counts(deltas):
+    """
+    Apply {staff_id: delta} to Staff.lead_count with atomic UPDATE ... SET lead_count = lead_count + n.
+    None keys (unassigned leads) and zero deltas are ignored.
+    """
+    for staff_id, delta in deltas.items():
+        if staff_id is None or not delta:
+            continue
+        Staff.objects.filter(pk=staff_id).update(lead_count=F('lead_count') + delta)
+
+
+def record_tombstones(model, rows, reason='deleted'):
+    """
+    rows: iterable of (object_id, staff_id) for leads that left a list.
+    Read back by ?changed_since= delta polls (formapp/sync.py).
+    """
+    Tombstone.objects.bulk_create(
+        [
+            Tombstone(model_name=model._meta.model_name, object_id=object_id, staff_id=staff_id, reason=reason)
+            for object_id, staff_id in rows
+        ],
+        batch_size=BULK_CREATE_BATCH_SIZE,
+    )
+
+
+def lock_least_loaded_staff():
+    """
+    Returns the active staff member with the lowest lead_count, row-locked until
+    the surrounding transaction commits. Must be called inside transaction.atomic().
+
+    SKIP LOCKED lets concurrent submissions take the next-least-loaded person instead
+    of queueing on (and piling onto) the same row; if every candidate is locked we
+    fall back to waiting for one.
+    """
+    candidates = (
+        Staff.objects.filter(active_status=True, role='staff')
+        .order_by('lead_count', 'id')
+        .only('id', 'name', 'lead_count')
+    )
+    staff = candidates.select_for_update(skip_locked=True).first()
+    if staff is None:
+        staff = candidates.select_for_update().first()
+    return staff
+
 
 def allocate_staff(instance):
     """
     Assigns the instance (Student or Enquiry) to the staff member with the lowest workload.
-    Workload = count(assigned_students) + count(assigned_enquiries)
-    
-    Optimized: Uses Django ORM annotations to avoid N+1 query problem.
-    """
-    active_staff = Staff.objects.filter(active_status=True, role='staff')
-    
-    if not active_staff.exists():
-        return None
-
-    # Use annotations to calculate workload in a single query
-    # Use values_list to get only the ID and workload, avoiding setting properties
-    staff_data = active_staff.annotate(
-        student_count=Count('assigned_students'),
-        enquiry_count=Count('assigned_enquiries'),
-        total_workload=ExpressionWrapper(
-            F('student_count') + F('enquiry_count'),
-            output_field=IntegerField()
-        )
-    ).values_list('id', 'total_workload').order_by('total_workload', 'id')
-    
-    if not staff_data:
-        return None
-    
-    # Get the staff with minimum workload and assign
-    min_staff_id = staff_data.first()[0]
-    selected_staff = Staff.objects.get(id=min_staff_id)
-
-    instance.assigned_staff = selected_staff
-    # Save only the changed field when updating an existing record
-    if instance.pk is None:
-        instance.save()
-    else:
-        instance.save(update_fields=['assigned_staff'])
+    Workload = count(assigned_students) + count(assigned_enquiries), read from the
+    maintained Staff.lead_count counter instead of aggregating the lead tables.
+
+    The post_save receivers in formapp.signals move the counter, inside the same
+    transaction that holds the row lock. The assignee's open event streams get a
+    lead.assigned event once it commits.
+    """
+    with transaction.atomic():
+        selected_staff = lock_least_loaded_staff()
+        if selected_staff is None:
+            return None
+
+        instance.assigned_staff = selected_staff
+        # Save only the changed field when updating an existing record
+        if instance.pk is None:
+            instance.save()
+        else:
+            instance.save(update_fields=['assigned_staff', 'updated_at'])
+        publish_on_commit(selected_staff.pk, 'lead.assigned', {
+            'type': instance._meta.model_name,
+            'id': instance.pk,
+        })
     return selected_staff
 
-def redistribute_work(staff_id):
+
+def move_leads(model, lead_ids, target_staff_id):
+    """
+    Bulk-reassigns leads with a single UPDATE and keeps lead_count, LeadStats and
+    tombstones in step (queryset.update() bypasses the post_save receivers).
+    Returns the number of rows updated.
+    """
+    with transaction.atomic():
+        leads = model.objects.filter(id__in=lead_ids)
+        deltas = Counter()
+        stats = StatsDelta()
+        moved_away = []
+        rows = leads.select_for_update().values_list('id', 'assigned_staff_id', 'status', 'is_read')
+        for lead_id, staff_id, lead_status, is_read in rows:
+            deltas[staff_id] -= 1
+            stats.move(model, (staff_id, lead_status, is_read), (target_staff_id, lead_status, is_read))
+            if staff_id is not None and staff_id != target_staff_id:
+                moved_away.append((lead_id, staff_id))
+        updated = leads.update(assigned_staff_id=target_staff_id, updated_at=timezone.now())
+        deltas[target_staff_id] += updated
+        adjust_lead_counts(deltas)
+        stats.apply()
+        record_tombstones(model, moved_away, reason='reassigned')
+    return updated
+
+
+def delete_leads(model, lead_ids):
+    """
+    Deletes leads by primary key with set-based SQL and keeps lead_count, LeadStats
+    and tombstones in step. queryset.delete() would load every row and fire
+    post_delete once per lead (moving the counters a second time), so the rows go
+    with delete_by_ids() and dependents are cleared explicitly first: college index
+    rows are deleted and duplicate_of links are nulled.
+    Returns the number of rows deleted.
+    """
+    if not lead_ids:
+        return 0
+    with transaction.atomic():
+        leads = model.objects.filter(id__in=lead_ids)
+        deltas = Counter()
+        stats = StatsDelta()
+        removed = []
+        rows = leads.select_for_update().values_list('id', 'assigned_staff_id', 'status', 'is_read')
+        for lead_id, staff_id, lead_status, is_read in rows:
+            deltas[staff_id] -= 1
+            stats.move(model, (staff_id, lead_status, is_read), None)
+            removed.append((lead_id, staff_id))
+        if not removed:
+            return 0
+
+        ids = [lead_id for lead_id, _ in removed]
+        if model is CollectionForm:
+            CollegeSelection.objects.filter(form_id__in=ids).delete()
+        model.objects.filter(duplicate_of_id__in=ids).update(duplicate_of=None, updated_at=timezone.now())
+        deleted = delete_by_ids(model, ids)
+
+        adjust_lead_counts(deltas)
+        stats.apply()
+        record_tombstones(model, removed)
+    return deleted
+
+
+def plan_assignments(workloads, count):
+    """
+    Balanced greedy plan for `count` new leads.
+    workloads: {staff_id: current lead count}. Yields one staff_id per lead, always the
+    currently least-loaded one (ties broken by id, like allocate_staff) via a min-heap,
+    so each pick is O(log staff) with no further queries.
+    """
+    heap = [(load, staff_id) for staff_id, load in workloads.items()]
+    heapq.heapify(heap)
+    for _ in range(count):
+        load, staff_id = heapq.heappop(heap)
+        yield staff_id
+        heapq.heappush(heap, (load + 1, staff_id))
+
+
+def redistribute_work(staff_id, batch_size=REDISTRIBUTE_BATCH_SIZE):
     """
     Re-distributes all work from a deleted/removed staff member to remaining active staff.
+    Call BEFORE deleting the staff row (the FK is SET_NULL on delete).
+
+    Reads every workload once, plans the whole move with plan_assignments() and writes
+    it with chunked bulk_update() in one transaction.
+    Returns a per-target summary: {target_id: {'name', 'students', 'enquiries'}}.
     """
-    try:
-        # We assume the staff member might already be deleted or we are about to delete.
-        # If calling BEFORE delete (recommended):
-        staff = Staff.objects.get(id=staff_id)
-        
+    with transaction.atomic():
+        try:
+            staff = Staff.objects.select_for_update().get(id=staff_id)
+        except Staff.DoesNotExist:
+            return {}
+
         # CRITICAL: Mark as inactive so they are excluded from the allocation pool
-        # during the subsequent allocate_staff calls.
         staff.active_status = False
-        staff.save()
-
-        students = list(staff.assigned_students.all())
-        enquiries = list(staff.assigned_enquiries.all())
-        
-        for student in students:
-            # Disassociate first to update counts correctly if needed, 
-            # though allocate_staff will overwrite.
-            student.assigned_staff = None 
-            allocate_staff(student)
-            
-        for enquiry in enquiries:
-            enquiry.assigned_staff = None
-            allocate_staff(enquiry)
-            
-    except Staff.DoesNotExist:
-        pass
+        staff.save(update_fields=['active_status', 'updated_at'])
+
+        # Lock the receiving rows so concurrent allocate_staff() calls wait for us
+        targets = list(
+            Staff.objects.select_for_update()
+            .filter(active_status=True, role='staff')
+            .order_by('id')
+            .values_list('id', 'name', 'lead_count')
+        )
+        if not targets:
+            return {}
+
+        summary = {
+            target_id: {'name': name, 'students': 0, 'enquiries': 0}
+            for target_id, name, _ in targets
+        }
+        workloads = {target_id: load for target_id, _, load in targets}
+
+        moved = Counter()
+        stats = StatsDelta()
+        for model, key in ((CollectionForm, 'students'), (Enquiry, 'enquiries')):
+            leads = list(
+                model.objects.filter(assigned_staff_id=staff_id)
+                .order_by('created_at', 'id')
+                .values_list('id', 'status', 'is_read')
+            )
+            if not leads:
+                continue
+
+            now = timezone.now()
+            updates = []
+            for (lead_id, lead_status, is_read), target_id in zip(leads, plan_assignments(workloads, len(leads))):
+                updates.append(model(id=lead_id, assigned_staff_id=target_id, updated_at=now))
+                stats.move(model, (staff_id, lead_status, is_read), (target_id, lead_status, is_read))
+                workloads[target_id] += 1
+                summary[target_id][key] += 1
+                moved[target_id] += 1
+            model.objects.bulk_update(updates, ['assigned_staff', 'updated_at'], batch_size=batch_size)
+
+        # bulk_update skips the post_save receivers, so move the counters here
+        moved[staff_id] -= sum(moved.values())
+        adjust_lead_counts(moved)
+        stats.apply()
+
+    return {target_id: row for target_id, row in summary.items() if row['students'] or row['enquiries']}
+
+
+def bulk_create_leads(model, leads, batch_links=(), batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Inserts unsaved CollectionForm/Enquiry instances in bulk.
+
+    Leads without an assigned_staff are balanced across active staff in one
+    plan_assignments() pass (candidate rows locked once, not per lead), then the
+    batch is written with bulk_create(). In-batch duplicates (`batch_links`, see
+    dedupe.dedupe_batch) go to their earlier item's staff member and are pointed at
+    it once both have primary keys. bulk_create skips post_save, so the lead_count
+    counters, LeadStats, search vectors and the college index are applied here in
+    bulk, from the final assignments. Notifications are the caller's to queue
+    (outbox topic 'leads.bulk_created').
+    Returns the created instances (with primary keys on Postgres).
+    """
+    for lead in leads:
+        assign_contact_keys(lead)
+    linked = {id(lead) for lead, _ in batch_links}
+
+    with transaction.atomic():
+        unassigned = [lead for lead in leads if lead.assigned_staff_id is None and id(lead) not in linked]
+        if unassigned:
+            candidates = list(
+                Staff.objects.select_for_update()
+                .filter(active_status=True, role='staff')
+                .order_by('id')
+                .values_list('id', 'lead_count')
+            )
+            if candidates:
+                plan = plan_assignments(dict(candidates), len(unassigned))
+                for lead, staff_id in zip(unassigned, plan):
+                    lead.assigned_staff_id = staff_id
+        for lead, first in batch_links:
+            if first.assigned_staff_id is not None:
+                lead.assigned_staff_id = first.assigned_staff_id
+
+        created = model.objects.bulk_create(leads, batch_size=batch_size)
+        link_batch_duplicates(model, batch_links)
+
+        assigned = Counter(lead.assigned_staff_id for lead in created if lead.assigned_staff_id)
+        adjust_lead_counts(assigned)
+        stats = StatsDelta()
+        for lead in created:
+            stats.move(model, None, lead_state(lead))
+        stats.apply()
+        update_search_vectors(model, [lead.pk for lead in created])
+        if model is CollectionForm:
+            index_forms(created)
+
+    for lead in created:
+        lead.remember_state()
+    return created
+
+
+def link_batch_duplicates(model, batch_links):
+    """
+    Points freshly inserted in-batch duplicates at the earlier item of the same batch
+    (bulk_create_leads() has already given them that item's staff member).
+    """
+    now = timezone.now()
+    linked = []
+    for lead, first in batch_links:
+        if lead.pk and first.pk:
+            lead.duplicate_of_id = first.pk
+            lead.updated_at = now
+            linked.append(lead)
+    model.objects.bulk_update(linked, ['duplicate_of', 'updated_at'])
+    return len(linked)
+
+
+def notify_bulk_intake(model, leads, assigned):
+    """
+    One summary notification per assignee (and per admin for enquiries), instead of
+    the one-per-lead notifications single submissions get (outbox topic 'lead.created').
+    """
+    if not leads:
+        return
+
+    singular, plural = ('Enquiry', 'Enquiries') if model is Enquiry else ('Student', 'Students')
+
+    def describe(count):
+        return f"{count} new {(singular if count == 1 else plural).lower()}"
+
+    notifications = [
+        Notification(
+            recipient_id=staff_id,
+            title=f"New {singular} Assigned" if count == 1 else f"{count} New {plural} Assigned",
+            body=f"You have been assigned {describe(count)}",
+        )
+        for staff_id, count in assigned.items()
+    ]
+
+    if model is Enquiry:
+        total = len(leads)
+        for admin_id in Staff.objects.filter(login_id='admin').values_list('id', flat=True):
+            notifications.append(Notification(
+                recipient_id=admin_id,
+                title="New Enquiry Received" if total == 1 else f"{total} New Enquiries Received",
+                body=f"Received {describe(total)}",
+            ))
+
+    Notification.objects.bulk_create(notifications, batch_size=BULK_CREATE_BATCH_SIZE)
+    # bulk_create skips the post_save receivers (unread counters, event stream push)
+    notifications_created(notifications)
@@ -1,9 +1,9 @@
-import os
-
-from django.conf import settings
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from rest_framework import status, viewsets
 from rest_framework.decorators import api_view
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -17,7 +17,97 @@ from .serializers import (
     StaffDocumentSerializer,
     OrganizationSerializer,
 )
-from .utils import allocate_staff, redistribute_work
+from .colleges import normalize_college
+from .dedupe import DuplicateLead, dedupe_batch, duplicate_policy, save_lead
+from .images import image_url
+from .exports import EXPORT_FORMATS, LEAD_MODELS, stream_export
+from .outbox import enqueue
+from .pagination import KeysetPagination
+from .search import (
+    MIN_QUERY_LENGTH,
+    SEARCH_MAX_OFFSET,
+    SEARCH_MAX_PAGE_SIZE,
+    SEARCH_PAGE_SIZE,
+    phrase_query,
+    search_page,
+    search_queryset,
+    search_terms,
+)
+from .stats import aggregate_dashboard_stats, read_dashboard_stats
+from .sync import (
+    delta_response,
+    list_watermark,
+    not_modified,
+    parse_changed_since,
+    validators_for,
+    with_validators,
+)
+from .utils import (
+    allocate_staff,
+    bulk_create_leads,
+    move_leads,
+    redistribute_work,
+)
+
+
+LOGIN_IMAGE_SIZE = 128
+
+
+def with_staff_name(queryset):
+    """Join the assigned staff for `assigned_staff_name` instead of one query per row."""
+    return queryset.select_related('assigned_staff')
+
+
+def lead_list_response(request, queryset, serializer_class, staff_id=None):
+    """
+    Shared GET handling for the lead lists:
+    - 304 when If-None-Match / If-Modified-Since still match
+    - ?changed_since=<iso or previous watermark> returns only rows changed/removed since then
+    - otherwise a keyset page on (created_at, id): ?cursor=<next/previous>&page_size=N
+    """
+    etag, last_modified = validators_for(
+        request, list_watermark(queryset.model, staff_id), scope=staff_id or ''
+    )
+    cached = not_modified(request, etag, last_modified)
+    if cached is not None:
+        return cached
+
+    changed_since = request.GET.get('changed_since')
+    if changed_since:
+        since = parse_changed_since(changed_since)
+        if since is None:
+            return Response({"error": "Invalid changed_since"}, status=status.HTTP_400_BAD_REQUEST)
+        response = delta_response(request, with_staff_name(queryset), serializer_class, since, staff_id)
+    else:
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(with_staff_name(queryset), request)
+        response = paginator.get_paginated_response(serializer_class(page, many=True).data)
+    return with_validators(response, etag, last_modified)
+
+
+def save_new_lead(serializer, policy):
+    """
+    save_lead() plus auto allocation, queued in the same transaction: the worker
+    assigns the least-loaded staff member (linked duplicates already carry the
+    original's) and notifies them, off the request path.
+
+    The POST responses therefore show a new lead unassigned (assigned_staff null)
+    unless it linked to a duplicate; clients learn the assignee from the
+    lead.assigned event or their next list fetch.
+    """
+    with transaction.atomic():
+        instance, outcome = save_lead(serializer, policy)
+        if outcome != 'merged' and instance.assigned_staff_id is None:
+            enqueue('lead.allocate', model=instance._meta.model_name, id=instance.pk)
+    return instance, outcome
+
+
+def duplicate_response(exc):
+    """409 for a resubmission refused by the 'reject' duplicate policy."""
+    return Response(
+        {"error": "A lead with this email or phone number already exists", "duplicate_of": exc.existing.pk},
+        status=status.HTTP_409_CONFLICT
+    )
 
 
 # --- Staff Documents ---
@@ -68,7 +158,7 @@ def staff_login(request):
                 "dob": staff.dob,
                 "gender": staff.gender,
                 "phone": staff.phone,
-                "image": staff.profile_image
+                "image": image_url(staff.profile_image.name, request, size=LOGIN_IMAGE_SIZE)
             })
         else:
             return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
@@ -79,12 +169,12 @@ def staff_login(request):
 def staff_list(request):
     # Only Admin should access this
     if request.method == 'GET':
-        staff = Staff.objects.filter(~Q(role='admin') & ~Q(login_id__iexact='admin')).order_by('id')
-        serializer = StaffSerializer(staff, many=True)
+        staff = Staff.objects.filter(~Q(role='admin') & ~Q(login_id__iexact='admin')).with_workload().order_by('id')
+        serializer = StaffSerializer(staff, many=True, context={'request': request})
         return Response(serializer.data)
     
     if request.method == 'POST':
-        serializer = StaffSerializer(data=request.data)
+        serializer = StaffSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -94,16 +184,16 @@ def staff_list(request):
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 def staff_detail(request, pk):
     try:
-        staff = Staff.objects.get(pk=pk)
+        staff = Staff.objects.with_workload().get(pk=pk)
     except Staff.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        serializer = StaffSerializer(staff)
+        serializer = StaffSerializer(staff, context={'request': request})
         return Response(serializer.data)
 
     elif request.method in ['PUT', 'PATCH']:
-        serializer = StaffSerializer(staff, data=request.data, partial=True)
+        serializer = StaffSerializer(staff, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -111,29 +201,23 @@ def staff_detail(request, pk):
 
     elif request.method == 'DELETE':
         # Collect deletion summary before deleting
-        student_count = staff.assigned_students.count()
-        enquiry_count = staff.assigned_enquiries.count()
+        student_count = staff.students_total
+        enquiry_count = staff.enquiries_total
         document_count = staff.documents.count()
         
         # Get document file paths for cleanup
-        document_files = list(staff.documents.values_list('file', flat=True))
-        
-        # Redistribute work before deleting
-        redistribute_work(staff.id)
+        document_files = [name for name in staff.documents.values_list('file', flat=True) if name]
+        image_files = [name for name in (staff.profile_image.name, staff.official_photo.name) if name]
         
-        # Delete staff (CASCADE will delete StaffDocument records)
-        staff.delete()
-        
-        # Clean up actual files from filesystem
-        deleted_files = 0
-        for file_path in document_files:
-            try:
-                full_path = os.path.join(settings.MEDIA_ROOT, str(file_path))
-                if os.path.exists(full_path):
-                    os.remove(full_path)
-                    deleted_files += 1
-            except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
+        with transaction.atomic():
+            # Redistribute work before deleting
+            reassigned_to = redistribute_work(staff.id)
+            
+            # Delete staff (CASCADE will delete StaffDocument records)
+            staff.delete()
+            
+            # Files are removed from storage by the outbox worker once this commits
+            enqueue('files.delete', files=document_files, images=image_files)
         
         return Response({
             "message": "Staff deleted successfully",
@@ -141,7 +225,11 @@ def staff_detail(request, pk):
                 "students_reassigned": student_count,
                 "enquiries_reassigned": enquiry_count,
                 "documents_deleted": document_count,
-                "files_cleaned": deleted_files
+                # Removed by the outbox worker after the response
+                "files_queued": len(document_files),
+                "reassigned_to": [
+                    {"staff_id": target_id, **row} for target_id, row in reassigned_to.items()
+                ]
             }
         }, status=status.HTTP_200_OK)
 
@@ -157,23 +245,29 @@ def submit_form(request):
     if request.method == 'GET':
         if staff_id and staff_id != 'null' and staff_id != 'undefined':
             # Staff View: Filter by assigned_staff
-            forms = CollectionForm.objects.filter(assigned_staff_id=staff_id).order_by('-created_at')
+            forms = CollectionForm.objects.filter(assigned_staff_id=staff_id)
         else:
             # Admin View: Show all
-            forms = CollectionForm.objects.all().order_by('-created_at')
-            
-        serializer = CollectionFormSerializer(forms, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            forms = CollectionForm.objects.all()
+            staff_id = None
+
+        return lead_list_response(request, forms, CollectionFormSerializer, staff_id)
 
     # 👉 POST: save data
     if request.method == 'POST':
         serializer = CollectionFormSerializer(data=request.data)
         if serializer.is_valid():
-            instance = serializer.save()
-            # AUTO ALLOCATION
-            allocate_staff(instance)
+            try:
+                instance, outcome = save_new_lead(serializer, duplicate_policy(request))
+            except DuplicateLead as exc:
+                return duplicate_response(exc)
+            if outcome == 'merged':
+                return Response(
+                    {"message": "Form merged into an existing entry", "id": instance.pk},
+                    status=status.HTTP_200_OK
+                )
             return Response(
-                {"message": "Form saved successfully!"},
+                {"message": "Form saved successfully!", "id": instance.pk, "duplicate_of": instance.duplicate_of_id},
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -225,18 +319,22 @@ def enquiry_list(request):
 
     if request.method == 'GET':
         if staff_id and staff_id != 'null' and staff_id != 'undefined':
-             enquiries = Enquiry.objects.filter(assigned_staff_id=staff_id).order_by('-created_at')
+             enquiries = Enquiry.objects.filter(assigned_staff_id=staff_id)
         else:
-             enquiries = Enquiry.objects.all().order_by('-created_at')
-        serializer = EnquirySerializer(enquiries, many=True)
-        return Response(serializer.data)
+             enquiries = Enquiry.objects.all()
+             staff_id = None
+
+        return lead_list_response(request, enquiries, EnquirySerializer, staff_id)
 
     if request.method == 'POST':
         serializer = EnquirySerializer(data=request.data)
         if serializer.is_valid():
-            instance = serializer.save()
-            # AUTO ALLOCATION
-            allocate_staff(instance)
+            try:
+                instance, outcome = save_new_lead(serializer, duplicate_policy(request))
+            except DuplicateLead as exc:
+                return duplicate_response(exc)
+            if outcome == 'merged':
+                return Response(EnquirySerializer(instance).data, status=status.HTTP_200_OK)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -274,6 +372,143 @@ def enquiry_detail(request, pk):
         enquiry.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+BULK_INTAKE_MAX_ITEMS = 5000
+
+BULK_INTAKE_SERIALIZERS = {
+    'student': CollectionFormSerializer,
+    'enquiry': EnquirySerializer,
+}
+
+
+@csrf_exempt
+@api_view(['POST'])
+def bulk_intake(request):
+    """
+    Creates many leads in one request.
+    Body: { type: 'student' | 'enquiry', items: [ {...}, {...} ] }
+    Valid items are inserted with bulk_create and allocated in one balanced pass;
+    invalid ones are reported by their index and skipped. Duplicates (of existing
+    leads or of earlier items) follow the duplicate policy (?on_duplicate=).
+    """
+    lead_type = request.data.get('type', 'student')
+    items = request.data.get('items')
+
+    if lead_type not in BULK_INTAKE_SERIALIZERS:
+        return Response({"error": "Invalid type"}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(items, list) or not items:
+        return Response({"error": "items must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > BULK_INTAKE_MAX_ITEMS:
+        return Response(
+            {"error": f"At most {BULK_INTAKE_MAX_ITEMS} items per request"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer_class = BULK_INTAKE_SERIALIZERS[lead_type]
+    Model = serializer_class.Meta.model
+
+    valid = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "errors": {"non_field_errors": ["Expected an object."]}})
+            continue
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+
+    leads, batch_links, merged, duplicate_errors = dedupe_batch(Model, valid, duplicate_policy(request))
+    errors = sorted(errors + duplicate_errors, key=lambda error: error["index"])
+
+    with transaction.atomic():
+        created = bulk_create_leads(Model, leads, batch_links) if leads else []
+        if created:
+            enqueue('leads.bulk_created', model=Model._meta.model_name, ids=[lead.pk for lead in created])
+        for original in merged:
+            original.save()
+
+    return Response({
+        "message": f"Created {len(created)} of {len(items)} {lead_type} records",
+        "created": len(created),
+        "ids": [lead.pk for lead in created],
+        "linked": len([lead for lead in created if lead.duplicate_of_id]),
+        "merged": [original.pk for original in merged],
+        "errors": errors,
+    }, status=status.HTTP_201_CREATED if created or merged else status.HTTP_400_BAD_REQUEST)
+
+
+@require_GET
+def export_leads(request):
+    """
+    Streams every lead as CSV (default) or NDJSON.
+    usage: /api/export/?type=student|enquiry&format=csv|ndjson[&staff_id=X]
+    extra_data keys are flattened into their own columns.
+    Plain Django view: DRF would treat ?format= as a renderer override.
+    """
+    lead_type = request.GET.get('type', 'student')
+    export_format = request.GET.get('format', 'csv').lower()
+    if lead_type not in LEAD_MODELS:
+        return JsonResponse({"error": "Invalid type"}, status=status.HTTP_400_BAD_REQUEST)
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"error": "Invalid format"}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = LEAD_MODELS[lead_type].objects.all()
+    staff_id = request.headers.get('X-Staff-ID') or request.GET.get('staff_id')
+    if staff_id and staff_id != 'null' and staff_id != 'undefined':
+        queryset = queryset.filter(assigned_staff_id=staff_id)
+
+    content_type = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+    response = StreamingHttpResponse(stream_export(queryset, export_format), content_type=content_type)
+    filename = f"{lead_type}s_{timezone.now():%Y%m%d_%H%M%S}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(['GET'])
+def search_leads(request):
+    """
+    Ranked lead search for staff/admin.
+    usage: /api/search/?q=<text>&type=student|enquiry[&page=N&page_size=N]
+    Matches name/email/city/course/notes (students) or name/email/location/message
+    (enquiries) by word prefix, names by similarity (typos) and phone numbers by
+    digit substring. Staff (X-Staff-ID) only see their own leads.
+    """
+    lead_type = request.GET.get('type', 'student')
+    if lead_type not in LEAD_MODELS:
+        return Response({"error": "Invalid type"}, status=status.HTTP_400_BAD_REQUEST)
+    text = request.GET.get('q', '').strip()
+    if len(text) < MIN_QUERY_LENGTH:
+        return Response(
+            {"error": f"q must be at least {MIN_QUERY_LENGTH} characters"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "Invalid page"}, status=status.HTTP_400_BAD_REQUEST)
+    if (page - 1) * page_size >= SEARCH_MAX_OFFSET:
+        return Response(
+            {"error": "Too many results to page through; refine the search"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    model = LEAD_MODELS[lead_type]
+    queryset = model.objects.all()
+    staff_id = request.headers.get('X-Staff-ID') or request.GET.get('staff_id')
+    if staff_id and staff_id != 'null' and staff_id != 'undefined':
+        queryset = queryset.filter(assigned_staff_id=staff_id)
+
+    rows, has_more = search_page(search_queryset(with_staff_name(queryset), text), page, page_size)
+    serializer_class = CollectionFormSerializer if model is CollectionForm else EnquirySerializer
+    return Response({
+        'results': serializer_class(rows, many=True).data,
+        'page': page,
+        'has_more': has_more,
+    })
+
+
 @csrf_exempt
 @api_view(['POST'])
 def reallocate_leads(request):
@@ -327,7 +562,7 @@ def reallocate_leads(request):
 
     updated_count = 0
     if ids_to_update:
-        updated_count = Model.objects.filter(id__in=ids_to_update).update(assigned_staff=target_staff)
+        updated_count = move_leads(Model, ids_to_update, target_staff.pk)
 
     return Response({
         "message": f"Successfully reallocated {updated_count} {lead_type}s to {target_staff.name}",
@@ -340,6 +575,7 @@ def dashboard_stats(request):
     """
     Returns aggregated statistics for the dashboard.
     Support filtering by staff_id for robust role-based data.
+    ?mode=aggregate bypasses the LeadStats counters and counts the lead tables.
     """
     staff_id = request.headers.get('X-Staff-ID') or request.GET.get('staff_id')
     role = request.GET.get('role', 'staff') # 'admin' or 'staff'
@@ -352,24 +588,36 @@ def dashboard_stats(request):
     if role.lower() != 'admin' and staff_id and staff_id != 'null':
         enq_qs = enq_qs.filter(assigned_staff_id=staff_id)
         form_qs = form_qs.filter(assigned_staff_id=staff_id)
-
-    # Calculate Stats
-    stats = {
-        'total_enquiries': enq_qs.count(),
-        'pending_enquiries': enq_qs.filter(is_read=False).count(),
-        'total_students': form_qs.count(),
-        'pending_students': form_qs.filter(is_read=False).count(),
-    }
+    else:
+        staff_id = None
+
+    # Nothing changed since the client's last poll -> 304 before computing anything
+    etag, last_modified = validators_for(
+        request,
+        list_watermark(Enquiry, staff_id),
+        list_watermark(CollectionForm, staff_id),
+        scope=staff_id or '',
+    )
+    cached = not_modified(request, etag, last_modified)
+    if cached is not None:
+        return cached
+
+    # Calculate Stats: maintained LeadStats counters by default,
+    # ?mode=aggregate recomputes them from the lead tables (for cross-checking)
+    if request.GET.get('mode') == 'aggregate':
+        stats = aggregate_dashboard_stats(staff_id)
+    else:
+        stats = read_dashboard_stats(staff_id)
 
     # Fetch Recent Activity (Limit 5)
-    recent_enquiries = EnquirySerializer(enq_qs.order_by('-created_at')[:5], many=True).data
-    recent_students = CollectionFormSerializer(form_qs.order_by('-created_at')[:5], many=True).data
+    recent_enquiries = EnquirySerializer(with_staff_name(enq_qs).order_by('-created_at')[:5], many=True).data
+    recent_students = CollectionFormSerializer(with_staff_name(form_qs).order_by('-created_at')[:5], many=True).data
 
-    return Response({
+    return with_validators(Response({
         'stats': stats,
         'recent_enquiries': recent_enquiries,
         'recent_students': recent_students
-    })
+    }), etag, last_modified)
 
 
 # --- Organization Login & Views ---
@@ -400,9 +648,14 @@ def org_login(request):
 
 @api_view(['GET', 'POST'])
 def org_list(request):
-    """Admin only: List all organizations or create a new one."""
+    """
+    Admin only: List all organizations or create a new one.
+    ?with_counts=true adds each organization's student count from the college index.
+    """
     if request.method == 'GET':
         orgs = Organization.objects.all().order_by('name')
+        if request.GET.get('with_counts') == 'true':
+            orgs = orgs.annotate(student_count=Count('college_selections'))
         serializer = OrganizationSerializer(orgs, many=True)
         return Response(serializer.data)
 
@@ -441,17 +694,18 @@ def org_detail(request, pk):
 @api_view(['GET'])
 def org_students(request):
     """
-    Returns CollectionForm entries where colleges_selected contains the org's college name.
+    Returns CollectionForm entries whose selected colleges include the org's college.
     Org is identified by X-Org-Name header (name stored in localStorage after login).
+    Uses the normalized CollegeSelection index (exact match, no substring false positives).
     """
     org_name = request.headers.get('X-Org-Name', '').strip()
     if not org_name:
         return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
     # Filter students where their selected colleges include this org's name
-    students = CollectionForm.objects.filter(
-        colleges_selected__icontains=org_name
-    ).order_by('-created_at')
+    students = with_staff_name(CollectionForm.objects.filter(
+        college_selections__normalized_name=normalize_college(org_name)
+    )).order_by('-created_at')
 
     serializer = CollectionFormSerializer(students, many=True)
     return Response(serializer.data)
@@ -460,15 +714,19 @@ def org_students(request):
 @api_view(['GET'])
 def org_enquiries(request):
     """
-    Returns Enquiry entries where message or location contains the org's college name.
+    Returns Enquiry entries where message or location mentions the org's college name.
+    Phrase match on the GIN-indexed search_vector (location/message weights only).
     """
     org_name = request.headers.get('X-Org-Name', '').strip()
     if not org_name:
         return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
-    enquiries = Enquiry.objects.filter(
-        Q(message__icontains=org_name) | Q(location__icontains=org_name)
-    ).order_by('-created_at')
+    terms = search_terms(org_name)
+    if not terms:
+        return Response([])
+    enquiries = with_staff_name(Enquiry.objects.filter(
+        search_vector=phrase_query(terms, weights='BC')
+    )).order_by('-created_at')
 
     serializer = EnquirySerializer(enquiries, many=True)
     return Response(serializer.data)
@@ -0,0 +1,176 @@
+"""
+A staff member's notifications: direct ones (recipient = them) plus broadcasts.
+
+Broadcasts are stored once (is_broadcast, no recipient) and fanned out on read:
+the inbox query ORs the two (recipient index / partial broadcast index) and reads
+per-person read state for broadcasts from NotificationReceipt with an EXISTS
+subquery. Receipts are only written when someone marks a broadcast read or
+dismisses it (is_hidden), so sending to all staff is a single INSERT regardless
+of headcount. A staff member only sees broadcasts sent since they joined.
+
+Unread badge: Staff.unread_notifications counts unread direct notifications
+(kept in step by notifications.signals, and by hand on bulk paths); unread
+broadcasts are one indexed count against the receipts.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from formapp.models import Staff
+from websitebackend.db import delete_by_ids
+
+from .models import Notification, NotificationReceipt
+
+PRUNE_BATCH_SIZE = 1000
+RETENTION_DAYS = 90
+
+
+def _receipt(staff_id):
+    return Exists(NotificationReceipt.objects.filter(notification=OuterRef('pk'), staff_id=staff_id))
+
+
+def _dismissed(staff_id):
+    return Exists(NotificationReceipt.objects.filter(notification=OuterRef('pk'), staff_id=staff_id, is_hidden=True))
+
+
+def broadcasts_for(staff_id):
+    """
+    Broadcasts a staff member sees: sent since they joined, not dismissed, and none
+    while they are inactive (the joined-at subquery is NULL then, matching nothing).
+    """
+    joined = Subquery(Staff.objects.filter(pk=staff_id, active_status=True).values('created_at')[:1])
+    return Q(is_broadcast=True, created_at__gte=joined) & ~_dismissed(staff_id)
+
+
+def visible_to(staff_id):
+    return Q(recipient_id=staff_id) | broadcasts_for(staff_id)
+
+
+def _unread_broadcasts(staff_id):
+    return Notification.objects.filter(broadcasts_for(staff_id)).filter(~_receipt(staff_id))
+
+
+def inbox_queryset(staff_id, unread_only=False):
+    """Notifications for one staff member, annotated with `receipt_read` (their read state of broadcasts)."""
+    queryset = Notification.objects.annotate(receipt_read=_receipt(staff_id))
+    if unread_only:
+        queryset = queryset.filter(
+            Q(recipient_id=staff_id, is_read=False) | (broadcasts_for(staff_id) & Q(receipt_read=False))
+        )
+    else:
+        queryset = queryset.filter(visible_to(staff_id))
+    return queryset.order_by('-created_at', '-id')
+
+
+def is_read_by(notification):
+    """Read state as seen by the staff member the queryset was built for."""
+    if notification.is_broadcast:
+        return bool(getattr(notification, 'receipt_read', False))
+    return notification.is_read
+
+
+def set_broadcast_read(notification, staff_id, read=True):
+    """Records (or withdraws) one staff member's read receipt for a broadcast."""
+    if read:
+        NotificationReceipt.objects.get_or_create(notification=notification, staff_id=staff_id)
+    else:
+        NotificationReceipt.objects.filter(notification=notification, staff_id=staff_id, is_hidden=False).delete()
+    notification.receipt_read = read
+
+
+def dismiss_broadcast(notification, staff_id):
+    """Removes a broadcast from one staff member's inbox (a hidden receipt); the row stays for everyone else."""
+    NotificationReceipt.objects.update_or_create(
+        notification=notification, staff_id=staff_id, defaults={'is_hidden': True}
+    )
+
+
+# --- Unread counter ---
+
+def unread_key(notification):
+    """The staff member whose counter this notification counts towards, or None."""
+    if notification.is_broadcast or notification.is_read:
+        return None
+    return notification.recipient_id
+
+
+def adjust_unread(deltas):
+    """Apply {staff_id: delta} to Staff.unread_notifications (UPDATE ... SET n = n + delta)."""
+    for staff_id, delta in deltas.items():
+        if staff_id is None or not delta:
+            continue
+        Staff.objects.filter(pk=staff_id).update(unread_notifications=F('unread_notifications') + delta)
+
+
+def unread_count(staff_id):
+    """Unread direct notifications (maintained counter) plus unread broadcasts."""
+    direct = Staff.objects.filter(pk=staff_id).values_list('unread_notifications', flat=True).first() or 0
+    return max(direct, 0) + _unread_broadcasts(staff_id).count()
+
+
+def mark_all_read(staff_id):
+    """
+    Marks everything in the staff member's inbox read: one UPDATE for direct
+    notifications, one INSERT of receipts for unread broadcasts.
+    Returns the number of notifications that were unread.
+    """
+    with transaction.atomic():
+        updated = Notification.objects.filter(recipient_id=staff_id, is_read=False).update(is_read=True)
+        # Subtract what was flipped, so notifications arriving meanwhile stay counted
+        adjust_unread({staff_id: -updated})
+        unread_broadcasts = _unread_broadcasts(staff_id).values_list('id', flat=True)
+        receipts = NotificationReceipt.objects.bulk_create(
+            [NotificationReceipt(notification_id=pk, staff_id=staff_id) for pk in unread_broadcasts],
+            ignore_conflicts=True,
+        )
+    return updated + len(receipts)
+
+
+# --- Retention ---
+
+def prune_candidates(cutoff):
+    """
+    Read direct notifications and broadcasts created before `cutoff`. Unread direct
+    notifications are kept, so pruning never moves the unread counters.
+    """
+    return Notification.objects.filter(
+        Q(is_broadcast=False, is_read=True) | Q(is_broadcast=True),
+        created_at__lt=cutoff,
+    )
+
+
+def retention_cutoff(days=RETENTION_DAYS):
+    return timezone.now() - timedelta(days=days)
+
+
+def delete_notifications(ids):
+    """
+    Deletes notifications (and broadcast receipts) by primary key without loading
+    them or sending post_delete; only for rows that don't count towards the unread
+    counters (see prune_candidates).
+    """
+    if not ids:
+        return 0
+    with transaction.atomic():
+        # Receipts have no signals or dependents, so this is a single DELETE too
+        NotificationReceipt.objects.filter(notification_id__in=ids).delete()
+        return delete_by_ids(Notification, ids)
+
+
+def prune_batches(cutoff, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Deletes prune_candidates(cutoff) in primary-key batches, one transaction each.
+    Yields (deleted so far, last id) after every batch.
+    """
+    candidates = prune_candidates(cutoff)
+    deleted = 0
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        deleted += delete_notifications(ids)
+        last_id = ids[-1]
+        yield deleted, last_id
@@ -0,0 +1,63 @@
+"""
+Django management command to delete old notifications.
+
+Removes read direct notifications and broadcasts (with their read receipts)
+created more than --days ago, in primary-key batches of --batch-size, one short
+transaction per batch. Unread direct notifications are always kept.
+
+Usage:
+    python manage.py prune_notifications                 # Older than 90 days
+    python manage.py prune_notifications --days=30
+    python manage.py prune_notifications --dry-run       # Only count what would go
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.inbox import (
+    PRUNE_BATCH_SIZE, RETENTION_DAYS, prune_batches, prune_candidates, retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = 'Delete read notifications and broadcasts older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=RETENTION_DAYS,
+            help='Keep notifications newer than this many days'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PRUNE_BATCH_SIZE,
+            help='Rows deleted per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count what would be deleted without deleting'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        cutoff = retention_cutoff(options['days'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No data will be deleted'))
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Would delete {prune_candidates(cutoff).count()} notifications created before {cutoff:%Y-%m-%d}'
+            ))
+            return
+
+        deleted = 0
+        for deleted, last_id in prune_batches(cutoff, options['batch_size']):
+            self.stdout.write(f'  {deleted} deleted, last id {last_id}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Deleted {deleted} notifications created before {cutoff:%Y-%m-%d}'
+        ))
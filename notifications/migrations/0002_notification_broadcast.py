@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('formapp', '0049_lead_contact_keys'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='is_broadcast',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_broadcast', True)), fields=['-created_at'], name='notification_broadcast_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationreceipt',
+            name='notification',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='notifications.notification'),
+        ),
+        migrations.AddField(
+            model_name='notificationreceipt',
+            name='staff',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_receipts', to='formapp.staff'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationreceipt',
+            constraint=models.UniqueConstraint(fields=('staff', 'notification'), name='unique_notification_receipt'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationreceipt',
+            name='is_hidden',
+            field=models.BooleanField(default=False),
+        ),
+    ]
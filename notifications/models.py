@@ -58,5 +58,38 @@ class Notification(models.Model):
     # Let's make sender nullable or generic. For now, let's assume sender is also a Staff (Admin role) or null (System).
     sender = models.ForeignKey(Staff, related_name='sent_notifications', on_delete=models.SET_NULL, null=True)
 
+    # Broadcasts ("to all staff") are stored once with no recipient; each staff member's
+    # read state (and dismissal) lives in NotificationReceipt, created when they act on it.
+    # Staff see broadcasts sent since they joined, while they are active.
+    is_broadcast = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Inbox pages (keyset on created_at) and unread filters for one recipient
+            models.Index(fields=['recipient', '-created_at'], name='notification_inbox_idx'),
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='notification_unread_idx'),
+            models.Index(
+                fields=['-created_at'], name='notification_broadcast_idx',
+                condition=models.Q(is_broadcast=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {'all staff' if self.is_broadcast else self.recipient}"
+
+
+class NotificationReceipt(models.Model):
+    """A staff member has read a broadcast notification (and, if is_hidden, dismissed it)."""
+    notification = models.ForeignKey(Notification, related_name='receipts', on_delete=models.CASCADE)
+    staff = models.ForeignKey(Staff, related_name='notification_receipts', on_delete=models.CASCADE)
+    read_at = models.DateTimeField(auto_now_add=True)
+    # Deleted from this staff member's inbox; the broadcast stays for everyone else
+    is_hidden = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['staff', 'notification'], name='unique_notification_receipt'),
+        ]
+
     def __str__(self):
-        return f"{self.title} - {self.recipient}"
+        return f"{self.staff} {'dismissed' if self.is_hidden else 'read'} {self.notification_id}"
@@ -1,7 +1,16 @@
 from rest_framework import serializers
+from .inbox import is_read_by
 from .models import Notification
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
+        read_only_fields = ['is_broadcast']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Rows from inbox_queryset() carry the reader's receipt for broadcasts
+        if hasattr(instance, 'receipt_read'):
+            data['is_read'] = is_read_by(instance)
+        return data
@@ -0,0 +1,58 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from websitebackend.events import broadcast_on_commit, publish_on_commit
+
+from .inbox import adjust_unread, unread_key
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+def publish_notifications(notifications):
+    """Pushes saved notifications to their recipients' event streams once the transaction commits."""
+    for notification in notifications:
+        data = NotificationSerializer(notification).data
+        if notification.is_broadcast:
+            broadcast_on_commit('notification', data)
+        else:
+            publish_on_commit(notification.recipient_id, 'notification', data)
+
+
+def notifications_created(notifications):
+    """Counter and push bookkeeping for notifications written with bulk_create (no post_save)."""
+    adjust_unread(Counter(unread_key(notification) for notification in notifications))
+    publish_notifications(notifications)
+
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    if created:
+        publish_notifications([instance])
+
+
+# --- Staff.unread_notifications ---
+# Bulk paths (queryset.update / bulk_create / raw deletes) bypass these receivers
+# and adjust the counter themselves (see notifications/inbox.py).
+
+@receiver(pre_save, sender=Notification)
+def remember_unread_key(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Notification.objects.filter(pk=instance.pk).only('recipient', 'is_read', 'is_broadcast').first()
+    instance._previous_unread_key = unread_key(previous) if previous else None
+
+
+@receiver(post_save, sender=Notification)
+def track_unread_on_save(sender, instance, **kwargs):
+    deltas = Counter()
+    deltas[getattr(instance, '_previous_unread_key', None)] -= 1
+    deltas[unread_key(instance)] += 1
+    adjust_unread(deltas)
+    instance._previous_unread_key = unread_key(instance)
+
+
+@receiver(post_delete, sender=Notification)
+def track_unread_on_delete(sender, instance, **kwargs):
+    adjust_unread({unread_key(instance): -1})
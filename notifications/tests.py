@@ -1,3 +1,143 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from formapp.models import Staff
+
+from .inbox import mark_all_read, prune_batches
+from .models import Notification, NotificationReceipt
+from .signals import notifications_created
+
+
+def make_staff(login_id, **fields):
+    return Staff.objects.create(
+        name=login_id, email=f'{login_id}@example.com', login_id=login_id, password='x', **fields
+    )
+
+
+class BroadcastTests(TestCase):
+    """Broadcasts are stored once and fanned out on read (notifications/inbox.py)."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = make_staff('alice')
+        self.bob = make_staff('bob')
+        response = self.client.post(
+            '/api/notifications/', {'recipient': 'all', 'title': 'Holiday', 'body': 'Office closed'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.broadcast = Notification.objects.get(is_broadcast=True)
+
+    def inbox_ids(self, staff):
+        response = self.client.get('/api/notifications/', {'recipient_id': staff.pk})
+        return [row['id'] for row in response.data]
+
+    def unread(self, staff):
+        return self.client.get('/api/notifications/unread_count/', {'recipient_id': staff.pk}).data['count']
+
+    def test_dismissal_only_hides_it_for_that_staff_member(self):
+        response = self.client.delete(f'/api/notifications/{self.broadcast.pk}/?recipient_id={self.alice.pk}')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(Notification.objects.filter(pk=self.broadcast.pk).exists())
+        self.assertEqual(self.inbox_ids(self.alice), [])
+        self.assertEqual(self.unread(self.alice), 0)
+        self.assertEqual(self.inbox_ids(self.bob), [self.broadcast.pk])
+        self.assertEqual(self.unread(self.bob), 1)
+
+    def test_dismissal_survives_marking_unread(self):
+        self.client.delete(f'/api/notifications/{self.broadcast.pk}/?recipient_id={self.alice.pk}')
+        self.client.post('/api/notifications/mark_all_read/', {'recipient_id': self.alice.pk}, format='json')
+
+        self.assertTrue(NotificationReceipt.objects.get(staff=self.alice).is_hidden)
+        self.assertEqual(self.inbox_ids(self.alice), [])
+
+    def test_delete_without_recipient_removes_it_for_everyone(self):
+        self.client.delete(f'/api/notifications/{self.broadcast.pk}/')
+
+        self.assertFalse(Notification.objects.filter(pk=self.broadcast.pk).exists())
+        self.assertEqual(self.inbox_ids(self.bob), [])
+
+    def test_later_and_inactive_staff_do_not_see_older_broadcasts(self):
+        newcomer = make_staff('carol')
+        Staff.objects.filter(pk=self.bob.pk).update(active_status=False)
+
+        self.assertEqual(self.inbox_ids(newcomer), [])
+        self.assertEqual(self.unread(newcomer), 0)
+        self.assertEqual(self.inbox_ids(self.bob), [])
+        self.assertEqual(self.unread(self.bob), 0)
+        self.assertEqual(self.inbox_ids(self.alice), [self.broadcast.pk])
+
+    def test_read_receipt_is_per_staff_member(self):
+        response = self.client.patch(
+            f'/api/notifications/{self.broadcast.pk}/?recipient_id={self.alice.pk}', {'is_read': True}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(self.alice), 0)
+        self.assertEqual(self.unread(self.bob), 1)
+
+
+class UnreadCounterTests(TestCase):
+    """
+    Staff.unread_notifications, moved by the signal receivers and by hand on the bulk
+    paths, always equals a fresh count of unread direct notifications.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = make_staff('alice')
+        self.bob = make_staff('bob')
+
+    def assertCountersMatch(self):
+        for staff in Staff.objects.all():
+            actual = Notification.objects.filter(recipient=staff, is_read=False).count()
+            self.assertEqual(staff.unread_notifications, actual, staff.login_id)
+
+    def send(self, recipient, **fields):
+        response = self.client.post(
+            '/api/notifications/', {'recipient': recipient, 'title': 'Hello', 'body': 'Hi', **fields}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def mark(self, pk, read):
+        response = self.client.patch(f'/api/notifications/{pk}/', {'is_read': read}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_single_notification_paths(self):
+        first = self.send(self.alice.pk)
+        self.send(self.alice.pk, is_read=True)
+        self.send('all')
+        moved = Notification.objects.create(recipient=self.alice, title='Moved', body='')
+        self.assertCountersMatch()
+
+        self.mark(first['id'], read=True)
+        moved.recipient = self.bob
+        moved.save()
+        self.assertCountersMatch()
+
+        self.mark(first['id'], read=False)
+        response = self.client.delete(f'/api/notifications/{moved.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertCountersMatch()
+
+    def test_bulk_paths(self):
+        created = Notification.objects.bulk_create([
+            Notification(recipient=staff, title='Bulk', body='', is_read=read)
+            for staff in (self.alice, self.bob) for read in (False, False, True)
+        ] + [Notification(title='Everyone', body='', is_broadcast=True)])
+        notifications_created(created)
+        self.assertCountersMatch()
+
+        self.assertEqual(mark_all_read(self.alice.pk), 3)  # two direct, one broadcast
+        self.assertCountersMatch()
 
-# Create your tests here.
+        # Retention only prunes read notifications, leaving the counters alone
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=365))
+        for _ in prune_batches(timezone.now()):
+            pass
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertCountersMatch()
@@ -1,8 +1,11 @@
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from formapp.models import Staff
+from formapp.pagination import KeysetPagination
+from .inbox import dismiss_broadcast, inbox_queryset, mark_all_read, set_broadcast_read, unread_count
 from .models import Notification
 from .serializers import NotificationSerializer
-from formapp.models import Staff
 
 class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
@@ -17,8 +20,49 @@ class NotificationViewSet(viewsets.ModelViewSet):
         
         recipient_id = self.request.query_params.get('recipient_id')
         if recipient_id:
-             return Notification.objects.filter(recipient_id=recipient_id)
-        return Notification.objects.all()
+            # Their direct notifications plus broadcasts, with per-person read state
+            return inbox_queryset(recipient_id, unread_only=self.request.query_params.get('unread') == 'true')
+        return Notification.objects.order_by('-created_at', '-id')
+
+    def list(self, request, *args, **kwargs):
+        """
+        GET /api/notifications/?recipient_id=X[&unread=true]
+        Paged (keyset on created_at, newest first) when ?cursor= or ?page_size= is given:
+        {next, previous, results}. Otherwise the whole list (legacy).
+        """
+        if 'cursor' not in request.query_params and 'page_size' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        paginator = KeysetPagination(page_size=20)
+        page = paginator.paginate_queryset(self.get_queryset(), request)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def _staff_id(self, request):
+        staff_id = request.query_params.get('recipient_id') or request.data.get('recipient_id')
+        try:
+            return int(staff_id)
+        except (TypeError, ValueError):
+            return None
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """
+        usage: /api/notifications/unread_count/?recipient_id=X
+        Read from the maintained counter plus one count of unread broadcasts.
+        """
+        staff_id = self._staff_id(request)
+        if staff_id is None:
+            return Response({'error': 'Missing recipient_id param'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'count': unread_count(staff_id)})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """
+        POST /api/notifications/mark_all_read/  Body: { recipient_id: X }
+        """
+        staff_id = self._staff_id(request)
+        if staff_id is None or not Staff.objects.filter(id=staff_id).exists():
+            return Response({'error': 'A valid recipient_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'marked': mark_all_read(staff_id)})
 
     def create(self, request, *args, **kwargs):
         data = request.data
@@ -26,20 +70,47 @@ class NotificationViewSet(viewsets.ModelViewSet):
         
         # Check for "Broadcast" - if recipient is 'all' or specific flag
         if recipient_id == 'all':
-            # Broadcast to all active staff
-            staffs = Staff.objects.filter(active_status=True)
-            notifications = []
-            for staff in staffs:
-                # Create a copy of data for each staff
-                notif_data = data.copy()
-                notif_data['recipient'] = staff.id
-                serializer = self.get_serializer(data=notif_data)
-                if serializer.is_valid():
-                    self.perform_create(serializer)
-                    notifications.append(serializer.data)
-                else:
-                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-            return Response(notifications, status=status.HTTP_201_CREATED)
+            # Stored once for all staff; read receipts are created as people read it
+            notif_data = data.copy()
+            notif_data.pop('recipient')
+            serializer = self.get_serializer(data=notif_data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer.save(recipient=None, is_broadcast=True)
+            # Still a list, as when one copy per staff member was created
+            return Response([serializer.data], status=status.HTTP_201_CREATED)
         
         return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if not instance.is_broadcast or 'is_read' not in request.data:
+            return super().update(request, *args, **kwargs)
+
+        # Marking a broadcast (un)read only affects the reader: ?recipient_id= (or body) says who
+        staff_id = request.query_params.get('recipient_id') or request.data.get('recipient_id')
+        if not staff_id or not Staff.objects.filter(id=staff_id).exists():
+            return Response(
+                {'error': 'A valid recipient_id is required to mark a broadcast notification read'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            read = serializers.BooleanField().to_internal_value(request.data.get('is_read'))
+        except serializers.ValidationError as exc:
+            return Response({'is_read': exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+        set_broadcast_read(instance, staff_id, read)
+        return Response(self.get_serializer(instance).data)
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        DELETE /api/notifications/<id>/?recipient_id=X on a broadcast dismisses it for
+        that staff member only; without recipient_id the broadcast is deleted for everyone.
+        """
+        instance = self.get_object()
+        staff_id = self._staff_id(request)
+        if not instance.is_broadcast or staff_id is None:
+            return super().destroy(request, *args, **kwargs)
+        if not Staff.objects.filter(id=staff_id).exists():
+            return Response({'error': 'A valid recipient_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        dismiss_broadcast(instance, staff_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
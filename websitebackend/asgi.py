@@ -2,6 +2,9 @@
 ASGI config for websitebackend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to the server-push event stream (websitebackend.events.EVENTS_PATH) are
+served by a lightweight async app so idle streams don't occupy a Django worker
+thread; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +16,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'websitebackend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from websitebackend.events import EVENTS_PATH, sse_app  # noqa: E402  (needs settings configured)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        await sse_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
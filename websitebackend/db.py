@@ -0,0 +1,23 @@
+"""
+Database helpers shared by the apps.
+"""
+from django.db import connections, router
+
+
+def delete_by_ids(model, ids):
+    """
+    One DELETE ... WHERE pk IN (...) for a list of primary keys. Unlike
+    queryset.delete() it neither loads the rows nor sends pre/post_delete, and no
+    cascades run: callers clear dependent rows and adjust counters themselves.
+    Returns the number of rows deleted.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', ids)
+        return cursor.rowcount
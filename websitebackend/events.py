@@ -0,0 +1,374 @@
+"""
+Server-push events for the frontend (chat messages, notifications, lead assignments).
+
+Writers call publish(staff_id, event, data) - or publish_on_commit() inside a
+transaction - and every open event stream of that staff member receives it, so
+clients stop polling the chat user list, unread counters, notifications and the
+dashboard on timers.
+
+Delivery goes through a broker chosen by settings.EVENTS_BROKER (dotted path to a
+Broker subclass). PostgresBroker carries events between processes over LISTEN/NOTIFY,
+so what the outbox worker and the scheduler publish (assignments, notifications)
+reaches the streams held by the ASGI workers. LocalBroker fans out inside one
+process only: enough for tests and a single process that runs no worker or
+scheduler, which refuse to start under it (see require_cross_process_broker).
+Events are best-effort: a client that reconnects refetches state over the API.
+
+The stream itself is served by websitebackend.asgi (see sse_app below).
+"""
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = 'websitebackend.events.PostgresBroker'
+# Undelivered events buffered per stream; a client that falls further behind is told to resync
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+# Reconnect delay sent to EventSource clients (ms)
+RETRY_MS = 3000
+
+EVENTS_PATH = '/api/events/'
+# Every stream also listens here (e.g. notifications sent to all staff)
+BROADCAST_CHANNEL = 'broadcast'
+
+
+def channel_for(staff_id):
+    return f'staff:{int(staff_id)}'
+
+
+class Subscription:
+    """An open stream: an asyncio queue owned by the event loop that serves it."""
+
+    def __init__(self, loop, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """Called on the subscriber's loop."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Dropping events silently would leave the client with stale state
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self):
+        """Next message, or None once the subscriber has missed events."""
+        return await self.queue.get()
+
+
+class Broker:
+    """Pub/sub interface the event stream uses; subclasses pick the transport."""
+
+    # Whether publish() in one process reaches subscriptions in another
+    cross_process = False
+
+    def publish(self, channel, message):
+        """Deliver `message` (a dict) to every subscription on `channel`. May be called from any thread."""
+        raise NotImplementedError
+
+    def subscribe(self, channels):
+        """Returns one Subscription, for the running event loop, receiving every channel in `channels`."""
+        raise NotImplementedError
+
+    def unsubscribe(self, channels, subscription):
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """In-process fan-out. Sync views run in worker threads, so delivery hops onto each subscriber's loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Loop already closed; the stream is going away
+                self.unsubscribe([channel], subscription)
+
+    def subscribe(self, channels):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            for channel in channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, channels, subscription):
+        with self._lock:
+            for channel in channels:
+                subscriptions = self._subscriptions.get(channel)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+    def resync_all(self):
+        """Tells every open stream it missed events (their clients refetch and reconnect)."""
+        with self._lock:
+            channels = list(self._subscriptions)
+        for channel in channels:
+            self.publish(channel, None)
+
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+LISTEN_POLL_SECONDS = 5
+LISTEN_RETRY_SECONDS = 2
+
+
+class PostgresBroker(Broker):
+    """
+    Fan-out across processes with Postgres LISTEN/NOTIFY on the default database.
+
+    publish() is a pg_notify() on the caller's connection, so inside a transaction
+    the event is sent when it commits. Each process that serves streams runs one
+    listener thread, started by its first subscribe(), on a connection of its own;
+    notifications it receives are handed to an in-process LocalBroker. Events too
+    large for a NOTIFY, and anything sent while the listener was reconnecting, reach
+    the affected streams as a resync.
+    """
+    cross_process = True
+    pg_channel = 'websitebackend_events'
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self._local = LocalBroker()
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        payload = json.dumps({'channel': channel, 'message': message}, default=str, separators=(',', ':'))
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            payload = json.dumps({'channel': channel, 'message': None})
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.pg_channel, payload])
+
+    def subscribe(self, channels):
+        self._start_listener()
+        return self._local.subscribe(channels)
+
+    def unsubscribe(self, channels, subscription):
+        self._local.unsubscribe(channels, subscription)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='events-listener', daemon=True)
+                self._listener.start()
+
+    def _connect(self):
+        wrapper = connections[self.using]
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.pg_channel}')
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _listen(self):
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                while True:
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Event listener connection failed; reconnecting")
+            finally:
+                if conn is not None:
+                    conn.close()
+            # Whatever was published while we weren't listening is gone
+            self._local.resync_all()
+            time.sleep(LISTEN_RETRY_SECONDS)
+
+    def _dispatch(self, payload):
+        try:
+            envelope = json.loads(payload)
+            channel, message = envelope['channel'], envelope['message']
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed event payload: %.200s", payload)
+            return
+        self._local.publish(channel, message)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+_event_ids = itertools.count(1)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'EVENTS_BROKER', DEFAULT_BROKER))()
+    return _broker
+
+
+def require_cross_process_broker(command):
+    """
+    Raised from processes that publish events but serve no streams (run_worker,
+    run_scheduler): under an in-process broker their events would reach nobody.
+    """
+    if not get_broker().cross_process:
+        raise ImproperlyConfigured(
+            f"{command} publishes events for other processes, but EVENTS_BROKER "
+            f"({type(get_broker()).__name__}) only delivers within this one; use PostgresBroker"
+        )
+
+
+def set_broker(broker):
+    """Swaps the broker (tests); returns the previous one."""
+    global _broker
+    with _broker_lock:
+        previous, _broker = _broker, broker
+    return previous
+
+
+def _message(event, data):
+    return {'id': next(_event_ids), 'event': event, 'data': data}
+
+
+def publish(staff_id, event, data):
+    """Push `event` with a JSON-serializable payload to the staff member's open streams."""
+    if staff_id is None:
+        return
+    get_broker().publish(channel_for(staff_id), _message(event, data))
+
+
+def publish_on_commit(staff_id, event, data):
+    """publish() once the surrounding transaction commits (immediately outside one)."""
+    if staff_id is not None:
+        transaction.on_commit(lambda: publish(staff_id, event, data))
+
+
+def broadcast_on_commit(event, data):
+    """Push `event` to every open stream once the surrounding transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(BROADCAST_CHANNEL, _message(event, data)))
+
+
+# --- SSE endpoint (raw ASGI, so an idle stream holds no thread) ---
+
+def format_event(message):
+    payload = json.dumps(message['data'], default=str, separators=(',', ':'))
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {payload}\n\n".encode()
+
+
+def _staff_id(scope):
+    values = parse_qs(scope.get('query_string', b'').decode()).get('user_id')
+    try:
+        return int(values[0]) if values else None
+    except ValueError:
+        return None
+
+
+def _staff_exists(staff_id):
+    from formapp.models import Staff
+
+    return Staff.objects.filter(id=staff_id).exists()
+
+
+async def _send_plain(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+async def sse_app(scope, receive, send):
+    """
+    GET /api/events/?user_id=X -> text/event-stream of that staff member's events:
+    chat.message, notification, lead.assigned, plus `resync` when events were
+    dropped (the client should refetch and reconnect).
+    """
+    if scope['method'] != 'GET':
+        await _send_plain(send, 405, {'error': 'Method not allowed'})
+        return
+    staff_id = _staff_id(scope)
+    if staff_id is None:
+        await _send_plain(send, 400, {'error': 'Missing user_id param'})
+        return
+    if not await sync_to_async(_staff_exists)(staff_id):
+        await _send_plain(send, 404, {'error': 'Unknown user_id'})
+        return
+
+    broker = get_broker()
+    channels = [channel_for(staff_id), BROADCAST_CHANNEL]
+    subscription = broker.subscribe(channels)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    heartbeat = getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', HEARTBEAT_SECONDS)
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                (b'access-control-allow-origin', b'*'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': f'retry: {RETRY_MS}\n\n'.encode(), 'more_body': True})
+        while not disconnected.done():
+            next_message = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({next_message, disconnected}, timeout=heartbeat,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if next_message not in done:
+                next_message.cancel()
+                if not disconnected.done():
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                continue
+            message = next_message.result()
+            if message is None:
+                await send({'type': 'http.response.body', 'body': b'event: resync\ndata: {}\n\n'})
+                return
+            await send({'type': 'http.response.body', 'body': format_event(message), 'more_body': True})
+    except OSError:
+        # Client went away mid-write
+        pass
+    finally:
+        broker.unsubscribe(channels, subscription)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
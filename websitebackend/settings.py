@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'formapp',
     'rest_framework',
     'corsheaders',
@@ -134,6 +135,19 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# What happens when a lead arrives with the email/phone of an existing one:
+# 'reject' (409), 'merge' (fold into the existing lead) or 'link' (keep both,
+# duplicate_of -> original). Overridable per request with ?on_duplicate=
+LEAD_DUPLICATE_POLICY = 'link'
+
+# Server-push event stream (/api/events/, served by websitebackend/asgi.py).
+# PostgresBroker relays events between processes over LISTEN/NOTIFY, which
+# run_worker and run_scheduler need: they publish assignments and notifications
+# for streams held by the ASGI workers, and refuse to start under LocalBroker,
+# which only delivers within one process (tests, single-process development).
+EVENTS_BROKER = 'websitebackend.events.PostgresBroker'
+EVENTS_HEARTBEAT_SECONDS = 15
+
 # MongoDB Configuration
 MONGO_URI = (
     "mongodb+srv://laren:%40password123@"
@@ -142,3 +156,15 @@ MONGO_URI = (
     "&retrywrites=false&maxIdleTimeMS=120000"
 )
 MONGO_DB_NAME = "chat_db"
+# Client pool and timeouts (per process; the client is created on first use).
+# Server selection fails fast instead of hanging requests when Mongo is unreachable.
+MONGO_MAX_POOL_SIZE = 50
+MONGO_MIN_POOL_SIZE = 0
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+MONGO_CONNECT_TIMEOUT_MS = 5000
+MONGO_SOCKET_TIMEOUT_MS = 20000
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 5000
+
+# Serve the chat API (/api/chat/) with async views on the async Mongo driver.
+# Only worthwhile under an ASGI server (websitebackend.asgi); leave off for WSGI.
+CHAT_ASYNC_VIEWS = False